@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, projects, paths, components
+from app.api.endpoints import auth, projects, paths, components, jobs, status
 from app.config import config
 
 router = APIRouter()
@@ -8,4 +8,6 @@ router = APIRouter()
 router.include_router(auth.router)
 router.include_router(projects.router)
 router.include_router(paths.router)
-router.include_router(components.router)
\ No newline at end of file
+router.include_router(components.router)
+router.include_router(jobs.router)
+router.include_router(status.router)
\ No newline at end of file
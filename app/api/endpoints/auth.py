@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy import Select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from datetime import datetime, timedelta, timezone
 
@@ -12,29 +13,29 @@ from app.crud.crud_users import authenticate_user, create_access_token, get_curr
 router = APIRouter(tags=["_auth_"])
 
 @router.post("/register", response_model=UserResponseModel, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: UserCreateModel, db: Session = Depends(get_db)):
+async def register_user(user_in: UserCreateModel, db: AsyncSession = Depends(get_db)):
     # Check if user already exists
-    existing_user = get_user_by_email(db, user_in.email)
+    existing_user = await db.run_sync(get_user_by_email, user_in.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Create and save new user
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = await run_in_threadpool(get_password_hash, user_in.password)
     new_user = User(
         email=user_in.email,
         full_name=user_in.full_name,
         hashed_password=hashed_pw
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/token")
-def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db),
+async def login_for_access_token(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db),
 ) -> Token:
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -49,7 +50,7 @@ def login_for_access_token(
 
 
 @router.get("/users/me/", response_model=UserResponseModel)
-def read_users_me(
+async def read_users_me(
     current_user: Annotated[UserResponseModel, Depends(get_current_active_user)],
 ):
     return current_user
\ No newline at end of file
@@ -1,32 +1,44 @@
 from http import HTTPStatus
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from app.database import get_db
 from app.database.models.components import *
 from app.crud.crud_component_types import *
 from app.crud.crud_components import *
+from app.crud.crud_paths import get_component_path_ids
+from app.crud.pagination import select_fields
+from app.database.models.jobs import JobResponseModel
+from app.utils.touchstone import TouchstoneImportParamsModel, TouchstoneImportModel, TouchstoneError, save_upload, remove_upload
+from app.api.endpoints.jobs import submit_job
+from app.api.pagination import page_response
+from app.utils.cache import invalidate_paths
 
 router = APIRouter(prefix='/components', tags=["Components"])
 
 @router.get("", response_model=list[ComponentResponseModel])
-def get_components_edpt(db: Session = Depends(get_db)):
-    """Get all components"""
-    components = get_components(db=db)
-    components = [ComponentResponseModel.model_validate(component) for component in components]
-    return components
+async def get_components_edpt(params: Annotated[ComponentListParamsModel, Query()], db: AsyncSession = Depends(get_db)):
+    """Get a page of components matching the filters, the next page's cursor is in `X-Next-Cursor`"""
+    try:
+        fields = select_fields(Component, ComponentResponseModel, params.fields)
+        components, next_cursor = await db.run_sync(get_components_page, params, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return page_response(components, next_cursor, ComponentResponseModel, fields)
 
 
 @router.post("", status_code=HTTPStatus.CREATED, response_model=ComponentResponseModel)
-def post_component_edpt(body: ComponentInputModel, db: Session = Depends(get_db)):
+async def post_component_edpt(body: ComponentInputModel, db: AsyncSession = Depends(get_db)):
     """Create a new component"""
     component = Component(**body.model_dump())
     try:
-        component = add_component(db=db,comp=component)
-        ComponentResponseModel.model_validate(component)
+        component = await db.run_sync(add_component, component)
+        component = ComponentResponseModel.model_validate(component)
     except IntegrityError as e:
         err_msg = str(e)
 
@@ -36,26 +48,102 @@ def post_component_edpt(body: ComponentInputModel, db: Session = Depends(get_db)
 
 
 @router.delete("", status_code=HTTPStatus.NO_CONTENT)
-def delete_components_edpt(db: Session = Depends(get_db)):
+async def delete_components_edpt(db: AsyncSession = Depends(get_db)):
     """Delete all components"""
-    delete_components(db=db)
+    await db.run_sync(delete_components)
+    return
+
+
+@router.get("/search", response_model=list[ComponentSearchResultModel])
+async def search_components_edpt(params: Annotated[ComponentSearchParamsModel, Query()], db: AsyncSession = Depends(get_db)):
+    """Get a page of components whose latest data covers `min_freq`-`max_freq` and meets the spec limits
+
+    Limits apply to the worst case over the band the data covers, the next page's cursor is in `X-Next-Cursor`
+    """
+    try:
+        fields = select_fields(Component, ComponentSearchResultModel, params.fields)
+        components, next_cursor = await db.run_sync(get_component_search_page, params, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return page_response(components, next_cursor, ComponentSearchResultModel, fields)
+
+
+@router.post("/import", status_code=HTTPStatus.ACCEPTED, response_model=JobResponseModel)
+async def import_touchstone_edpt(file: UploadFile, params: Annotated[TouchstoneImportParamsModel, Query()], db: AsyncSession = Depends(get_db)):
+    """Import a Touchstone .sNp file or a zip of them as new component versions in a background job
+
+    The job's result lists the outcome for each file.
+    """
+    try:
+        source = await run_in_threadpool(save_upload, file.file, file.filename)
+    except TouchstoneError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    try:
+        return await submit_job(db, "touchstone_import", TouchstoneImportModel(**params.model_dump(), source=source))
+    except HTTPException:
+        remove_upload(source)
+        raise
+
+
+@router.get("/types", response_model=list[ComponentTypeResponseModel])
+async def get_component_types_edpt(params: Annotated[PageParamsModel, Query()], db: AsyncSession = Depends(get_db)):
+    """Get a page of component types, the next page's cursor is in `X-Next-Cursor`"""
+    try:
+        fields = select_fields(ComponentType, ComponentTypeResponseModel, params.fields)
+        component_types, next_cursor = await db.run_sync(get_component_types_page, params, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return page_response(component_types, next_cursor, ComponentTypeResponseModel, fields)
+
+
+@router.post("/types", status_code=HTTPStatus.CREATED, response_model=ComponentTypeResponseModel)
+async def post_component_type_edpt(body: ComponentTypeInputModel, db: AsyncSession = Depends(get_db)):
+    """Create a component type"""
+    component_type = ComponentType(**body.model_dump())
+    
+    try:
+        component_type = await db.run_sync(add_component_type, component_type)
+        component_type = ComponentTypeResponseModel.model_validate(component_type)
+    except IntegrityError as e:
+        err_msg = str(e)
+
+        # If the type already exists, raise a 409 Conflict
+        if "UniqueViolation" in err_msg:
+            raise HTTPException(status_code=HTTPStatus.CONFLICT, detail=f"Component of type: {component_type.type} already exists")
+
+        # If it wasn't a unique or foreign key constraint, something else went wrong
+        raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=err_msg)
+    return component_type
+
+
+@router.delete("/types", status_code=HTTPStatus.NO_CONTENT)
+async def delete_component_types_edpt(db: AsyncSession = Depends(get_db)):
+    await db.run_sync(delete_component_types)
+    return
+
+
+@router.delete("/types/{type_id}", status_code=HTTPStatus.NO_CONTENT)
+async def delete_component_type_edpt(type_id: int, db: AsyncSession = Depends(get_db)):
+    success = await db.run_sync(delete_component_type, type_id)
+    if not success:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"Component type with ID: {type_id} not found")
     return
 
 
 @router.get("/{component_id}", response_model=ComponentResponseModel)
-def get_component_edpt(component_id: int, db: Session = Depends(get_db)):
+async def get_component_edpt(component_id: int, db: AsyncSession = Depends(get_db)):
     """Get a component with `component_id`"""
-    component = get_component_by_id(db=db,comp_id=component_id)
+    component = await db.run_sync(get_component_by_id, component_id)
     if component is None:
         raise HTTPException(HTTPStatus.NOT_FOUND, detail=f"Component with ID: {component_id} not found")
     return ComponentResponseModel.model_validate(component)
 
 
 @router.put("/{component_id}", response_model=ComponentResponseModel)
-def update_component_edpt(component_id: int, component: ComponentPatchModel, db: Session = Depends(get_db)):
+async def update_component_edpt(component_id: int, component: ComponentPatchModel, db: AsyncSession = Depends(get_db)):
     """Update component with `component_id`"""
     try:
-        component = update_component(db=db,comp_id=component_id,comp=component)
+        component = await db.run_sync(update_component, component_id, component)
         if component is None:
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"Component with ID: {component_id} not found")
         component = ComponentResponseModel.model_validate(component)
@@ -64,26 +152,29 @@ def update_component_edpt(component_id: int, component: ComponentPatchModel, db:
 
         # If it wasn't a unique or foreign key constraint, something else went wrong
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=err_msg)
+    # Analyses flag stages outside their component's band
+    invalidate_paths(await db.run_sync(get_component_path_ids, component_id))
     return component
 
 
 @router.delete("/{component_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_component_edpt(component_id: int, db: Session = Depends(get_db)):
-    success = delete_component(db=db, comp_id=component_id)
+async def delete_component_edpt(component_id: int, db: AsyncSession = Depends(get_db)):
+    success = await db.run_sync(delete_component, component_id)
     if not success:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"Component type with ID: {component_id} not found")
     return
 
 
 @router.post("/{component_id}/data", response_model=ComponentVersionResponseModel)
-def post_component_data_edpt(component_id: int, body: ComponentVersionInputModel, db: Session = Depends(get_db)):
+async def post_component_data_edpt(component_id: int, body: ComponentVersionInputModel, db: AsyncSession = Depends(get_db)):
     """Create data entry for component with `component_id`"""
-    component = get_component_by_id(db, component_id)
+    component = await db.run_sync(get_component_by_id, component_id)
     if component is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"Component type with ID: {component_id} not found")
     
     # Calc next version
-    latest_version = max(component.component_versions, key=lambda cv: cv.version, default=None)
+    component_versions = await component.awaitable_attrs.component_versions
+    latest_version = max(component_versions, key=lambda cv: cv.version, default=None)
     if latest_version:
         next_version = latest_version.version + 1
     else:
@@ -91,25 +182,27 @@ def post_component_data_edpt(component_id: int, body: ComponentVersionInputModel
 
     component_data = ComponentData(**body.component_data.model_dump())
     component_version = ComponentVersion(**body.model_dump(exclude="component_data"),component_data=component_data,version=next_version)
-    component.component_versions.append(component_version)
-    db.commit()
+    component_versions.append(component_version)
+    await db.run_sync(add_version_summary, component, component_version)
+    await db.commit()
     return ComponentVersionResponseModel.model_validate(component_version, from_attributes=True)
 
 
 @router.get("/{component_id}/data", response_model=ComponentDataResponseModel)
-def get_component_data_edpt(component_id: int, version: int | None = None, db: Session = Depends(get_db)):
-    component = get_component_by_id(db, component_id)
+async def get_component_data_edpt(component_id: int, version: int | None = None, db: AsyncSession = Depends(get_db)):
+    component = await db.run_sync(get_component_by_id, component_id)
 
     if component is None:
         raise HTTPException(HTTPStatus.NOT_FOUND, detail="Component with id = {component_id} does not exist")
     
-    if not component.component_versions:
+    component_versions = await db.run_sync(get_component_versions, component_id)
+    if not component_versions:
         raise HTTPException(HTTPStatus.NOT_FOUND, detail="RF data for component with id = {component_id} does not exist")
     
     if version is not None:
-        component_version = next((cv for cv in component.component_versions if cv.version == version), None)
+        component_version = next((cv for cv in component_versions if cv.version == version), None)
     else:
-        component_version = max(component.component_versions, key=lambda cv: cv.version, default=None)
+        component_version = max(component_versions, key=lambda cv: cv.version, default=None)
     
     if component_version is None:
         raise HTTPException(HTTPStatus.NOT_FOUND, detail="Version = {version} does not exist for component with id = {component_id}")
@@ -119,73 +212,31 @@ def get_component_data_edpt(component_id: int, version: int | None = None, db: S
 
 
 @router.get("/{component_id}/versions", response_model=list[ComponentVersionResponseModel])
-def get_component_versions_edpt(component_id: int, db: Session = Depends(get_db)):
+async def get_component_versions_edpt(component_id: int, db: AsyncSession = Depends(get_db)):
     """Get versions of component with `component_id`"""
-    component = db.query(Component).filter(Component.id == component_id).one_or_none()
+    component = await db.run_sync(get_component_by_id, component_id)
     if component is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"Component with ID: {component_id} not found")
-    component_versions = [ComponentVersionResponseModel.model_validate(component_version) for component_version in component.component_versions]
+    component_versions = [ComponentVersionResponseModel.model_validate(component_version) for component_version in await db.run_sync(get_component_versions, component_id)]
     return component_versions
 
 
 @router.post("/{component_id}/versions", response_model=ComponentVersionResponseModel)
-def post_component_version(component_id: int, body: ComponentVersionInputModel, db: Session = Depends(get_db)):
+async def post_component_version(component_id: int, body: ComponentVersionInputModel, db: AsyncSession = Depends(get_db)):
     """Create version for component with `component_id`"""
-    version = db.query(func.max(ComponentVersion.version)).filter(ComponentVersion.component_id == component_id).scalar()
+    version = await db.scalar(select(func.max(ComponentVersion.version)).where(ComponentVersion.component_id == component_id))
     if version is None:
         version = 0
     version = version + 1
     component_version = ComponentVersion(**body.model_dump(), component_id = component_id, is_verified = False, version = version)
     try:
         db.add(component_version)
-        db.flush()  # Needed to get the autoincremented id into the radio object
+        await db.flush()  # Needed to get the autoincremented id into the radio object
         component_version = ComponentVersionResponseModel.model_validate(component_version)
     except IntegrityError as e:
         err_msg = str(e)
 
         # If it wasn't a unique or foreign key constraint, something else went wrong
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=err_msg)
-    db.commit()
+    await db.commit()
     return component_version
-
-
-@router.get("/types", response_model=list[ComponentTypeResponseModel])
-def get_component_types_edpt(db: Session = Depends(get_db)):
-    """Get component types"""
-    component_types = get_component_types(db=db)
-    component_types = [ComponentTypeResponseModel.model_validate(component_type) for component_type in component_types]
-    return component_types
-
-
-@router.post("/types", status_code=HTTPStatus.CREATED, response_model=ComponentTypeResponseModel)
-def post_component_type_edpt(body: ComponentTypeInputModel, db: Session = Depends(get_db)):
-    """Create a component type"""
-    component_type = ComponentType(**body.model_dump())
-    
-    try:
-        component_type = add_component_type(db=db,comp_type=component_type)
-        component_type = ComponentTypeResponseModel.model_validate(component_type)
-    except IntegrityError as e:
-        err_msg = str(e)
-
-        # If the type already exists, raise a 409 Conflict
-        if "UniqueViolation" in err_msg:
-            raise HTTPException(status_code=HTTPStatus.CONFLICT, detail=f"Component of type: {component_type.type} already exists")
-
-        # If it wasn't a unique or foreign key constraint, something else went wrong
-        raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=err_msg)
-    return component_type
-
-
-@router.delete("/types", status_code=HTTPStatus.NO_CONTENT)
-def delete_component_types_edpt(db: Session = Depends(get_db)):
-    delete_component_types(db=db)
-    return
-
-
-@router.delete("/types/{type_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_component_type_edpt(type_id: int, db: Session = Depends(get_db)):
-    success = delete_component_type(db=db, type_id=type_id)
-    if not success:
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"Component type with ID: {type_id} not found")
-    return
\ No newline at end of file
@@ -0,0 +1,80 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db, engine
+from app.database.models.jobs import *
+from app.crud.crud_jobs import *
+from app.utils.jobs import job_queue, start_job, JobQueueFullError
+from app.utils.touchstone import remove_upload
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("", response_model=list[JobSummaryModel])
+async def get_jobs_edpt(status: JobStatus | None = None, db: AsyncSession = Depends(get_db)):
+    """Get all analysis jobs, optionally only those with `status`"""
+    jobs = await db.run_sync(get_jobs, status)
+    return [JobSummaryModel.model_validate(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=JobResponseModel)
+async def get_job_edpt(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Get status, progress and (once succeeded) the result of job with `job_id`"""
+    job = await db.run_sync(get_job_by_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No job found with job ID: {job_id}")
+    return JobResponseModel.model_validate(job)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponseModel)
+async def cancel_job_edpt(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Cancel job with `job_id` if it is still queued or running"""
+    job = await db.run_sync(get_job_by_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No job found with job ID: {job_id}")
+
+    job_queue.cancel(job_id)
+    cancelled = await db.run_sync(update_job, job_id, status="cancelled", finished_at=func.current_timestamp())
+    await db.commit()
+    await db.refresh(job)
+    if not cancelled:
+        raise HTTPException(status_code=HTTPStatus.CONFLICT, detail=f"Job with job ID: {job_id} already {job.status}")
+    return JobResponseModel.model_validate(job)
+
+
+@router.delete("/{job_id}", status_code=HTTPStatus.NO_CONTENT)
+async def delete_job_edpt(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete job with `job_id`, cancelling it first if it is still queued or running
+
+    An import's upload is only removed once no work unit can still be reading it, so this waits
+    for running units here and responds 409 while another process may still be running them.
+    """
+    await run_in_threadpool(job_queue.cancel, job_id, True)
+    job = await db.run_sync(get_job_by_id, job_id)
+    if job is not None and job.kind == "touchstone_import":
+        if job_queue.holds_elsewhere(job):
+            await db.run_sync(update_job, job_id, status="cancelled", finished_at=func.current_timestamp())
+            await db.commit()
+            raise HTTPException(status_code=HTTPStatus.CONFLICT, detail=f"Job with job ID: {job_id} is being cancelled in another process, retry shortly")
+        remove_upload(job.request["source"])
+    deleted = await db.run_sync(delete_job, job_id)
+    if deleted:
+        await db.commit()
+
+
+async def submit_job(db: AsyncSession, kind: str, request: PydanticBase, path_id: int | None = None, project_id: int | None = None) -> JSONResponse:
+    """Start an analysis job for an `?async=true` request and respond 202 with the job"""
+    try:
+        # The queue writes progress from its own threads, so it gets the sync engine
+        job = await db.run_sync(start_job, kind, request, path_id=path_id, project_id=project_id, engine=engine)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=str(e))
+    content = JobResponseModel.model_validate(job).model_dump(mode="json")
+    return JSONResponse(status_code=HTTPStatus.ACCEPTED, content=content)
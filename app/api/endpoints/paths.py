@@ -1,8 +1,13 @@
 from http import HTTPStatus
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException, Depends
+import numpy as np
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select, null, func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from app.database import get_db
@@ -11,26 +16,39 @@ from app.database.models.stackups import *
 from app.database.models.projects import *
 from app.crud.crud_paths import *
 from app.crud.crud_projects import _update_project_modified_at
-from app.utils.rfcascade import analyze, AnalysisParamsModel
+from app.crud.pagination import select_fields
+from app.api.endpoints.jobs import submit_job
+from app.api.pagination import page_response
+from app.utils.cache import result_cache, analysis_key, invalidate_paths
+from app.utils.montecarlo import monte_carlo, MonteCarloInputModel, MonteCarloResultsModel
+from app.utils.sweep import sweep, SweepInputModel, SweepResultsModel
+from app.utils.encoding import ARROW_MEDIA_TYPE, NPY_MEDIA_TYPE, arrow_available, arrow_metadata, encode_arrow, encode_npy, negotiate
+from app.utils.rfcascade import analyze, analyze_arrays, analyze_batch, analyze_stream, frequency_ranges, stage_valid_mask, RESULT_FIELDS, STREAM_CHUNK_POINTS, AnalysisParamsModel, BatchAnalysisInputModel, CascadeResultsModel, PathResultsModel, BatchResultsModel
 
 router = APIRouter(prefix='/paths', tags=["Paths"])
 
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 
 @router.get("", response_model=list[PathResponseModel])
-def get_paths_edpt(db: Session = Depends(get_db)):
-    """Get all paths"""
-    paths = get_paths(db=db)
-    paths = [PathResponseModel.model_validate(path) for path in paths]
-    return paths
+async def get_paths_edpt(params: Annotated[PathListParamsModel, Query()], db: AsyncSession = Depends(get_db)):
+    """Get a page of paths, optionally of one project, the next page's cursor is in `X-Next-Cursor`"""
+    try:
+        fields = select_fields(Path, PathResponseModel, params.fields)
+        paths, next_cursor = await db.run_sync(get_paths_page, params, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return page_response(paths, next_cursor, PathResponseModel, fields)
 
 
 @router.post("", status_code=HTTPStatus.CREATED, response_model=PathResponseModel)
-def post_path_edpt(path: PathInputModel, db: Session = Depends(get_db)):
+async def post_path_edpt(path: PathInputModel, db: AsyncSession = Depends(get_db)):
     """Create a Path"""
     path = Path(**path.model_dump())
     try:
-        path = add_path(db=db,path=path)
-        db.commit()
+        path = await db.run_sync(add_path, path)
+        await db.commit()
     except IntegrityError as e:
         err_msg = str(e)
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=err_msg)
@@ -39,17 +57,38 @@ def post_path_edpt(path: PathInputModel, db: Session = Depends(get_db)):
 
 
 @router.delete("", status_code=HTTPStatus.NO_CONTENT)
-def delete_all_paths_edpt(db: Session = Depends(get_db)):
+async def delete_all_paths_edpt(db: AsyncSession = Depends(get_db)):
     """Delete all paths"""
-    delete_paths(db=db)
-    db.commit()
+    await db.run_sync(delete_paths)
+    await db.commit()
     return
 
 
+@router.post("/analyze", response_model=BatchResultsModel)
+async def analyze_paths_edpt(body: BatchAnalysisInputModel, run_async: bool = Query(default=False, alias="async"), db: AsyncSession = Depends(get_db)):
+    """Perform cascade analysis for every path in `path_ids` on a shared frequency grid, given once as `freq`
+
+    With `?async=true` the analysis runs as a background job and the job is returned instead.
+    """
+    path_ids = list(dict.fromkeys(body.path_ids))
+    missing = set(path_ids) - set(await db.run_sync(get_path_ids, path_ids=path_ids))
+    if missing:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No paths found with path IDs: {sorted(missing)}")
+    if run_async:
+        return await submit_job(db, "batch", body)
+
+    stackups = await db.run_sync(get_stackups_by_path, path_ids)
+    freqs, results = await run_in_threadpool(analyze_batch, list(stackups.values()), body.params)
+    return BatchResultsModel.model_construct(
+        freq=freqs.tolist(),
+        paths=[PathResultsModel.model_construct(path_id=path_id, **dict(result)) for path_id, result in zip(stackups, results)],
+    )
+
+
 @router.get("/{path_id}", response_model=PathResponseModel)
-def get_path_edpt(path_id: int, db: Session = Depends(get_db)):
+async def get_path_edpt(path_id: int, db: AsyncSession = Depends(get_db)):
     """Get path with `path_id` from project with `project_id`"""
-    path = get_path_by_id(db,path_id)
+    path = await db.run_sync(get_path_by_id, path_id)
     if path is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No Path found with ID: {path_id}")
     path = PathResponseModel.model_validate(path)
@@ -57,32 +96,34 @@ def get_path_edpt(path_id: int, db: Session = Depends(get_db)):
 
 
 @router.patch("/{path_id}", response_model=PathResponseModel)
-def patch_path_edpt(path_id: int, body: PathPatchModel, db: Session = Depends(get_db)):
+async def patch_path_edpt(path_id: int, body: PathPatchModel, db: AsyncSession = Depends(get_db)):
     """Update path with `path_id`"""
     
-    path = get_path_by_id(db,path_id)
+    path = await db.run_sync(get_path_by_id, path_id)
     if path is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No Path found with ID: {path_id}")
     
-    path = update_path(db,path,body)
+    path = await db.run_sync(update_path, path, body)
     if not path:
         # If it wasn't a unique or foreign key constraint, something else went wrong
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
-    db.commit()
+    await db.commit()
+    await db.refresh(path)
     return PathResponseModel.model_validate(path)
 
 @router.delete("/{path_id}", status_code=HTTPStatus.NO_CONTENT)
-def delete_path_edpt(path_id: int, db: Session = Depends(get_db)):
+async def delete_path_edpt(path_id: int, db: AsyncSession = Depends(get_db)):
     """Delete path with `path_id`"""
-    deleted = delete_path(db, path_id)
+    deleted = await db.run_sync(delete_path, path_id)
     if deleted:
-        db.commit()
+        await db.commit()
+        invalidate_paths(path_id)
 
 
 @router.get("/{path_id}/stackup", response_model=list[StackupResponseModel])
-def get_path_stackup_edpt(path_id: int, db: Session = Depends(get_db)):
+async def get_path_stackup_edpt(path_id: int, db: AsyncSession = Depends(get_db)):
     """Get stackup from path with `path_id`"""
-    path = get_path_by_id(db,path_id)
+    path = await db.run_sync(get_path_with_stackup, path_id)
     if path is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No Path found with ID: {path_id}")
 
@@ -91,47 +132,161 @@ def get_path_stackup_edpt(path_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{path_id}/stackup", status_code=HTTPStatus.CREATED, response_model=list[StackupResponseModel])
-def create_stackup_edpt(path_id: int, body: list[StackupInputModel], db: Session = Depends(get_db)):
+async def create_stackup_edpt(path_id: int, body: list[StackupInputModel], db: AsyncSession = Depends(get_db)):
     """Create a stackup on path with `path_id`"""
-    # Query for existing stackups on the given path
-    path = get_path_by_id(db,path_id)
-    if path:
-        path.stackups = []
-        db.flush()
-    
-    for stackup_body in body:
-        stackup = Stackup(**stackup_body.model_dump(), path_id=path_id)
-        path.stackups.append(stackup)
-        db.flush()
-
-        if len(path.stackups) > 1:
-            path.stackups[-2].next_stackup_id = stackup.id
-            db.flush()
-    
+    path = await db.run_sync(get_path_by_id, path_id)
+    if path is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No path found with path ID: {path_id}")
+
+    component_version_ids = [stackup_body.component_version_id for stackup_body in body]
+    missing = await db.run_sync(get_missing_component_version_ids, component_version_ids)
+    if missing:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No component versions found with IDs: {sorted(missing)}")
+
+    await db.run_sync(replace_path_stackup, path_id, component_version_ids)
     path.modified_at = func.current_timestamp()
-    _update_project_modified_at(db,project_ids=path.project_id)
-    db.commit()       
-    
+    await db.run_sync(_update_project_modified_at, project_ids=path.project_id)
+    await db.commit()
+    invalidate_paths(path_id)
+
+    path = await db.run_sync(get_path_with_stackup, path_id)
     stackups = [StackupResponseModel.model_validate(stackup) for stackup in path.stackups]
     return stackups
 
 @router.delete("/{path_id}/stackup",status_code=HTTPStatus.NO_CONTENT)
-def delete_path_stackups_edpt(path_id: int, db: Session = Depends(get_db)):
+async def delete_path_stackups_edpt(path_id: int, db: AsyncSession = Depends(get_db)):
     """Delete stackup for path with `path_id`"""
-    path = get_path_by_id(db,path_id)
+    path = await db.run_sync(get_path_by_id, path_id)
     if not path:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No path found with path ID: {path_id}")
-    
-    path.stackups = []
-    db.commit()        
-    
-@router.post("/{path_id}/analyze")
-def analzye_path(path_id: int, params: AnalysisParamsModel, db: Session = Depends(get_db)):
-    """Perform cascade analysis for a path with `path_id`"""
-    path = get_path_by_id(db,path_id)
+
+    await db.run_sync(delete_path_stackup, path_id)
+    await db.commit()
+    invalidate_paths(path_id)
+
+
+@router.post("/{path_id}/analyze", response_model=CascadeResultsModel)
+async def analzye_path(path_id: int, params: AnalysisParamsModel, run_async: bool = Query(default=False, alias="async"), chunk_points: int = Query(default=STREAM_CHUNK_POINTS, gt=0), dtype: Literal["float64", "float32"] = "float64", fields: str | None = None, accept: str | None = Header(default=None), if_none_match: str | None = Header(default=None), db: AsyncSession = Depends(get_db)):
+    """Perform cascade analysis for a path with `path_id`
+
+    The response carries an `ETag` identifying the stackup data, params and representation, so an
+    unchanged analysis can be revalidated with `If-None-Match` for a 304 instead of the full
+    results. With `?async=true` the analysis runs as a background job and the job is returned
+    instead. The format is the one the `Accept` header prefers by q-value, 406 if it accepts none:
+    - `application/json` (default): CascadeResultsModel
+    - `application/x-ndjson`: streamed as computed, one line per `chunk_points` frequencies
+      followed by a summary line
+    - `application/vnd.apache.arrow.stream`: Arrow IPC stream with one row per frequency and a
+      fixed-size list per stage for each result, snr_violations and out_of_band in the schema
+      metadata
+    - `application/x-npy`: concatenated .npy frames named in the `X-Npy-Arrays` header, the
+      1-D `freq` grid first, then a (stages x freqs) array per result and snr_violations and
+      out_of_band as (stage, start_freq, stop_freq) rows
+
+    Binary formats use `dtype` and can be limited to the comma-separated result `fields`.
+    """
+    path = await db.run_sync(get_path_by_id, path_id)
     if path is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No path found with path ID: {path_id}")
-    
-    results = analyze(path.stackups,params.start_freq,params.stop_freq,params.points_per_mhz)
+    if run_async:
+        return await submit_job(db, "analyze", params, path_id=path_id)
+
+    supported = [JSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE, *([ARROW_MEDIA_TYPE] if arrow_available() else []), NPY_MEDIA_TYPE]
+    media_type = negotiate(accept, supported)
+    if media_type is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_ACCEPTABLE, detail=f"None of the accepted media types are available, choose from: {supported}")
+    result_fields = list(RESULT_FIELDS) if fields is None else fields.split(",")
+    unknown = set(result_fields) - set(RESULT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=f"Unknown result fields: {sorted(unknown)}")
+
+    stages = await db.run_sync(get_stackup_revisions, path_id)
+    version_ids = tuple(stage[0] for stage in stages)
+    key = analysis_key(stages,params)
+    if media_type == NDJSON_MEDIA_TYPE:
+        key += f"-ndjson-{chunk_points}"
+    elif media_type != JSON_MEDIA_TYPE:
+        key += f"-{'arrow' if media_type == ARROW_MEDIA_TYPE else 'npy'}-{dtype}-{'+'.join(result_fields)}"
+    etag = f'"{key}"'
+    if if_none_match and _etag_matches(if_none_match,etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
+
+    if media_type == NDJSON_MEDIA_TYPE:
+        path = await db.run_sync(get_path_with_stackup, path_id)
+        # A sync generator, Starlette computes each chunk on the threadpool
+        return StreamingResponse(analyze_stream(path.stackups,params,chunk_points), media_type=NDJSON_MEDIA_TYPE, headers={"ETag": etag})
+
+    headers = {"ETag": etag}
+    if media_type == NPY_MEDIA_TYPE:
+        headers["X-Npy-Arrays"] = ",".join(["freq", *result_fields, "snr_violations", "out_of_band"])
+
+    cache_key = (path_id, version_ids, key)
+    content = result_cache.get(cache_key)
+    if content is None:
+        path = await db.run_sync(get_path_with_stackup, path_id)
+        if media_type == JSON_MEDIA_TYPE:
+            content = await run_in_threadpool(_encode_json, path.stackups, params)
+        else:
+            content = await run_in_threadpool(_encode_results, media_type, path.stackups, params, dtype, result_fields)
+        result_cache.put(cache_key, content, len(content))
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+@router.post("/{path_id}/analyze/monte-carlo", response_model=MonteCarloResultsModel)
+async def monte_carlo_path_edpt(path_id: int, body: MonteCarloInputModel, run_async: bool = Query(default=False, alias="async"), db: AsyncSession = Depends(get_db)):
+    """Perform a Monte Carlo tolerance analysis for a path with `path_id`"""
+    path = await db.run_sync(get_path_with_stackup, path_id)
+    if path is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No path found with path ID: {path_id}")
+    if run_async:
+        return await submit_job(db, "monte_carlo", body, path_id=path_id)
+
+    try:
+        results = await run_in_threadpool(monte_carlo, path.stackups, body.params, body.monte_carlo, parallel=True)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return results
+
+
+@router.post("/{path_id}/analyze/sweep", response_model=SweepResultsModel)
+async def sweep_path_edpt(path_id: int, body: SweepInputModel, run_async: bool = Query(default=False, alias="async"), db: AsyncSession = Depends(get_db)):
+    """Search the states of the variable components on a path with `path_id` for settings meeting the targets"""
+    path = await db.run_sync(get_path_with_stackup, path_id)
+    if path is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No path found with path ID: {path_id}")
+    if run_async:
+        return await submit_job(db, "sweep", body, path_id=path_id)
+
+    try:
+        results = await run_in_threadpool(sweep, path.stackups, body.params, body)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
     return results
-    
\ No newline at end of file
+
+
+def _encode_json(stackup: list[Stackup], params: AnalysisParamsModel) -> bytes:
+    return analyze(stackup,params).model_dump_json().encode()
+
+
+def _encode_results(media_type: str, stackup: list[Stackup], params: AnalysisParamsModel, dtype: str, fields: list[str]) -> bytes:
+    """Cascade analysis of `stackup` as an Arrow IPC stream or .npy frames"""
+    freqs, casc = analyze_arrays(stackup,params)
+    ranges = {
+        "snr_violations": frequency_ranges(casc["snr"] < params.min_snr, freqs),
+        "out_of_band": frequency_ranges(~stage_valid_mask(stackup,freqs), freqs),
+    }
+    results = {field: casc[field] for field in fields}
+    if media_type == ARROW_MEDIA_TYPE:
+        metadata = arrow_metadata(num_stages=len(stackup), **{name: [r.model_dump() for r in found] for name, found in ranges.items()})
+        return encode_arrow(freqs, results, dtype, metadata)
+
+    ranges = {name: np.array([(r.stage, r.start_freq, r.stop_freq) for r in found], dtype=np.int64).reshape(-1, 3) for name, found in ranges.items()}
+    return encode_npy({"freq": freqs, **{field: values.astype(dtype) for field, values in results.items()}, **ranges})
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an `If-None-Match` header against `etag` (weak comparison)"""
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags
@@ -1,41 +1,51 @@
 from http import HTTPStatus
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from app.database import get_db
 from app.database.models.projects import *
 from app.database.models.paths import *
 from app.crud.crud_projects import *
+from app.crud.crud_paths import get_path_ids, get_stackups_by_path
+from app.crud.pagination import select_fields
+from app.api.endpoints.jobs import submit_job
+from app.api.pagination import page_response
+from app.utils.rfcascade import analyze_batch, AnalysisParamsModel, PathResultsModel, BatchResultsModel
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
 
 @router.get("", response_model=list[ProjectResponseModel], summary="Get all projects")
-def get_projects_edpt(db: Session = Depends(get_db)):
-    """Get all projects"""
-    projects = get_projects(db=db)
-    projects = [ProjectResponseModel.model_validate(project) for project in projects]
-    return projects
+async def get_projects_edpt(params: Annotated[PageParamsModel, Query()], db: AsyncSession = Depends(get_db)):
+    """Get a page of projects, the next page's cursor is in `X-Next-Cursor`"""
+    try:
+        fields = select_fields(Project, ProjectResponseModel, params.fields)
+        projects, next_cursor = await db.run_sync(get_projects_page, params, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(e))
+    return page_response(projects, next_cursor, ProjectResponseModel, fields)
 
 
 @router.delete("", status_code=HTTPStatus.NO_CONTENT, summary="Delete all projects")
-def delete_projects_edpt(db: Session = Depends(get_db)):
+async def delete_projects_edpt(db: AsyncSession = Depends(get_db)):
     """Delete all projects"""
-    delete_projects(db=db)
-    db.commit()
+    await db.run_sync(delete_projects)
+    await db.commit()
     return
 
 
 @router.post("", status_code=HTTPStatus.CREATED, response_model=ProjectResponseModel, summary="Create a new project")
-def post_project_edpt(body: ProjectInputModel, db: Session = Depends(get_db)):
+async def post_project_edpt(body: ProjectInputModel, db: AsyncSession = Depends(get_db)):
     """Create a project"""
     project = Project(**body.model_dump())
     try:
-        project = add_project(db=db,project=project)
-        db.commit()
+        project = await db.run_sync(add_project, project)
+        await db.commit()
     except IntegrityError as e:
         err_msg = str(e)
 
@@ -51,23 +61,23 @@ def post_project_edpt(body: ProjectInputModel, db: Session = Depends(get_db)):
 
 
 @router.get("/{project_id}", response_model=ProjectResponseModel, summary="Get a project by ID")
-def get_project_edpt(project_id: int, db: Session = Depends(get_db)):
+async def get_project_edpt(project_id: int, db: AsyncSession = Depends(get_db)):
     """Get project with `project_id`"""
-    project = get_project_by_id(db=db,project_id=project_id)
+    project = await db.run_sync(get_project_by_id, project_id)
     if project is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No project found with project ID: {project_id}")
     return ProjectResponseModel.model_validate(project)
 
 
 @router.patch("/{project_id}", status_code=HTTPStatus.CREATED, response_model=ProjectResponseModel, summary="Update a project by ID")
-def patch_project_edpt(project_id: int, updated_project: ProjectPatchModel, db: Session = Depends(get_db)):
+async def patch_project_edpt(project_id: int, updated_project: ProjectPatchModel, db: AsyncSession = Depends(get_db)):
     """Update project with `project_id`"""
-    project = get_project_by_id(db,project_id)
+    project = await db.run_sync(get_project_by_id, project_id)
     if project is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No project found with project ID: {project_id}")
     try:
-        project = update_project(db=db,project=project,project_patch=updated_project)
-        db.commit()
+        project = await db.run_sync(update_project, project, updated_project)
+        await db.commit()
     except IntegrityError as e:
         err_msg = str(e)
 
@@ -81,33 +91,55 @@ def patch_project_edpt(project_id: int, updated_project: ProjectPatchModel, db:
 
 
 @router.delete("/{project_id}", status_code=HTTPStatus.NO_CONTENT, summary="Delete a project by ID")
-def delete_project_edpt(project_id: int, db: Session = Depends(get_db)):
+async def delete_project_edpt(project_id: int, db: AsyncSession = Depends(get_db)):
     """Delete project with `project_id`"""
-    deleted = delete_project(db=db,project_id=project_id)
+    deleted = await db.run_sync(delete_project, project_id)
     if deleted:
-        db.commit()
+        await db.commit()
     return
 
 
 @router.get("/{project_id}/paths", response_model=list[PathResponseModel], summary="Get all paths for a project")
-def get_project_paths_edpt(project_id: int, db: Session = Depends(get_db)):
+async def get_project_paths_edpt(project_id: int, db: AsyncSession = Depends(get_db)):
     """Get paths for project with `project_id`"""
-    project = get_project_by_id(db=db,project_id=project_id)
+    project = await db.run_sync(get_project_by_id, project_id)
     if project is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No project found with project ID: {project_id}")
-    paths = [PathResponseModel.model_validate(path) for path in project.paths]
+    paths = [PathResponseModel.model_validate(path) for path in await project.awaitable_attrs.paths]
     return paths
 
 
 @router.delete("/{project_id}/paths", status_code=HTTPStatus.NO_CONTENT, summary="Delete all the paths for a project")
-def delete_project_paths_edpt(project_id: int, db: Session = Depends(get_db)):
+async def delete_project_paths_edpt(project_id: int, db: AsyncSession = Depends(get_db)):
     """Delete paths for project with `project_id`"""
-    project = get_project_by_id(db=db,project_id=project_id)
+    project = await db.run_sync(get_project_by_id, project_id)
     if project is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No project found with project ID: {project_id}")
     
-    # Delete associated paths for project
+    # Delete associated paths for project, the old collection is loaded first to orphan its paths
+    await project.awaitable_attrs.paths
     project.paths = []
     project.modified_at = func.current_timestamp()
-    db.commit()
-    return
\ No newline at end of file
+    await db.commit()
+    return
+
+
+@router.post("/{project_id}/analyze", response_model=BatchResultsModel, summary="Analyze all the paths for a project")
+async def analyze_project_paths_edpt(project_id: int, params: AnalysisParamsModel, run_async: bool = Query(default=False, alias="async"), db: AsyncSession = Depends(get_db)):
+    """Perform cascade analysis for every path in project with `project_id`
+
+    With `?async=true` the analysis runs as a background job and the job is returned instead.
+    """
+    project = await db.run_sync(get_project_by_id, project_id)
+    if project is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"No project found with project ID: {project_id}")
+    if run_async:
+        return await submit_job(db, "project", params, project_id=project_id)
+
+    path_ids = await db.run_sync(get_path_ids, project_id=project_id)
+    stackups = await db.run_sync(get_stackups_by_path, path_ids)
+    freqs, results = await run_in_threadpool(analyze_batch, list(stackups.values()), params)
+    return BatchResultsModel.model_construct(
+        freq=freqs.tolist(),
+        paths=[PathResultsModel.model_construct(path_id=path_id, **dict(result)) for path_id, result in zip(stackups, results)],
+    )
\ No newline at end of file
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from app.database import engine, async_engine, pool_status, pool_waits
+from app.database.models.status import *
+
+router = APIRouter(prefix="/status", tags=["Status"])
+
+
+@router.get("/db", response_model=DatabaseStatusModel)
+async def get_db_status_edpt():
+    """Get the connections of each engine's pool and how long requests have waited for one"""
+    pools = {"async": pool_status(async_engine), "sync": pool_status(engine)}
+    return DatabaseStatusModel(
+        pools={name: pool for name, pool in pools.items() if pool is not None},
+        pool_wait=pool_waits.model(),
+    )
@@ -0,0 +1,24 @@
+import json
+from functools import lru_cache
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel as PydanticBase, TypeAdapter
+
+def page_response(rows: list, next_cursor: str | None, response_model: type[PydanticBase], fields: list[str] | None = None) -> Response:
+    """JSON response for a page of rows from `get_page` with the next page's cursor in `X-Next-Cursor`
+
+    Full rows are validated and serialized as `response_model` in one pass; rows of only
+    `fields` are sent as they are.
+    """
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else {}
+    if fields is None:
+        adapter = _list_adapter(response_model)
+        content = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    else:
+        content = json.dumps(jsonable_encoder(rows)).encode()
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@lru_cache
+def _list_adapter(response_model: type[PydanticBase]) -> TypeAdapter:
+    return TypeAdapter(list[response_model])
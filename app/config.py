@@ -1,21 +1,36 @@
+import os
+import tempfile
 from functools import cached_property
 
-from pydantic import PostgresDsn, computed_field, Field
+from pydantic import PostgresDsn, computed_field, model_validator
 from pydantic_settings import BaseSettings
 
 
 class Config(BaseSettings):
     API_PREFIX: str = "/api"
 
+    # Database, overrides the Postgres params when set, e.g. sqlite:///rfcascade.db or sqlite:// for in-memory
+    DATABASE_URL: str | None = None
+
     # Postgres Params
-    POSTGRES_HOST: str = Field(default=...)
-    POSTGRES_USER: str = Field(default=...)
-    POSTGRES_PASSWORD: str = Field(default=...)
-    POSTGRES_DB: str = Field(default=...)
+    POSTGRES_HOST: str | None = None
+    POSTGRES_USER: str | None = None
+    POSTGRES_PASSWORD: str | None = None
+    POSTGRES_DB: str | None = None
+
+    @model_validator(mode="after")
+    def validate_database(self):
+        if self.DATABASE_URL is None:
+            missing = [name for name in ("POSTGRES_HOST", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB") if getattr(self, name) is None]
+            if missing:
+                raise ValueError(f"Set DATABASE_URL or all of: {missing}")
+        return self
 
     @computed_field
     @cached_property
-    def POSTGRES_URL(self) -> str:
+    def POSTGRES_URL(self) -> str | None:
+        if self.POSTGRES_HOST is None:
+            return None
         return str(PostgresDsn.build(
             scheme="postgresql+psycopg",
             username=self.POSTGRES_USER,
@@ -24,9 +39,43 @@ class Config(BaseSettings):
             path=self.POSTGRES_DB,
         ))
 
+    @computed_field
+    @cached_property
+    def DB_URL(self) -> str:
+        """DATABASE_URL, or the Postgres URL built from the Postgres params"""
+        return self.DATABASE_URL or self.POSTGRES_URL
+
+    # Connection Pool, applied to the sync and the async engine separately
+    DB_POOL_SIZE: int = 5 # Connections kept open
+    DB_MAX_OVERFLOW: int = 10 # Connections opened beyond DB_POOL_SIZE under load and closed once returned
+    DB_POOL_TIMEOUT: float = 30 # Seconds a request waits for a connection before failing with 503
+    DB_POOL_RECYCLE: int = 1800 # Seconds before a connection is replaced, -1 to keep them indefinitely
+    DB_POOL_PRE_PING: bool = True # Test connections on checkout so ones the server dropped are replaced
+    DB_POOL_WAIT_WARN_MS: float = 100 # Log requests that waited longer than this for a connection
+
+    # Postgres Session Settings
+    DB_STATEMENT_TIMEOUT_MS: int = 30000 # statement_timeout for every connection, 0 to disable
+    DB_PREPARE_THRESHOLD: int | None = 5 # Executions before psycopg prepares a query server side, None to disable (e.g. behind pgbouncer)
+    DB_PREPARED_MAX: int = 100 # Prepared statements psycopg keeps per connection
+
+    # Analysis Params
+    CURVE_CACHE_BYTES: int = 256*1024**2
+    RESULT_CACHE_BYTES: int = 512*1024**2
+    MONTE_CARLO_WORKERS: int = 1 # Processes shared by Monte Carlo requests (capped at the CPU count), 1 runs them in the request's thread
+
+    # Analysis Jobs
+    JOB_WORKERS: int = 2 # Worker processes running analysis jobs
+    JOB_QUEUE_DEPTH: int = 32 # Jobs waiting for a worker before new ones are refused
+    JOB_PATHS_PER_UNIT: int = 16 # Paths per work unit of batch and project jobs
+    JOB_HEARTBEAT_SECONDS: float = 10 # How often a process marks its jobs alive and looks for orphaned ones
+    JOB_STALE_SECONDS: float = 60 # Jobs not marked alive for this long are taken over by another process
+
+    # Touchstone Imports
+    IMPORT_DIR: str = os.path.join(tempfile.gettempdir(), "rf-cascade-imports") # Uploads kept until their job is deleted
+
     # WARNING! Used to clear the database when running the API
     # Used for development
-    CLEAR_DB: bool = Field(default=...)
+    CLEAR_DB: bool = False
 
 
 config = Config()
\ No newline at end of file
@@ -1,6 +1,8 @@
 from sqlalchemy import select, delete
 from sqlalchemy.orm import Session
 from app.database.models.components import *
+from app.database.models.pagination import PageParamsModel
+from app.crud.pagination import get_page
 
 def add_component_type(db: Session, comp_type: ComponentType) -> ComponentType:
     try:
@@ -17,6 +19,9 @@ def get_component_types(db: Session) -> List[ComponentType]:
     comp_types = db.execute(stmt).scalars().all()
     return comp_types
 
+def get_component_types_page(db: Session, params: PageParamsModel, fields: list[str] | None = None) -> tuple[list, str | None]:
+    return get_page(db, ComponentType, params, fields=fields)
+
 def delete_component_types(db: Session) -> None:
     stmt = delete(ComponentType)
     db.execute(stmt)
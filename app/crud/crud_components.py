@@ -1,12 +1,14 @@
-from sqlalchemy import select, delete
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, update, and_
+from sqlalchemy.orm import Session, joinedload
 from app.database.models.components import *
+from app.crud.pagination import get_page
+from app.utils.summaries import summarize_component_data
 
 def add_component(db: Session, comp: Component) -> Component:
     try:
         db.add(comp)
         db.commit()
-        db.refresh(comp)
+        db.refresh(comp, ["type", *Component.__table__.c.keys()])
     except Exception as e:
         db.rollback()
         raise e
@@ -17,32 +19,128 @@ def get_components(db: Session) -> list[Component]:
     components = db.execute(stmt).scalars().all()
     return components
 
+def get_components_page(db: Session, params: ComponentListParamsModel, fields: list[str] | None = None) -> tuple[list, str | None]:
+    """One page of components matching the filters in `params` and the cursor of the next page"""
+    criteria = []
+    if params.component_type_id is not None:
+        criteria.append(Component.component_type_id == params.component_type_id)
+    if params.manufacturer is not None:
+        criteria.append(Component.manufacturer == params.manufacturer)
+    if params.is_active is not None:
+        criteria.append(Component.is_active == params.is_active)
+    if params.is_variable is not None:
+        criteria.append(Component.is_variable == params.is_variable)
+    if params.min_freq is not None:
+        criteria.append(Component.stop_freq >= params.min_freq)
+    if params.max_freq is not None:
+        criteria.append(Component.start_freq <= params.max_freq)
+    return get_page(db, Component, params, *criteria, fields=fields, options=(joinedload(Component.type),))
+
+def get_component_search_page(db: Session, params: ComponentSearchParamsModel, fields: list[str] | None = None) -> tuple[list, str | None]:
+    """One page of components whose latest version summary meets the filters in `params` and the cursor of the next page"""
+    criteria = []
+    if params.component_type_id is not None:
+        criteria.append(Component.component_type_id == params.component_type_id)
+    if params.manufacturer is not None:
+        criteria.append(Component.manufacturer == params.manufacturer)
+    if params.is_active is not None:
+        criteria.append(Component.is_active == params.is_active)
+    # Analysis only uses a stage where both its operating band and its data cover the frequency
+    if params.min_freq is not None:
+        criteria.append(Component.start_freq <= params.min_freq)
+    if params.max_freq is not None:
+        criteria.append(Component.stop_freq >= params.max_freq)
+
+    summary = [ComponentVersionSummary.is_latest]
+    if params.min_freq is not None:
+        summary.append(ComponentVersionSummary.band_start <= params.min_freq)
+    if params.max_freq is not None:
+        summary.append(ComponentVersionSummary.band_stop >= params.max_freq)
+    if params.min_gain is not None:
+        summary.append(ComponentVersionSummary.gain_min >= params.min_gain)
+    if params.max_gain is not None:
+        summary.append(ComponentVersionSummary.gain_max <= params.max_gain)
+    if params.max_nf is not None:
+        summary.append(ComponentVersionSummary.nf_max <= params.max_nf)
+    if params.min_p1db is not None:
+        summary.append(ComponentVersionSummary.p1db_min >= params.min_p1db)
+    if params.min_ip3 is not None:
+        summary.append(ComponentVersionSummary.ip3_min >= params.min_ip3)
+    criteria.append(Component.summary.has(and_(*summary)))
+    return get_page(db, Component, params, *criteria, fields=fields, options=(joinedload(Component.type), joinedload(Component.summary)))
+
+def add_version_summary(db: Session, component: Component, component_version: ComponentVersion) -> ComponentVersionSummary:
+    """Summarize the data of the new latest `component_version` of `component` for search (not committed)"""
+    stmt = update(ComponentVersionSummary).where(ComponentVersionSummary.component_id == component.id).values(is_latest=False)
+    db.execute(stmt)
+    summary = ComponentVersionSummary(**summarize_component_data(component_version.component_data), component_id=component.id, is_latest=True)
+    component_version.summary = summary
+    return summary
+
+def refresh_component_summaries(db: Session) -> int:
+    """Summarize every component version that has no summary and mark the latest of each component, returns the number added"""
+    stmt = (
+        select(ComponentVersion)
+        .where(~ComponentVersion.summary.has())
+        .options(joinedload(ComponentVersion.component_data))
+    )
+    added = 0
+    for component_version in db.execute(stmt).unique().scalars():
+        component_version.summary = ComponentVersionSummary(
+            **summarize_component_data(component_version.component_data),
+            component_id=component_version.component_id,
+            is_latest=False,
+        )
+        added += 1
+    db.flush()
+
+    latest = (
+        select(ComponentVersion.id)
+        .where(ComponentVersion.component_id == ComponentVersionSummary.component_id)
+        .order_by(ComponentVersion.version.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(update(ComponentVersionSummary).values(is_latest=ComponentVersionSummary.component_version_id == latest))
+    db.commit()
+    return added
+
 def delete_components(db: Session) -> None:
     stmt = delete(ComponentType)
     db.execute(stmt)
     return
 
 def get_component_by_id(db: Session, comp_id: int) -> Component | None:
-    stmt = select(Component).where(Component.id == comp_id)
+    stmt = select(Component).where(Component.id == comp_id).options(joinedload(Component.type))
     component = db.execute(stmt).scalar_one_or_none()
     return component
 
+def get_component_versions(db: Session, comp_id: int) -> list[ComponentVersion]:
+    """Get the versions of component with `comp_id`, oldest first, with their component data loaded"""
+    stmt = (
+        select(ComponentVersion)
+        .where(ComponentVersion.component_id == comp_id)
+        .options(joinedload(ComponentVersion.component_data))
+        .order_by(ComponentVersion.version)
+    )
+    component_versions = db.execute(stmt).scalars().all()
+    return component_versions
+
 def update_component(db: Session, comp_id: int, comp: ComponentPatchModel) -> Component | None:
-    stmt = select(Component).where(Component.id == comp_id)
-    comp = db.execute(stmt).scalar_one_or_none()
-    if comp is None:
+    component = get_component_by_id(db, comp_id)
+    if component is None:
         return None
     
-    [setattr(comp, key, value) for key, value in comp.model_dump().items()]
+    [setattr(component, key, value) for key, value in comp.model_dump(exclude_unset=True).items()]
 
     try:
         db.flush()
         db.commit()
-        db.refresh(comp)
+        db.refresh(component, ["type", *Component.__table__.c.keys()])
     except Exception as e:
         db.rollback()
         raise e
-    return comp
+    return component
 
 def delete_component(db: Session, comp_id: int) -> bool:
     stmt = select(ComponentType).where(ComponentType.id == comp_id)
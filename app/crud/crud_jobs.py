@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from sqlalchemy import select, delete, update, or_
+from sqlalchemy.orm import Session
+from app.database.models.jobs import *
+
+ACTIVE_STATUSES = ("queued", "running")
+
+def add_job(db: Session, job: AnalysisJob) -> AnalysisJob:
+    db.add(job)
+    db.flush()
+    db.refresh(job)
+    return job
+
+def get_jobs(db: Session, status: str | None = None) -> list[AnalysisJob]:
+    stmt = select(AnalysisJob).order_by(AnalysisJob.id)
+    if status is not None:
+        stmt = stmt.where(AnalysisJob.status == status)
+    jobs = db.execute(stmt).scalars().all()
+    return jobs
+
+def get_jobs_by_ids(db: Session, job_ids: list[int]) -> list[AnalysisJob]:
+    stmt = select(AnalysisJob).where(AnalysisJob.id.in_(job_ids)).order_by(AnalysisJob.id)
+    jobs = db.execute(stmt).scalars().all()
+    return jobs
+
+def get_job_by_id(db: Session, job_id: int) -> AnalysisJob | None:
+    stmt = select(AnalysisJob).where(AnalysisJob.id == job_id)
+    job = db.execute(stmt).scalar_one_or_none()
+    return job
+
+def update_job(db: Session, job_id: int, statuses: tuple[str, ...] | None = ACTIVE_STATUSES, **values) -> bool:
+    """Set `values` on job with `job_id` if its status is one of `statuses` (any if None). Returns whether it was updated."""
+    stmt = update(AnalysisJob).where(AnalysisJob.id == job_id).values(**values)
+    if statuses is not None:
+        stmt = stmt.where(AnalysisJob.status.in_(statuses))
+    return db.execute(stmt).rowcount > 0
+
+def claim_jobs(db: Session, worker_id: str, now: datetime, stale_before: datetime) -> list[int]:
+    """Take over active jobs not marked alive since `stale_before` for `worker_id` and requeue them (Does not commit changes)
+
+    The claim is a single conditional UPDATE, so of several processes claiming at once each job
+    goes to exactly one. Returns the IDs of the claimed jobs.
+    """
+    stmt = (
+        update(AnalysisJob)
+        .where(AnalysisJob.status.in_(ACTIVE_STATUSES))
+        .where(or_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.heartbeat_at < stale_before))
+        .values(worker_id=worker_id, heartbeat_at=now, status="queued", progress=0, started_at=None)
+        .returning(AnalysisJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(db.scalars(stmt).all())
+
+def touch_jobs(db: Session, worker_id: str, job_ids: list[int], now: datetime) -> list[int]:
+    """Mark the active jobs of `job_ids` still held by `worker_id` alive, returns their IDs (Does not commit changes)"""
+    stmt = (
+        update(AnalysisJob)
+        .where(AnalysisJob.id.in_(job_ids), AnalysisJob.worker_id == worker_id, AnalysisJob.status.in_(ACTIVE_STATUSES))
+        .values(heartbeat_at=now)
+        .returning(AnalysisJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(db.scalars(stmt).all())
+
+def delete_job(db: Session, job_id: int) -> bool:
+    stmt = delete(AnalysisJob).where(AnalysisJob.id == job_id)
+    return db.execute(stmt).rowcount > 0
@@ -1,7 +1,11 @@
-from sqlalchemy import select, delete
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select, delete, insert, update, exists, literal, and_, case, func
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from app.database.models.paths import *
+from app.database.models.stackups import Stackup
+from app.database.models.components import Component, ComponentVersion, ComponentData
 from app.crud.crud_projects import _update_project_modified_at
+from app.crud.pagination import get_page
 
 def add_path(db: Session, path: Path) -> Path:
     try:
@@ -18,6 +22,11 @@ def get_paths(db: Session) -> list[Path]:
     paths = db.execute(stmt).scalars().all()
     return paths
 
+def get_paths_page(db: Session, params: PathListParamsModel, fields: list[str] | None = None) -> tuple[list, str | None]:
+    """One page of paths, optionally of one project, and the cursor of the next page"""
+    criteria = [Path.project_id == params.project_id] if params.project_id is not None else []
+    return get_page(db, Path, params, *criteria, fields=fields)
+
 def delete_paths(db: Session) -> None:
     project_ids = list(set(db.scalars(select(Path.project_id)).all()))
     stmt = delete(Path)
@@ -30,6 +39,14 @@ def get_path_by_id(db: Session, path_id: int) -> Path | None:
     path = db.execute(stmt).scalar_one_or_none()
     return path
 
+def get_path_with_stackup(db: Session, path_id: int) -> Path | None:
+    """Get path with `path_id` with its stackups (in signal order), their component versions and component data loaded (2 statements)"""
+    path = get_path_by_id(db, path_id)
+    if path is None:
+        return None
+    set_committed_value(path, "stackups", get_stackups_by_path(db, [path_id])[path_id])
+    return path
+
 def update_path(db: Session, path: Path, path_patch: PathPatchModel) -> Path | None:
     try:
         [setattr(path, key, value) for key, value in path.model_dump().items()]
@@ -47,4 +64,125 @@ def delete_path(db: Session, path_id: int) -> bool:
         return False
     db.delete(path)
     _update_project_modified_at(db,project_ids=path.project_id)
-    return True
\ No newline at end of file
+    return True
+
+def get_path_ids(db: Session, path_ids: list[int] | None = None, project_id: int | None = None) -> list[int]:
+    """Get the IDs of existing paths, optionally limited to `path_ids` and/or a project"""
+    stmt = select(Path.id).order_by(Path.id)
+    if path_ids is not None:
+        stmt = stmt.where(Path.id.in_(path_ids))
+    if project_id is not None:
+        stmt = stmt.where(Path.project_id == project_id)
+    return list(db.scalars(stmt).all())
+
+def get_stackups_by_path(db: Session, path_ids: list[int]) -> dict[int, list[Stackup]]:
+    """Load the stackups (with component data) for all `path_ids` in signal order in a single query"""
+    stmt = (
+        _ordered_stackups(select(Stackup), path_ids)
+        .options(
+            joinedload(Stackup.component_version).joinedload(ComponentVersion.component_data),
+            joinedload(Stackup.component_version).joinedload(ComponentVersion.component),
+        )
+    )
+    stackups = {path_id: [] for path_id in path_ids}
+    for stackup in db.scalars(stmt).unique():
+        stackups[stackup.path_id].append(stackup)
+    return stackups
+
+def get_stackup_version_ids(db: Session, path_id: int) -> list[int]:
+    """Get the component version IDs of the stackup on path with `path_id`, in signal order"""
+    stmt = _ordered_stackups(select(Stackup.component_version_id), [path_id])
+    return list(db.scalars(stmt).all())
+
+def get_stackup_revisions(db: Session, path_id: int) -> list[tuple[int, int, int, int]]:
+    """Get (component version ID, component data revision, component start_freq, stop_freq) of each stage on path with `path_id`, in signal order"""
+    stmt = _ordered_stackups(
+        select(Stackup.component_version_id, ComponentData.revision, Component.start_freq, Component.stop_freq)
+        .join(ComponentVersion, ComponentVersion.id == Stackup.component_version_id)
+        .join(ComponentData, ComponentData.id == ComponentVersion.component_data_id)
+        .join(Component, Component.id == ComponentVersion.component_id),
+        [path_id],
+    )
+    return [tuple(row) for row in db.execute(stmt)]
+
+def get_component_path_ids(db: Session, component_id: int) -> list[int]:
+    """Get the IDs of the paths with a stage of any version of component with `component_id`"""
+    stmt = (
+        select(Stackup.path_id)
+        .join(ComponentVersion, ComponentVersion.id == Stackup.component_version_id)
+        .where(ComponentVersion.component_id == component_id)
+        .distinct()
+    )
+    return list(db.scalars(stmt).all())
+
+def get_missing_component_version_ids(db: Session, component_version_ids: list[int]) -> set[int]:
+    """Get the IDs in `component_version_ids` that do not exist (1 statement)"""
+    ids = set(component_version_ids)
+    stmt = select(ComponentVersion.id).where(ComponentVersion.id.in_(ids))
+    return ids - set(db.scalars(stmt).all())
+
+def replace_path_stackup(db: Session, path_id: int, component_version_ids: list[int]) -> None:
+    """Replace the stackup on path with `path_id` with stages for `component_version_ids`, in order (Does not commit changes)
+
+    Uses a fixed number of statements regardless of chain length: one delete, one batched
+    insert and one update linking each stage to the next by position.
+    """
+    delete_path_stackup(db, path_id)
+    if not component_version_ids:
+        return
+
+    db.execute(
+        insert(Stackup),
+        [
+            {"path_id": path_id, "component_version_id": component_version_id, "position": position}
+            for position, component_version_id in enumerate(component_version_ids)
+        ],
+    )
+
+    following = aliased(Stackup)
+    next_id = (
+        select(following.id)
+        .where(following.path_id == Stackup.path_id, following.position == Stackup.position + 1)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Stackup)
+        .where(Stackup.path_id == path_id)
+        .values(next_stackup_id=next_id)
+        .execution_options(synchronize_session=False)
+    )
+
+def delete_path_stackup(db: Session, path_id: int) -> None:
+    """Delete the stackup on path with `path_id` in a single statement (Does not commit changes)"""
+    db.execute(delete(Stackup).where(Stackup.path_id == path_id).execution_options(synchronize_session=False))
+
+def _ordered_stackups(stmt: Select, path_ids: list[int]) -> Select:
+    """Restrict `stmt` to the stackups of `path_ids` ordered by path and then signal order
+
+    Signal order is found by walking the `next_stackup_id` linked list from the head of each
+    chain with a recursive CTE. A path whose chain is broken (more than one head, or stackups
+    the walk does not reach) is ordered by `position` instead.
+    """
+    previous = aliased(Stackup)
+    chain = (
+        select(Stackup.id, Stackup.next_stackup_id, literal(0).label("depth"))
+        .where(Stackup.path_id.in_(path_ids))
+        .where(~exists().where(previous.next_stackup_id == Stackup.id))
+        .cte("chain", recursive=True)
+    )
+    chain = chain.union_all(
+        select(Stackup.id, Stackup.next_stackup_id, chain.c.depth + 1)
+        .where(Stackup.id == chain.c.next_stackup_id)
+    )
+    per_path = {"partition_by": Stackup.path_id}
+    intact = and_(
+        func.count(chain.c.id).over(**per_path) == func.count().over(**per_path),
+        func.sum(case((chain.c.depth == 0, 1), else_=0)).over(**per_path) == 1,
+    )
+    return (
+        stmt
+        .select_from(Stackup)
+        .outerjoin(chain, chain.c.id == Stackup.id)
+        .where(Stackup.path_id.in_(path_ids))
+        .order_by(Stackup.path_id, case((intact, chain.c.depth)), Stackup.position, Stackup.id)
+    )
\ No newline at end of file
@@ -1,6 +1,8 @@
 from sqlalchemy import select, delete, update, func
 from sqlalchemy.orm import Session
 from app.database.models.projects import *
+from app.database.models.pagination import PageParamsModel
+from app.crud.pagination import get_page
 
 def add_project(db: Session, project: Project) -> Project:
     try:
@@ -16,6 +18,9 @@ def get_projects(db: Session) -> list[Project]:
     projects = db.execute(stmt).scalars().all()
     return projects
 
+def get_projects_page(db: Session, params: PageParamsModel, fields: list[str] | None = None) -> tuple[list, str | None]:
+    return get_page(db, Project, params, fields=fields)
+
 def delete_projects(db: Session) -> None:
     stmt = delete(Project)
     db.execute(stmt)
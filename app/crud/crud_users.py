@@ -3,8 +3,10 @@ from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Annotated
 
@@ -27,11 +29,12 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def authenticate_user(db, email: str, password: str):
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await db.run_sync(get_user_by_email, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is deliberately slow, keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return False
     return user
 
@@ -46,7 +49,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -60,13 +63,13 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
         token_data = TokenData(email=email)
     except InvalidTokenError:
         raise credentials_exception
-    user = get_user_by_email(db, email=token_data.email)
+    user = await db.run_sync(get_user_by_email, token_data.email)
     if user is None:
         raise credentials_exception
     return UserResponseModel.model_validate(user)
 
 
-def get_current_active_user(
+async def get_current_active_user(
     current_user: Annotated[UserResponseModel, Depends(get_current_user)],
 ):
     if current_user.disabled:
@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel as PydanticBase
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.database.models.pagination import PageParamsModel
+
+def get_page(db: Session, model: type, page: PageParamsModel, *criteria, fields: list[str] | None = None, options: tuple = ()) -> tuple[list, str | None]:
+    """One page of `model` rows matching `criteria` and the cursor of the next page (None on the last page)
+
+    Without a page limit the page holds every remaining row.
+
+    Returns ORM instances, or dicts of only `fields` when given. Raises ValueError for an
+    invalid cursor or an `order_by` the model does not have.
+    """
+    if page.order_by not in model.__table__.c:
+        raise ValueError(f"Cannot order by {page.order_by}.")
+    key = [model.__table__.c[name] for name in dict.fromkeys([page.order_by, "id"])]
+
+    if fields is None:
+        stmt = select(model).options(*options)
+    else:
+        stmt = select(*[model.__table__.c[name] for name in dict.fromkeys([*fields, *(col.key for col in key)])])
+    stmt = stmt.where(*criteria)
+    if page.cursor is not None:
+        stmt = stmt.where(_after(key, decode_cursor(page.cursor, key)))
+    stmt = stmt.order_by(*key)
+    if page.limit is not None:
+        stmt = stmt.limit(page.limit + 1)
+
+    if fields is None:
+        rows = db.execute(stmt).scalars().all()
+    else:
+        rows = [row._asdict() for row in db.execute(stmt)]
+
+    next_cursor = None
+    if page.limit is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[col.key] if fields is not None else getattr(last, col.key) for col in key])
+    if fields is not None:
+        rows = [{name: row[name] for name in fields} for row in rows]
+    return rows, next_cursor
+
+def select_fields(model: type, response_model: type[PydanticBase], fields: str | None) -> list[str] | None:
+    """Parse a comma-separated `fields` query parameter into the columns of `model` it names
+
+    Only columns that are also fields of `response_model` can be selected. Raises ValueError
+    for any other name.
+    """
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    allowed = set(model.__table__.c.keys()) & set(response_model.model_fields)
+    unknown = [name for name in names if name not in allowed]
+    if unknown or not names:
+        raise ValueError(f"Unknown fields: {unknown}. Choose from: {sorted(allowed)}")
+    return names
+
+def encode_cursor(values: list[Any]) -> str:
+    content = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(content.encode()).decode()
+
+def decode_cursor(cursor: str, key: list) -> list[Any]:
+    """Values of the `key` columns from a cursor made by `encode_cursor`"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(key):
+            raise ValueError
+        return [datetime.fromisoformat(value) if col.type.python_type is datetime else int(value) for value, col in zip(values, key)]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+def _after(key: list, values: list[Any]):
+    if len(key) == 1:
+        return key[0] > values[0]
+    return tuple_(*key) > tuple_(*values)
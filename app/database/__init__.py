@@ -1,7 +1,16 @@
-from sqlalchemy import create_engine
+import logging
+import time
+from http import HTTPStatus
+
+from fastapi import HTTPException, Request
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.config import config
+from app.database.backends import database_urls, engine_options, configure_engine
 from app.database.models import SQLAlchemyBase
 from app.database.models.projects import *
 from app.database.models.paths import *
@@ -9,19 +18,84 @@ from app.database.models.components import *
 from app.database.models.sources import *
 from app.database.models.stackups import *
 from app.database.models.users import *
+from app.database.models.jobs import *
+from app.database.models.status import *
+
+logger = logging.getLogger(__name__)
 
 
 # Log in to the database and create tables
-engine = create_engine(str(config.POSTGRES_URL))
+sync_url, async_url = database_urls(config.DB_URL)
+engine = create_engine(sync_url, **engine_options(sync_url))
 LocalSession = sessionmaker(bind=engine, expire_on_commit=False)
 
+# Endpoints use an async driver (psycopg's async mode, aiosqlite) so a request waiting on the
+# database does not hold a worker thread. Job workers, scripts and the startup job resume keep
+# the sync engine above.
+async_engine = create_async_engine(async_url, **engine_options(async_url))
+AsyncLocalSession = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+configure_engine(engine)
+configure_engine(async_engine.sync_engine)
+
+
+class PoolWaits:
+    """Running totals of the time requests waited for a connection (updated on the event loop only)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.slow_requests = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, wait: float) -> None:
+        self.requests += 1
+        self.total += wait
+        self.max = max(self.max, wait)
+        if 1e3*wait > config.DB_POOL_WAIT_WARN_MS:
+            self.slow_requests += 1
+            logger.warning("Waited %.1f ms for a database connection", 1e3*wait)
+
+    def model(self) -> PoolWaitModel:
+        mean = self.total/self.requests if self.requests else 0.0
+        return PoolWaitModel(requests=self.requests, slow_requests=self.slow_requests, mean_ms=1e3*mean, max_ms=1e3*self.max)
+
+
+pool_waits = PoolWaits()
+
+
+def pool_status(engine: Engine) -> PoolStatusModel | None:
+    """Connections of `engine`'s pool, None unless it is a QueuePool (e.g. in-memory SQLite)"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    return PoolStatusModel(
+        size=pool.size(),
+        max_overflow=config.DB_MAX_OVERFLOW,
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=max(pool.overflow(), 0),
+    )
+
+
+async def get_db(request: Request):
+    """AsyncSession for an endpoint, the sync CRUD functions run on it with `await db.run_sync(fn, *args)`
 
-def get_db():
-    db = LocalSession()
+    The connection is checked out up front to time the wait for the pool, the wait is kept in
+    `request.state.pool_wait` (seconds) and a full pool fails the request with 503.
+    """
+    db = AsyncLocalSession()
     try:
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except PoolTimeoutError:
+            raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail="No database connection available, try again later.", headers={"Retry-After": "1"})
+        request.state.pool_wait = time.perf_counter() - start
+        pool_waits.add(request.state.pool_wait)
         yield db
     except Exception as se:
-        db.rollback()
+        await db.rollback()
         raise se
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
@@ -0,0 +1,81 @@
+import os
+
+from sqlalchemy import Engine, URL, event, make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import functions
+
+from app.config import config
+
+
+def database_urls(url: str) -> tuple[URL, URL]:
+    """URLs for the sync and async engines on the database at `url` (Postgres or SQLite)
+
+    An in-memory SQLite URL becomes a named shared-cache database, one per process, so the
+    two engines see the same tables and parallel test workers do not.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            url = url.set(database=f"file:rfcascade-{os.getpid()}", query={"mode": "memory", "cache": "shared", "uri": "true"})
+        return url.set(drivername="sqlite"), url.set(drivername="sqlite+aiosqlite")
+    if url.drivername == "postgresql":
+        url = url.set(drivername="postgresql+psycopg")
+    return url, url
+
+
+def engine_options(url: URL) -> dict:
+    """Pool and connection settings from `config` for an engine on `url`"""
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+        if url.query.get("mode") == "memory":
+            # The one connection keeps the database alive and is shared by every session
+            options["poolclass"] = StaticPool
+        return options
+
+    connect_args = {"prepare_threshold": config.DB_PREPARE_THRESHOLD}
+    if config.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def configure_engine(engine: Engine) -> None:
+    """Per-connection setup for `engine`, pass `AsyncEngine.sync_engine` for an async engine"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_connect)
+        event.listen(engine, "begin", _sqlite_begin)
+    else:
+        event.listen(engine, "connect", _set_prepared_max)
+
+
+def _set_prepared_max(dbapi_connection, connection_record) -> None:
+    # The async engine hands over an adapter around the psycopg connection
+    getattr(dbapi_connection, "driver_connection", dbapi_connection).prepared_max = config.DB_PREPARED_MAX
+
+
+def _sqlite_connect(dbapi_connection, connection_record) -> None:
+    # The driver's own transaction handling breaks SAVEPOINT, BEGIN is emitted in `_sqlite_begin` instead
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    # Readers of a shared-cache database would otherwise fail while another connection writes
+    cursor.execute("PRAGMA read_uncommitted=ON")
+    cursor.close()
+
+
+def _sqlite_begin(connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+
+@compiles(functions.current_timestamp, "sqlite")
+@compiles(functions.now, "sqlite")
+def _sqlite_current_timestamp(element, compiler, **kw) -> str:
+    # CURRENT_TIMESTAMP only has whole seconds on SQLite, match Postgres' sub-second timestamps
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
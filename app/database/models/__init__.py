@@ -1,3 +1,5 @@
+from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import declarative_base
 
-SQLAlchemyBase = declarative_base()
\ No newline at end of file
+# AsyncAttrs lets async endpoints load a lazy relationship with `await obj.awaitable_attrs.<name>`
+SQLAlchemyBase = declarative_base(cls=AsyncAttrs)
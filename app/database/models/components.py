@@ -1,16 +1,26 @@
+import struct
 from typing import Optional, List
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, JSON, String, Boolean, BigInteger, func
+import numpy as np
+from sqlalchemy import ForeignKey, Index, LargeBinary, String, Boolean, BigInteger, Float, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.models import SQLAlchemyBase
 from app.database.models.sources import SourceEnum
+from app.database.models.pagination import PageParamsModel
 from pydantic import ConfigDict, BaseModel as PydanticBase, field_validator, model_validator
 
 
 class Component(SQLAlchemyBase):
     __tablename__ = "components"
+    __table_args__ = (
+        Index("ix_components_component_type_id_id", "component_type_id", "id"),
+        Index("ix_components_manufacturer_id", "manufacturer", "id"),
+        Index("ix_components_is_active_id", "is_active", "id"),
+        Index("ix_components_modified_at_id", "modified_at", "id"),
+        Index("ix_components_start_freq_stop_freq", "start_freq", "stop_freq"),
+    )
 
     # Primary Keys
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -35,6 +45,11 @@ class Component(SQLAlchemyBase):
     type: Mapped["ComponentType"] = relationship("ComponentType")
     component_versions: Mapped[List["ComponentVersion"]] = relationship("ComponentVersion", back_populates="component")
     data_sheets: Mapped[List["DataSheet"]] = relationship("DataSheet", back_populates="component")
+    summary: Mapped[Optional["ComponentVersionSummary"]] = relationship(
+        "ComponentVersionSummary",
+        primaryjoin="and_(Component.id == ComponentVersionSummary.component_id, ComponentVersionSummary.is_latest)",
+        viewonly=True,
+    )
 
 
 class ComponentVersion(SQLAlchemyBase):
@@ -55,8 +70,99 @@ class ComponentVersion(SQLAlchemyBase):
     # Relationships
     component: Mapped["Component"] = relationship("Component", back_populates="component_versions")
     component_data: Mapped["ComponentData"] = relationship("ComponentData", back_populates="component_version")
+    summary: Mapped[Optional["ComponentVersionSummary"]] = relationship("ComponentVersionSummary", back_populates="component_version")
 
 
+class ComponentVersionSummary(SQLAlchemyBase):
+    """Statistics of the data of a component version over the band its curves cover, for search
+
+    Only the summary of the latest version of each component has `is_latest` set. The
+    indexes lead with it so searches never touch superseded versions.
+    """
+    __tablename__ = "component_version_summaries"
+    __table_args__ = (
+        Index("ix_component_version_summaries_component_id_is_latest", "component_id", "is_latest"),
+        Index("ix_component_version_summaries_band", "is_latest", "band_start", "band_stop"),
+        Index("ix_component_version_summaries_gain_min", "is_latest", "gain_min"),
+        Index("ix_component_version_summaries_nf_max", "is_latest", "nf_max"),
+        Index("ix_component_version_summaries_p1db_min", "is_latest", "p1db_min"),
+        Index("ix_component_version_summaries_ip3_min", "is_latest", "ip3_min"),
+    )
+
+    # Primary Keys
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    # Foreign Keys
+    component_version_id: Mapped[int] = mapped_column(ForeignKey("component_versions.id", ondelete="CASCADE"), unique=True)
+    component_id: Mapped[int] = mapped_column(ForeignKey("components.id", ondelete="CASCADE"))
+
+    # Columns
+    is_latest: Mapped[bool] = mapped_column(Boolean, default=True)
+    band_start: Mapped[Optional[int]] = mapped_column(BigInteger) # Overlap of the summarized curves, None if they do not overlap
+    band_stop: Mapped[Optional[int]] = mapped_column(BigInteger)
+    gain_min: Mapped[Optional[float]] = mapped_column(Float)
+    gain_max: Mapped[Optional[float]] = mapped_column(Float)
+    gain_mean: Mapped[Optional[float]] = mapped_column(Float)
+    nf_min: Mapped[Optional[float]] = mapped_column(Float)
+    nf_max: Mapped[Optional[float]] = mapped_column(Float)
+    nf_mean: Mapped[Optional[float]] = mapped_column(Float)
+    p1db_min: Mapped[Optional[float]] = mapped_column(Float)
+    p1db_max: Mapped[Optional[float]] = mapped_column(Float)
+    p1db_mean: Mapped[Optional[float]] = mapped_column(Float)
+    ip3_min: Mapped[Optional[float]] = mapped_column(Float)
+    ip3_max: Mapped[Optional[float]] = mapped_column(Float)
+    ip3_mean: Mapped[Optional[float]] = mapped_column(Float)
+
+    # Relationships
+    component_version: Mapped["ComponentVersion"] = relationship("ComponentVersion", back_populates="summary")
+
+
+
+# Packed curve layout: header (magic, number of points) followed by
+# little-endian int64 frequencies and float64 magnitudes
+CURVE_MAGIC = b"RFC1"
+CURVE_HEADER = struct.Struct("<4sI")
+
+
+def pack_curve(freq: list[int], mag: list[float]) -> bytes:
+    """Pack a curve into the binary layout stored in `ComponentData`"""
+    freq = np.asarray(freq, dtype="<i8")
+    mag = np.asarray(mag, dtype="<f8")
+    if freq.shape != mag.shape or freq.ndim != 1:
+        raise ValueError("freq and mag must be 1-D and have the same length.")
+    return CURVE_HEADER.pack(CURVE_MAGIC, len(freq)) + freq.tobytes() + mag.tobytes()
+
+
+def unpack_curve(buf: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """Read-only (freq, mag) views over a packed curve (no copy)"""
+    magic, num_points = CURVE_HEADER.unpack_from(buf)
+    if magic != CURVE_MAGIC:
+        raise ValueError("Not a packed curve.")
+    freq = np.frombuffer(buf, dtype="<i8", count=num_points, offset=CURVE_HEADER.size)
+    mag = np.frombuffer(buf, dtype="<f8", count=num_points, offset=CURVE_HEADER.size + freq.nbytes)
+    return freq, mag
+
+
+class PackedCurve:
+    """Exposes a packed curve column as the `{"freq": [...], "mag": [...]}` dict used by the API"""
+
+    def __set_name__(self, owner, name):
+        self.column = f"{name}_packed"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        buf = getattr(obj, self.column)
+        if buf is None:
+            return None
+        freq, mag = unpack_curve(buf)
+        return {"freq": freq.tolist(), "mag": mag.tolist()}
+
+    def __set__(self, obj, value):
+        if value is not None:
+            value = pack_curve(value["freq"], value["mag"])
+        setattr(obj, self.column, value)
+
 
 class ComponentData(SQLAlchemyBase):
     __tablename__ = "component_data"
@@ -66,16 +172,34 @@ class ComponentData(SQLAlchemyBase):
 
     # Columns
     data_source: Mapped[SourceEnum] = mapped_column(default=SourceEnum.SIMULATED)
-    gain: Mapped[dict | None] = mapped_column(JSON)
-    nf: Mapped[dict | None] = mapped_column(JSON)
-    ip2: Mapped[dict | None] = mapped_column(JSON)
-    ip3: Mapped[dict | None] = mapped_column(JSON)
-    p1db: Mapped[dict | None] = mapped_column(JSON)
-    max_input: Mapped[dict | None] = mapped_column(JSON)
+    gain_packed: Mapped[bytes | None] = mapped_column("gain", LargeBinary)
+    nf_packed: Mapped[bytes | None] = mapped_column("nf", LargeBinary)
+    ip2_packed: Mapped[bytes | None] = mapped_column("ip2", LargeBinary)
+    ip3_packed: Mapped[bytes | None] = mapped_column("ip3", LargeBinary)
+    p1db_packed: Mapped[bytes | None] = mapped_column("p1db", LargeBinary)
+    max_input_packed: Mapped[bytes | None] = mapped_column("max_input", LargeBinary)
+    revision: Mapped[int] = mapped_column(server_default="1") # Bumped on every update, identifies the curves in analysis ETags
+
+    # Curves as dicts
+    gain = PackedCurve()
+    nf = PackedCurve()
+    ip2 = PackedCurve()
+    ip3 = PackedCurve()
+    p1db = PackedCurve()
+    max_input = PackedCurve()
 
     # Relationships
     component_version: Mapped["ComponentVersion"] = relationship("ComponentVersion", back_populates="component_data")
 
+    __mapper_args__ = {"version_id_col": revision}
+
+    def curve(self, param: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Read-only (freq, mag) arrays for `param` without going through Python lists"""
+        buf = getattr(self, f"{param}_packed")
+        if buf is None:
+            return None
+        return unpack_curve(buf)
+
 
 class DataSheet(SQLAlchemyBase):
     __tablename__ = "data_sheets"
@@ -157,6 +281,69 @@ class ComponentResponseModel(ComponentInputModel):
     id: int
 
 
+def _check_range(low: float | None, high: float | None, name: str) -> None:
+    """Raise if both ends of a filter range are given and it is inverted, reported as a 422 by FastAPI"""
+    if low is not None and high is not None and low > high:
+        raise ValueError(f"min_{name} must not be greater than max_{name}.")
+
+
+class ComponentListParamsModel(PageParamsModel):
+    component_type_id: int | None = None
+    manufacturer: str | None = None
+    is_active: bool | None = None
+    is_variable: bool | None = None
+    min_freq: int | None = None # Only components covering some of [min_freq, max_freq]
+    max_freq: int | None = None
+
+    @model_validator(mode="after")
+    def validate_band(self):
+        _check_range(self.min_freq, self.max_freq, "freq")
+        return self
+
+
+class ComponentSearchParamsModel(PageParamsModel):
+    """Filters on the latest version summary of each component, spec limits apply to the worst case over the band"""
+    component_type_id: int | None = None
+    manufacturer: str | None = None
+    is_active: bool | None = None
+    min_freq: int | None = None # Only components and data covering all of [min_freq, max_freq]
+    max_freq: int | None = None
+    min_gain: float | None = None
+    max_gain: float | None = None
+    max_nf: float | None = None
+    min_p1db: float | None = None
+    min_ip3: float | None = None
+
+    @model_validator(mode="after")
+    def validate_ranges(self):
+        _check_range(self.min_freq, self.max_freq, "freq")
+        _check_range(self.min_gain, self.max_gain, "gain")
+        return self
+
+
+class ComponentVersionSummaryModel(PydanticBase):
+    model_config = ConfigDict(from_attributes=True)
+    component_version_id: int
+    band_start: int | None
+    band_stop: int | None
+    gain_min: float | None
+    gain_max: float | None
+    gain_mean: float | None
+    nf_min: float | None
+    nf_max: float | None
+    nf_mean: float | None
+    p1db_min: float | None
+    p1db_max: float | None
+    p1db_mean: float | None
+    ip3_min: float | None
+    ip3_max: float | None
+    ip3_mean: float | None
+
+
+class ComponentSearchResultModel(ComponentResponseModel):
+    summary: ComponentVersionSummaryModel
+
+
 class DataModel(PydanticBase):
     freq: list[int]
     mag: list[float]
@@ -228,6 +415,7 @@ class ComponentVersionPatchModel(PydanticBase):
 
 class ComponentVersionResponseModel(ComponentVersionInputModel):
     model_config = ConfigDict(from_attributes=True)
+    component_data: ComponentDataResponseModel
     version: int
     is_verified: bool
     component_id: int
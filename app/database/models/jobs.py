@@ -0,0 +1,71 @@
+import json
+from typing import Any, Optional, Literal
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, Index, JSON, LargeBinary, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from pydantic import ConfigDict, BaseModel as PydanticBase, field_validator
+from app.database.models import SQLAlchemyBase
+
+JobKind = Literal["analyze", "monte_carlo", "sweep", "batch", "project", "touchstone_import"]
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+class AnalysisJob(SQLAlchemyBase):
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        Index("ix_analysis_jobs_status", "status"),
+    )
+
+    # Primary Keys
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    # Foreign Keys
+    path_id: Mapped[Optional[int]] = mapped_column(ForeignKey("paths.id", ondelete="SET NULL"), default=None)
+    project_id: Mapped[Optional[int]] = mapped_column(ForeignKey("projects.id", ondelete="SET NULL"), default=None)
+
+    # Columns
+    kind: Mapped[str] = mapped_column()
+    status: Mapped[str] = mapped_column(default="queued")
+    request: Mapped[dict] = mapped_column(JSON) # Request body the job was submitted with
+    progress: Mapped[float] = mapped_column(default=0) # Fraction of work units completed
+    result: Mapped[Optional[bytes]] = mapped_column(LargeBinary, default=None) # Serialized JSON response
+    error: Mapped[Optional[str]] = mapped_column(default=None)
+    created_at: Mapped[datetime] = mapped_column(default=func.current_timestamp())
+    started_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+    worker_id: Mapped[Optional[str]] = mapped_column(default=None) # Process whose queue holds the job
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(default=None) # Last time that process marked the job alive (UTC)
+
+    def __repr__(self) -> str:
+        return f"AnalysisJob(id={self.id!r}, kind={self.kind!r}, status={self.status!r}, progress={self.progress!r})"
+
+# Pydantic Models
+class JobResponseModel(PydanticBase):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    kind: JobKind
+    status: JobStatus
+    path_id: int | None = None
+    project_id: int | None = None
+    progress: float
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    result: Any = None
+
+    @field_validator("result", mode="before")
+    @classmethod
+    def parse_result(cls, value):
+        if isinstance(value, bytes):
+            return json.loads(value)
+        return value
+
+class JobSummaryModel(PydanticBase):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    kind: JobKind
+    status: JobStatus
+    progress: float
+    created_at: datetime
@@ -0,0 +1,16 @@
+from typing import Literal
+
+from pydantic import BaseModel as PydanticBase, Field
+
+class PageParamsModel(PydanticBase):
+    """Query parameters shared by paginated list endpoints
+
+    Without `limit` every matching row is returned. With it, pages are keyset paginated on
+    (`order_by`, id): pass the `X-Next-Cursor` header of one response as `cursor` to get the
+    next page. `fields` is a comma-separated list of columns
+    to return instead of the full model.
+    """
+    limit: int | None = Field(default=None, gt=0, le=1000)
+    cursor: str | None = None
+    order_by: Literal["id", "modified_at"] = "id"
+    fields: str | None = None
@@ -1,18 +1,23 @@
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.orderinglist import ordering_list
 
 from pydantic import ConfigDict, BaseModel as PydanticBase
 from app.database.models import SQLAlchemyBase
+from app.database.models.pagination import PageParamsModel
 
 if TYPE_CHECKING:
     from app.database.models.stackups import Stackup
 
 class Path(SQLAlchemyBase):
     __tablename__ = "paths"
+    __table_args__ = (
+        Index("ix_paths_project_id_id", "project_id", "id"),
+        Index("ix_paths_modified_at_id", "modified_at", "id"),
+    )
 
     # Primary Key
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -28,7 +33,7 @@ class Path(SQLAlchemyBase):
     modified_at: Mapped[datetime] = mapped_column(default=func.current_timestamp(), onupdate=func.current_timestamp())
 
     # Relationships
-    stackups: Mapped[List["Stackup"]] = relationship("Stackup", back_populates="path", cascade="all, delete-orphan")
+    stackups: Mapped[List["Stackup"]] = relationship("Stackup", back_populates="path", cascade="all, delete-orphan", order_by="[Stackup.position, Stackup.id]", collection_class=ordering_list("position"))
     project = relationship("Project", back_populates="paths")
 
     def __repr__(self) -> str:
@@ -48,6 +53,9 @@ class PathResponseModel(PathInputModel):
     modified_at: datetime
     id: int
 
+class PathListParamsModel(PageParamsModel):
+    project_id: int | None = None
+
 class PathPatchModel(PydanticBase):
     model_config = ConfigDict(from_attributes=True)
     input: str | None = None
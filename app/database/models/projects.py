@@ -2,6 +2,7 @@ from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 
 from pydantic import ConfigDict, BaseModel as PydanticBase
+from sqlalchemy import Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -12,6 +13,9 @@ if TYPE_CHECKING:
 
 class Project(SQLAlchemyBase):
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_modified_at_id", "modified_at", "id"),
+    )
 
     # Primary Keys
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -1,7 +1,7 @@
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.orderinglist import ordering_list
 
@@ -14,6 +14,9 @@ if TYPE_CHECKING:
 
 class Stackup(SQLAlchemyBase):
     __tablename__ = "stackups"
+    __table_args__ = (
+        Index("ix_stackups_path_id_position", "path_id", "position"),
+    )
 
     # Primary Keys
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -23,6 +26,9 @@ class Stackup(SQLAlchemyBase):
     component_version_id: Mapped[int] = mapped_column(ForeignKey("component_versions.id"))
     next_stackup_id: Mapped[Optional[int]] = mapped_column(ForeignKey("stackups.id"), unique=True)
 
+    # Columns
+    position: Mapped[Optional[int]] = mapped_column(default=None) # Fallback ordering when the next_stackup_id chain is broken
+
     # Relationships
     component_version: Mapped["ComponentVersion"] = relationship("ComponentVersion")
     next_stackup: Mapped[Optional["Stackup"]] = relationship("Stackup", remote_side=[id], foreign_keys=[next_stackup_id], uselist=False)
@@ -0,0 +1,23 @@
+from pydantic import BaseModel as PydanticBase
+
+
+class PoolStatusModel(PydanticBase):
+    """Connections of one engine's pool"""
+    size: int # Connections kept open (DB_POOL_SIZE)
+    max_overflow: int
+    checked_in: int # Open and idle
+    checked_out: int # In use
+    overflow: int # Open beyond `size`
+
+
+class PoolWaitModel(PydanticBase):
+    """Time requests waited for a connection from the async pool since startup"""
+    requests: int
+    slow_requests: int # Waited longer than DB_POOL_WAIT_WARN_MS
+    mean_ms: float
+    max_ms: float
+
+
+class DatabaseStatusModel(PydanticBase):
+    pools: dict[str, PoolStatusModel] # By engine: "async" serves the endpoints, "sync" jobs and scripts
+    pool_wait: PoolWaitModel
@@ -1,18 +1,67 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import router
 from app.config import config
+from app.database import SQLAlchemyBase, LocalSession, engine, async_engine
+from app.utils.jobs import job_queue, resume_jobs
+from app.utils.montecarlo import shutdown_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+def _resume_jobs() -> int:
+    with LocalSession() as db:
+        return resume_jobs(db)
+
+
+async def watch_jobs():
+    """Take over jobs orphaned by a stopped or crashed process, now and every `JOB_HEARTBEAT_SECONDS`"""
+    while True:
+        try:
+            await run_in_threadpool(_resume_jobs)
+        except Exception:
+            logger.exception("Failed to resume analysis jobs")
+        await asyncio.sleep(config.JOB_HEARTBEAT_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # SQLite databases are not migrated, create any missing tables instead
+    if engine.dialect.name == "sqlite":
+        SQLAlchemyBase.metadata.create_all(engine)
+    # Pick up analysis jobs interrupted by the last shutdown and any orphaned later on
+    watcher = asyncio.create_task(watch_jobs())
+    yield
+    watcher.cancel()
+    job_queue.shutdown()
+    shutdown_pool()
+    await async_engine.dispose()
 
 
 def register_app():
-    app = FastAPI(title="rfcascade")
+    app = FastAPI(title="rfcascade", lifespan=lifespan)
     app.servers = [
         {"url": config.API_PREFIX, "description": "Default"},
     ]
     app.root_path = config.API_PREFIX
     app.include_router(router)
 
+    @app.middleware("http")
+    async def pool_wait_header(request: Request, call_next):
+        # Report the wait for a database connection set by `get_db`
+        response = await call_next(request)
+        wait = getattr(request.state, "pool_wait", None)
+        if wait is not None:
+            response.headers["Server-Timing"] = f"db-pool;dur={1e3*wait:.2f}"
+        return response
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import anyio.to_thread
+from sqlalchemy import text
+
+from app.database import LocalSession, AsyncLocalSession, engine, async_engine
+from app.crud.crud_paths import get_path_ids, get_path_with_stackup
+
+
+def load_sync(path_id: int, sleep: float) -> None:
+    """Load a path's stackup on a sync session, as the sync endpoints did"""
+    with LocalSession() as db:
+        if sleep:
+            db.execute(text("SELECT pg_sleep(:sleep)"), {"sleep": sleep})
+        get_path_with_stackup(db, path_id)
+
+
+async def load_async(path_id: int, sleep: float) -> None:
+    """Load a path's stackup on an AsyncSession, as the async endpoints do"""
+    async with AsyncLocalSession() as db:
+        if sleep:
+            await db.execute(text("SELECT pg_sleep(:sleep)"), {"sleep": sleep})
+        await db.run_sync(get_path_with_stackup, path_id)
+
+
+async def run(mode: str, path_ids: list[int], requests: int, concurrency: int, sleep: float) -> dict[str, float]:
+    """Issue `requests` stackup loads with at most `concurrency` in flight and time them
+
+    Sync loads go through the AnyIO threadpool like a sync `def` endpoint, so they are also
+    capped by its thread limit.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request(index: int) -> None:
+        path_id = path_ids[index % len(path_ids)]
+        async with slots:
+            start = time.perf_counter()
+            if mode == "sync":
+                await anyio.to_thread.run_sync(load_sync, path_id, sleep)
+            else:
+                await load_async(path_id, sleep)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests/s": requests/elapsed,
+        "p50 ms": 1e3*statistics.median(latencies),
+        "p99 ms": 1e3*latencies[min(len(latencies) - 1, int(0.99*len(latencies)))],
+    }
+
+
+async def benchmark(args: argparse.Namespace) -> None:
+    with LocalSession() as db:
+        path_ids = get_path_ids(db)
+    if not path_ids:
+        print("No paths to load, seed the database first")
+        return
+
+    thread_limit = anyio.to_thread.current_default_thread_limiter().total_tokens
+    print(f"{len(path_ids)} paths, {args.requests} requests per run, threadpool limit {thread_limit}")
+    print(f"{'mode':>6} {'concurrency':>12} {'requests/s':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        for mode in ("sync", "async"):
+            # Warm the pool so connection setup is not timed
+            await run(mode, path_ids, concurrency, concurrency, 0)
+            stats = await run(mode, path_ids, args.requests, concurrency, args.sleep_ms/1e3)
+            print(f"{mode:>6} {concurrency:>12} {stats['requests/s']:>12.1f} {stats['p50 ms']:>10.2f} {stats['p99 ms']:>10.2f}")
+    engine.dispose()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare stackup loads through sync sessions on the threadpool against AsyncSession under concurrency")
+    parser.add_argument("--requests", type=int, default=2000, help="Loads per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 40, 100, 200], help="Loads in flight")
+    parser.add_argument("--sleep-ms", type=float, default=0, help="Server-side pg_sleep per load to stand in for a slow query")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+
+from app.database import LocalSession
+from app.utils.touchstone import TouchstoneImportParamsModel, touchstone_sources, import_touchstone
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Touchstone .sNp files as component versions")
+    parser.add_argument("source", help="Touchstone file, directory or zip of them")
+    parser.add_argument("--match", choices=["serial_no", "model"], default="serial_no", help="Component column the file name is matched against")
+    parser.add_argument("--component-id", type=int, help="Import every file as a version of this component instead")
+    parser.add_argument("--input-port", type=int, default=1)
+    parser.add_argument("--output-port", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50, help="Files per transaction")
+    parser.add_argument("--change-note", default="Imported from")
+    args = parser.parse_args()
+
+    params = TouchstoneImportParamsModel(
+        match=args.match,
+        component_id=args.component_id,
+        input_port=args.input_port,
+        output_port=args.output_port,
+        batch_size=args.batch_size,
+        change_note=args.change_note,
+    )
+    names = touchstone_sources(args.source)
+    counts = {}
+    db = LocalSession()
+    try:
+        for start in range(0, len(names), params.batch_size):
+            for result in import_touchstone(db, args.source, names[start:start+params.batch_size], params):
+                counts[result.status] = counts.get(result.status, 0) + 1
+                if result.error:
+                    print(f"{result.name}: {result.status}, {result.error}")
+            print(f"{min(start + params.batch_size, len(names))}/{len(names)} files")
+    finally:
+        db.close()
+    print(", ".join(f"{count} {status}" for status, count in counts.items()) or "No Touchstone files found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import json
+import pathlib
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Connection, Table, func, select, text
+
+from app.database import SQLAlchemyBase, engine
+from app.database.models.components import Component, ComponentData, ComponentType, ComponentVersion, ComponentVersionSummary, pack_curve
+from app.database.models.paths import Path
+from app.database.models.projects import Project
+from app.database.models.sources import SourceEnum
+from app.database.models.stackups import Stackup
+from app.utils.summaries import summarize_component_data
+
+# Row counts at scale 1.0, roughly the production library
+COMPONENTS = 100_000
+VERSIONS_PER_COMPONENT = 5
+PROJECTS = 500
+PATHS = 10_000
+
+COMPONENT_TYPES_FILE = pathlib.Path(__file__).parents[2] / "static" / "component_types.json"
+BAND_EDGES = [10e6, 500e6, 1e9, 2e9, 4e9, 6e9, 8e9, 12e9, 18e9, 26.5e9, 40e9]
+MANUFACTURERS = {
+    "Mini-Circuits": "ZX60-", "Analog Devices": "HMC", "Qorvo": "QPA", "MACOM": "MAAM-", "Skyworks": "SKY",
+    "Marki Microwave": "MM1-", "Pasternack": "PE", "Fairview Microwave": "FMAM", "Narda": "4", "Keysight": "N",
+}
+INPUTS = ["ANT", "RF IN", "J1", "LO IN", "CAL IN"]
+OUTPUTS = ["IF OUT", "RF OUT", "J2", "DET OUT", "ADC"]
+ACTIVE_TYPES = {"Amplifier", "Power Amplifier (PA)", "Receiver", "Transceiver", "Transmitter"}
+CONVERTER_TYPES = {"Mixer", "Modulator", "Demodulator"}
+EPOCH = datetime(2022, 1, 1)
+
+
+def write_rows(conn: Connection, table: Table, rows: list[dict]) -> None:
+    """Bulk insert `rows` into `table`, with COPY on PostgreSQL and an executemany INSERT otherwise"""
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return
+    columns = list(rows[0])
+    with conn.connection.driver_connection.cursor() as cursor:
+        with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([row[column] for column in columns])
+
+
+def next_id(conn: Connection, model) -> int:
+    """First free primary key of `model`'s table, IDs are assigned here so rows can reference each other without RETURNING"""
+    return (conn.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def reset_sequences(conn: Connection) -> None:
+    """Move the PostgreSQL ID sequences past the explicitly inserted IDs"""
+    if conn.dialect.name != "postgresql":
+        return
+    for model in (ComponentType, Component, ComponentData, ComponentVersion, ComponentVersionSummary, Project, Path, Stackup):
+        table = model.__tablename__
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+
+
+def component_types(conn: Connection) -> dict[int, str]:
+    """IDs and names of the component types, loading `static/component_types.json` into an empty table"""
+    types = dict(conn.execute(select(ComponentType.id, ComponentType.type)).all())
+    if not types:
+        names = [comp_type["type"] for comp_type in json.loads(COMPONENT_TYPES_FILE.read_text())]
+        write_rows(conn, ComponentType.__table__, [{"id": i, "type": name} for i, name in enumerate(names, next_id(conn, ComponentType))])
+        types = dict(conn.execute(select(ComponentType.id, ComponentType.type)).all())
+    return types
+
+
+def timestamps(rng: np.random.Generator, n: int) -> tuple[list[datetime], list[datetime]]:
+    """Creation times spread over the last few years and modification times after them"""
+    created = rng.uniform(0, 3*365*86400, n)
+    modified = created + rng.uniform(0, 1, n)*(3*365*86400 - created)
+    return [EPOCH + timedelta(seconds=s) for s in created], [EPOCH + timedelta(seconds=s) for s in modified]
+
+
+def synthetic_curves(rng: np.random.Generator, kinds: np.ndarray[str], start: np.ndarray[int], stop: np.ndarray[int], num_points: int) -> dict[str, np.ndarray]:
+    """Frequency grid and gain, NF, P1dB and IP3 curves of one version of each component, as (versions x points) arrays
+
+    Active parts have gain that rolls off with frequency and a rising noise figure, converters
+    a conversion loss, and passive parts an insertion loss equal to their noise figure and
+    high compression points. Every curve gets a random ripple.
+    """
+    n = len(kinds)
+    t = np.linspace(0, 1, num_points)
+    freq = (start[:, None] + np.outer(stop - start, t)).astype(np.int64)
+    ripple = rng.uniform(0.05, 0.5, (n, 1))*np.sin(2*np.pi*rng.uniform(2, 12, (n, 1))*t + rng.uniform(0, 2*np.pi, (n, 1)))
+
+    active, converter = kinds == "active", kinds == "converter"
+    gain0 = np.where(active, rng.uniform(10, 30, n), np.where(converter, rng.uniform(-9, -5, n), rng.uniform(-20, -0.3, n)))
+    gain = gain0[:, None] - np.where(active, rng.uniform(0, 4, n), rng.uniform(0, 1, n))[:, None]*t + ripple
+    nf = np.where(
+        active[:, None],
+        rng.uniform(0.8, 6, (n, 1)) + rng.uniform(0, 1.5, (n, 1))*t + 0.3*np.abs(ripple),
+        np.where(converter[:, None], -gain + rng.uniform(0.5, 2, (n, 1)), -gain),
+    )
+    p1db = np.where(active, rng.uniform(5, 33, n), np.where(converter, rng.uniform(0, 15, n), rng.uniform(25, 45, n)))[:, None] - rng.uniform(0, 2, (n, 1))*t
+    ip3 = p1db + rng.uniform(8, 14, (n, 1)) + 0.5*ripple
+    return {"freq": freq, "gain": gain, "nf": nf, "p1db": p1db, "ip3": ip3}
+
+
+def seed_components(conn: Connection, rng: np.random.Generator, num_components: int, num_points: int, chunk: int = 1_000) -> list[int]:
+    """Insert components with 1 or more versions each, their curve data and search summaries, returns the latest version IDs"""
+    types = component_types(conn)
+    type_ids = np.array(list(types))
+    kind_of = {type_id: "active" if name in ACTIVE_TYPES else "converter" if name in CONVERTER_TYPES else "passive" for type_id, name in types.items()}
+    component_id, data_id, version_id, summary_id = (next_id(conn, model) for model in (Component, ComponentData, ComponentVersion, ComponentVersionSummary))
+    manufacturers = list(MANUFACTURERS)
+    latest_versions, added_versions = [], 0
+
+    for offset in range(0, num_components, chunk):
+        n = min(chunk, num_components - offset)
+        type_id = rng.choice(type_ids, n)
+        low = rng.integers(0, len(BAND_EDGES) - 1, n)
+        high = np.minimum(low + 1 + rng.integers(0, 4, n), len(BAND_EDGES) - 1)
+        start, stop = np.take(BAND_EDGES, low).astype(np.int64), np.take(BAND_EDGES, high).astype(np.int64)
+        mfr = rng.integers(0, len(manufacturers), n)
+        created, modified = timestamps(rng, n)
+        components = [
+            {
+                "id": component_id + i, "component_type_id": int(type_id[i]),
+                "model": f"{MANUFACTURERS[manufacturers[mfr[i]]]}{rng.integers(100, 9999)}{rng.choice(['', '+', '-S', 'LH'])}",
+                "manufacturer": manufacturers[mfr[i]], "serial_no": f"SN{component_id + i:08d}", "num_ports": 2,
+                "start_freq": int(start[i]), "stop_freq": int(stop[i]), "is_active": bool(rng.random() < 0.85),
+                "is_variable": bool(types[type_id[i]] in ("Attenuator", "Phase Shifter") and rng.random() < 0.3),
+                "description": f"{start[i]/1e9:g}-{stop[i]/1e9:g} GHz {types[type_id[i]].lower()}",
+                "created_at": created[i], "modified_at": modified[i],
+            }
+            for i in range(n)
+        ]
+
+        # Versions are re-measurements of the component so they share its band and kind
+        num_versions = 1 + rng.poisson(VERSIONS_PER_COMPONENT - 1, n)
+        owner = np.repeat(np.arange(n), num_versions)
+        kinds = np.array([kind_of[type_id[i]] for i in owner])
+        curves = synthetic_curves(rng, kinds, start[owner], stop[owner], num_points)
+        source = np.where(rng.random(len(owner)) < 0.4, SourceEnum.MEASURED.name, SourceEnum.SIMULATED.name)
+
+        data, versions, summaries = [], [], []
+        version = 0
+        for j, i in enumerate(owner):
+            version = version + 1 if j and owner[j - 1] == i else 0
+            row = {"id": data_id + j, "data_source": str(source[j]), "ip2": None, "max_input": None}
+            row.update({param: pack_curve(curves["freq"][j], curves[param][j]) for param in ("gain", "nf", "p1db", "ip3")})
+            data.append(row)
+            versions.append({
+                "id": version_id + j, "component_id": component_id + int(i), "component_data_id": data_id + j,
+                "version": version, "change_note": "Initial data" if version == 0 else f"Revision {version}",
+                "is_verified": bool(rng.random() < 0.5),
+            })
+            summary = summarize_component_data(ComponentData(gain_packed=row["gain"], nf_packed=row["nf"], p1db_packed=row["p1db"], ip3_packed=row["ip3"]))
+            summaries.append({
+                "id": summary_id + j, "component_version_id": version_id + j, "component_id": component_id + int(i),
+                "is_latest": bool(version == num_versions[i] - 1), **summary,
+            })
+            if version == num_versions[i] - 1:
+                latest_versions.append(version_id + j)
+
+        write_rows(conn, Component.__table__, components)
+        write_rows(conn, ComponentData.__table__, data)
+        write_rows(conn, ComponentVersion.__table__, versions)
+        write_rows(conn, ComponentVersionSummary.__table__, summaries)
+        component_id, data_id, version_id, summary_id = component_id + n, data_id + len(owner), version_id + len(owner), summary_id + len(owner)
+        added_versions += len(owner)
+        print(f"\r{offset + n}/{num_components} components, {added_versions} versions", end="", flush=True)
+    print()
+    return latest_versions
+
+
+def seed_paths(conn: Connection, rng: np.random.Generator, num_projects: int, num_paths: int, version_ids: list[int], stages: tuple[int, int]) -> list[int]:
+    """Insert projects and paths with stackup chains of `stages` (min, max) random component versions, returns the path IDs"""
+    project_id, path_id, stackup_id = (next_id(conn, model) for model in (Project, Path, Stackup))
+    created, modified = timestamps(rng, num_projects)
+    write_rows(conn, Project.__table__, [
+        {"id": project_id + i, "name": f"Program {project_id + i:05d}", "description": None, "created_at": created[i], "modified_at": modified[i]}
+        for i in range(num_projects)
+    ])
+
+    created, modified = timestamps(rng, num_paths)
+    paths = [
+        {
+            "id": path_id + i, "project_id": project_id + int(rng.integers(0, num_projects)),
+            "input": str(rng.choice(INPUTS)), "output": str(rng.choice(OUTPUTS)), "description": None,
+            "created_at": created[i], "modified_at": modified[i],
+        }
+        for i in range(num_paths)
+    ]
+    write_rows(conn, Path.__table__, paths)
+
+    # Each chain is written last stage first so `next_stackup_id` only refers to rows already inserted
+    stackups = []
+    for path in paths:
+        length = int(rng.integers(stages[0], stages[1] + 1))
+        chain = rng.choice(version_ids, length)
+        for position in reversed(range(length)):
+            stackups.append({
+                "id": stackup_id + position, "path_id": path["id"], "component_version_id": int(chain[position]),
+                "next_stackup_id": stackup_id + position + 1 if position < length - 1 else None, "position": position,
+            })
+        stackup_id += length
+    write_rows(conn, Stackup.__table__, stackups)
+    return [path["id"] for path in paths]
+
+
+def seed(conn: Connection, scale: float = 0.01, seed: int = 0, points: int = 2001, stages: tuple[int, int] = (4, 30)) -> list[int]:
+    """Add a synthetic library of `scale` times the production row counts (not committed), returns the path IDs
+
+    The same `seed`, `scale` and existing rows produce the same data. Each version stores
+    about 64 bytes per curve point, 128 kB at the default 2001 points.
+    """
+    rng = np.random.default_rng(seed)
+    version_ids = seed_components(conn, rng, max(1, round(scale*COMPONENTS)), points)
+    path_ids = seed_paths(conn, rng, max(1, round(scale*PROJECTS)), max(1, round(scale*PATHS)), version_ids, stages)
+    reset_sequences(conn)
+    return path_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database with a synthetic component library, projects and paths")
+    parser.add_argument("--scale", type=float, default=0.01, help=f"Fraction of production size ({COMPONENTS} components, ~{VERSIONS_PER_COMPONENT*COMPONENTS} versions, {PATHS} paths)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--points", type=int, default=2001, help="Points per curve")
+    parser.add_argument("--min-stages", type=int, default=4, help="Shortest stackup")
+    parser.add_argument("--max-stages", type=int, default=30, help="Longest stackup")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if engine.dialect.name == "sqlite":
+        SQLAlchemyBase.metadata.create_all(engine)
+    with engine.begin() as conn:
+        path_ids = seed(conn, args.scale, args.seed, args.points, (args.min_stages, args.max_stages))
+    print(f"Added {len(path_ids)} paths in {time.perf_counter() - start:.1f} s")
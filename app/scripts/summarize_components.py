@@ -0,0 +1,8 @@
+from app.database import LocalSession
+from app.crud.crud_components import refresh_component_summaries
+
+
+if __name__ == "__main__":
+    db = LocalSession()
+    print(f"Summarized {refresh_component_summaries(db)} component versions")
+    db.close()
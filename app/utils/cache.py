@@ -0,0 +1,159 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+from pydantic import BaseModel as PydanticBase
+from sqlalchemy import event, select
+
+from app.config import config
+from app.database.models.components import ComponentData, ComponentVersion
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the total size (bytes) of its values"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> None:
+        """Store `value` under `key`, evicting the least recently used entries to stay within `max_bytes`"""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches `predicate`. Returns the number of entries removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._bytes -= self._entries.pop(key)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Parsed and resampled component curves keyed by (component_version_id, parameter, grid signature).
+# A grid signature of None holds the curve as stored on the component.
+curve_cache = LRUCache(max_bytes=config.CURVE_CACHE_BYTES)
+
+
+# Serialized analysis results keyed by (path_id, component_version_ids, analysis_key)
+result_cache = LRUCache(max_bytes=config.RESULT_CACHE_BYTES)
+
+
+def analysis_key(stages: list[tuple], params: PydanticBase) -> str:
+    """Content hash of an analysis: the identity of the data of each stage in signal order plus the analysis params
+
+    A stage is identified by its component version ID, the revision of its component data and
+    the band of its component, so the key changes when the data behind a result does.
+    """
+    content = json.dumps({"stackup": [list(stage) for stage in stages], "params": params.model_dump(mode="json")}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def invalidate_paths(path_ids: list[int] | int) -> None:
+    """Drop all cached analysis results for `path_ids`"""
+    if isinstance(path_ids, int):
+        path_ids = [path_ids]
+    ids = set(path_ids)
+    result_cache.discard_where(lambda key: key[0] in ids)
+
+
+def grid_signature(freqs: np.ndarray) -> str:
+    """Stable identifier for a frequency grid"""
+    return hashlib.blake2b(np.ascontiguousarray(freqs).tobytes(), digest_size=16).hexdigest()
+
+
+def parsed_curve(component_version_id: int | None, data: ComponentData, param: str) -> tuple[np.ndarray, np.ndarray] | None:
+    """(freq, mag) float arrays for `param` of a component's data"""
+    key = (component_version_id, param, None)
+    if component_version_id is not None:
+        curve = curve_cache.get(key)
+        if curve is not None:
+            return curve
+
+    curve = data.curve(param)
+    if curve is None:
+        return None
+
+    if component_version_id is not None:
+        curve_cache.put(key, curve, curve[0].nbytes + curve[1].nbytes)
+    return curve
+
+
+def resampled_curve(component_version_id: int | None, get_data: Callable[[], ComponentData], param: str, freqs: np.ndarray, grid: str | None) -> np.ndarray | None:
+    """`param` of a component interpolated onto `freqs`, or None if the component has no data for it
+
+    `get_data` is only called on a cache miss so the component data need not be loaded otherwise.
+    With no `grid` the resampled curve is neither looked up nor cached, for grids that will not
+    be seen again. The parsed curve is still cached.
+    """
+    key = (component_version_id, param, grid)
+    cached = component_version_id is not None and grid is not None
+    if cached:
+        mag = curve_cache.get(key)
+        if mag is not None:
+            return mag
+
+    curve = parsed_curve(component_version_id, get_data(), param)
+    if curve is None:
+        return None
+    mag = np.interp(freqs, *curve)
+    mag.setflags(write=False)
+
+    if cached:
+        curve_cache.put(key, mag, mag.nbytes)
+    return mag
+
+
+def invalidate_component_versions(component_version_ids: list[int]) -> None:
+    """Drop all cached curves and analysis results for `component_version_ids`"""
+    ids = set(component_version_ids)
+    curve_cache.discard_where(lambda key: key[0] in ids)
+    result_cache.discard_where(lambda key: not ids.isdisjoint(key[1]))
+
+
+@event.listens_for(ComponentData, "after_update")
+@event.listens_for(ComponentData, "after_delete")
+def _invalidate_component_data(mapper, connection, target: ComponentData) -> None:
+    stmt = select(ComponentVersion.id).where(ComponentVersion.component_data_id == target.id)
+    invalidate_component_versions(connection.scalars(stmt).all())
@@ -0,0 +1,78 @@
+import io
+import json
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError: # Optional, only needed for Arrow responses
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NPY_MEDIA_TYPE = "application/x-npy"
+
+def arrow_available() -> bool:
+    return pa is not None
+
+def encode_arrow(freqs: np.ndarray[int], results: dict[str, np.ndarray[float]], dtype: str = "float64", metadata: dict[str, str] | None = None) -> bytes:
+    """Arrow IPC stream with one row per frequency
+
+    Columns are `freq` (int64) and, for each (stages x freqs) array of `results`, a fixed-size
+    list of its value at every stage. `metadata` is attached to the schema.
+    """
+    if pa is None:
+        raise ModuleNotFoundError("pyarrow is required for Arrow responses.")
+    columns = {"freq": pa.array(freqs, type=pa.int64())}
+    for name, values in results.items():
+        flat = np.ascontiguousarray(values.T, dtype=dtype).reshape(-1)
+        columns[name] = pa.FixedSizeListArray.from_arrays(pa.array(flat), values.shape[0])
+    table = pa.table(columns, metadata=metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def encode_npy(arrays: dict[str, np.ndarray]) -> bytes:
+    """Concatenated .npy frames of `arrays` in order, readable with repeated `np.load` on one file object"""
+    buf = io.BytesIO()
+    for values in arrays.values():
+        np.lib.format.write_array(buf, np.ascontiguousarray(values), allow_pickle=False)
+    return buf.getvalue()
+
+def arrow_metadata(**values) -> dict[str, str]:
+    """Schema metadata with every value JSON encoded"""
+    return {key: json.dumps(value) for key, value in values.items()}
+
+def negotiate(accept: str | None, supported: list[str]) -> str | None:
+    """The media type of `supported` an `Accept` header prefers, None if it accepts none of them
+
+    Each media type takes the q-value of the most specific range matching it (type/subtype,
+    then type/*, then */*) and ties go to the earliest in `supported`. A missing header
+    accepts the first.
+    """
+    if not accept or not accept.strip():
+        return supported[0] if supported else None
+    ranges = {}
+    for part in accept.split(","):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0), 1)
+                except ValueError:
+                    q = 0
+        ranges[media_range.lower()] = max(q, ranges.get(media_range.lower(), 0))
+
+    best, best_q = None, 0
+    for media_type in supported:
+        for pattern in (media_type, f"{media_type.split('/')[0]}/*", "*/*"):
+            if pattern in ranges:
+                if ranges[pattern] > best_q:
+                    best, best_q = media_type, ranges[pattern]
+                break
+    return best
@@ -0,0 +1,381 @@
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, wait as wait_futures
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable
+
+import numpy as np
+from pydantic import BaseModel as PydanticBase
+from sqlalchemy import Engine, create_engine, func, inspect
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.crud.crud_jobs import *
+from app.crud.crud_paths import get_path_with_stackup, get_path_ids, get_stackups_by_path
+from app.database.backends import database_urls, engine_options, configure_engine
+from app.database.models.components import Component, ComponentVersion, ComponentData
+from app.database.models.stackups import Stackup
+from app.utils.montecarlo import MonteCarloInputModel, monte_carlo
+from app.utils.rfcascade import AnalysisParamsModel, BatchAnalysisInputModel, PathResultsModel, analysis_freqs, analyze, analyze_batch
+from app.utils.sweep import SweepInputModel, sweep
+from app.utils.touchstone import TouchstoneImportModel, touchstone_sources, import_touchstone
+
+logger = logging.getLogger(__name__)
+
+# A work unit is a picklable function and its arguments, returning serialized JSON
+WorkUnit = tuple[Callable[..., bytes], tuple]
+
+# A stage crosses to the worker processes as the column values of its component version,
+# component and component data, never as a pickled ORM instance
+StageColumns = tuple[dict, dict | None, dict | None]
+
+class JobQueueFullError(Exception):
+    """Raised when `JOB_QUEUE_DEPTH` jobs are already waiting for a worker"""
+
+@dataclass
+class _Job:
+    id: int
+    engine: Engine
+    units: list[WorkUnit]
+    result_template: bytes | None
+    results: list[bytes | None]
+    next_unit: int = 0
+    done: int = 0
+    futures: set[Future] = field(default_factory=set)
+    abandoned: bool = False # Cancelled or failed, outstanding results are ignored
+
+class JobQueue:
+    """Runs analysis jobs on a bounded process pool
+
+    Each job is split into work units. No more units than there are workers are handed to the
+    pool at once, oldest job first, so the rest of the queue stays here where it can be cancelled
+    and a job is only marked running once its work has actually started. Status, progress and
+    results are written to `analysis_jobs` as units start and finish.
+
+    While it holds jobs a heartbeat thread marks them alive every `JOB_HEARTBEAT_SECONDS` under
+    `worker_id`, so `resume_jobs` in other processes leaves them alone. Jobs that are no longer
+    active in the database (cancelled through another process) are dropped on the next beat.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._pool: ProcessPoolExecutor | None = None
+        self._jobs: dict[int, _Job] = {} # Unfinished jobs in submission order
+        self._inflight = 0
+        self._lock = threading.RLock()
+        self._worker_id: tuple[int, str] | None = None
+        self._heartbeat: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @property
+    def worker_id(self) -> str:
+        """ID of this process in `analysis_jobs.worker_id`, new after a fork so server workers never share one"""
+        if self._worker_id is None or self._worker_id[0] != os.getpid():
+            self._worker_id = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+        return self._worker_id[1]
+
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker"""
+        with self._lock:
+            return sum(job.next_unit == 0 for job in self._jobs.values())
+
+    def full(self) -> bool:
+        return self.queued() >= self.max_queued
+
+    def submit(self, engine: Engine, job_id: int, units: list[WorkUnit], result_template: bytes | None = None, force: bool = False) -> None:
+        """Queue the work units of job with `job_id`
+
+        With a `result_template` the results of the units are combined into a JSON array put in
+        its `%b`, otherwise the result of the single unit is the job's.
+        """
+        if not units:
+            result = result_template % b"[]" if result_template is not None else b"null"
+            _update(engine, job_id, status="succeeded", progress=1, result=result, finished_at=func.current_timestamp())
+            return
+
+        with self._lock:
+            if not force and self.full():
+                raise JobQueueFullError(f"{self.queued()} analysis jobs are already queued.")
+            self._jobs[job_id] = _Job(id=job_id, engine=engine, units=units, result_template=result_template, results=[None]*len(units))
+            started = self._dispatch()
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._stopped.clear()
+                self._heartbeat = threading.Thread(target=self._beat, args=(engine,), name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+        self._mark_started(started)
+
+    def cancel(self, job_id: int, wait: bool = False) -> bool:
+        """Stop job with `job_id`. Queued units are dropped; running units finish but their results are discarded.
+
+        If `wait`, block until those running units have finished.
+        """
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            job.abandoned = True
+            for future in list(job.futures):
+                future.cancel()
+            running = list(job.futures)
+        if wait:
+            wait_futures(running)
+        return True
+
+    def holds_elsewhere(self, job: AnalysisJob) -> bool:
+        """Whether another process may still be running `job`, i.e. it holds the job and marked it alive recently"""
+        stale_before = _utcnow() - timedelta(seconds=config.JOB_STALE_SECONDS)
+        return job.worker_id not in (None, self.worker_id) and job.heartbeat_at is not None and job.heartbeat_at >= stale_before
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            for job_id in list(self._jobs):
+                self.cancel(job_id)
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _dispatch(self) -> list[_Job]:
+        """Hand units to the pool while workers are free. Returns the jobs that just started."""
+        started = []
+        for job in list(self._jobs.values()):
+            while job.next_unit < len(job.units) and self._inflight < self.workers:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                if job.next_unit == 0:
+                    started.append(job)
+                index = job.next_unit
+                fn, args = job.units[index]
+                job.next_unit += 1
+                self._inflight += 1
+                future = self._pool.submit(fn, *args)
+                job.futures.add(future)
+                future.add_done_callback(partial(self._unit_done, job, index))
+            if self._inflight >= self.workers:
+                break
+        return started
+
+    def _unit_done(self, job: _Job, index: int, future: Future) -> None:
+        values = None
+        with self._lock:
+            self._inflight -= 1
+            job.futures.discard(future)
+            if not job.abandoned and not future.cancelled():
+                error = future.exception()
+                if error is not None:
+                    self.cancel(job.id)
+                    values = {"status": "failed", "error": str(error) or type(error).__name__, "finished_at": func.current_timestamp()}
+                else:
+                    job.results[index] = future.result()
+                    job.done += 1
+                    values = {"progress": job.done/len(job.units)}
+                    if job.done == len(job.units):
+                        del self._jobs[job.id]
+                        values |= {"status": "succeeded", "result": _combine(job), "finished_at": func.current_timestamp()}
+            started = self._dispatch()
+        self._mark_started(started)
+        if values is not None:
+            _update(job.engine, job.id, **values)
+
+    def _beat(self, engine: Engine) -> None:
+        """Mark the jobs this queue holds alive until shutdown"""
+        while not self._stopped.wait(config.JOB_HEARTBEAT_SECONDS):
+            with self._lock:
+                job_ids = list(self._jobs)
+            if not job_ids:
+                continue
+            try:
+                with Session(engine) as db:
+                    alive = touch_jobs(db, self.worker_id, job_ids, _utcnow())
+                    db.commit()
+            except Exception:
+                logger.exception("Failed to mark analysis jobs alive")
+                continue
+            for job_id in set(job_ids) - set(alive):
+                self.cancel(job_id)
+
+    def _mark_started(self, jobs: list[_Job]) -> None:
+        for job in jobs:
+            _update(job.engine, job.id, statuses=("queued",), status="running", started_at=func.current_timestamp())
+
+
+job_queue = JobQueue(workers=config.JOB_WORKERS, max_queued=config.JOB_QUEUE_DEPTH)
+
+
+def start_job(db: Session, kind: str, request: PydanticBase, path_id: int | None = None, project_id: int | None = None, engine: Engine | None = None) -> AnalysisJob:
+    """Record an analysis job and queue it on `job_queue`. Raises JobQueueFullError if the queue is full.
+
+    Progress is written through `engine`, by default the one `db` is bound to. Pass a sync engine
+    when `db` is the sync side of an AsyncSession as the queue updates jobs from its own threads.
+    """
+    if job_queue.full():
+        raise JobQueueFullError(f"{job_queue.queued()} analysis jobs are already queued.")
+    job = AnalysisJob(
+        kind=kind, request=request.model_dump(mode="json"), path_id=path_id, project_id=project_id,
+        worker_id=job_queue.worker_id, heartbeat_at=_utcnow(),
+    )
+    job = add_job(db, job)
+    units, result_template = job_units(db, job)
+    db.commit()
+    job_queue.submit(engine or db.get_bind(), job.id, units, result_template)
+    db.refresh(job)
+    return job
+
+
+def resume_jobs(db: Session) -> int:
+    """Take over jobs whose process stopped marking them alive and requeue them here. Returns the number requeued.
+
+    Run at startup and then every `JOB_HEARTBEAT_SECONDS`. Jobs are claimed atomically, so
+    when several server workers look at once each orphaned job is resumed by only one.
+    """
+    now = _utcnow()
+    job_ids = claim_jobs(db, job_queue.worker_id, now, now - timedelta(seconds=config.JOB_STALE_SECONDS))
+    db.commit()
+    jobs = get_jobs_by_ids(db, job_ids)
+    requeued = []
+    for job in jobs:
+        try:
+            units, result_template = job_units(db, job)
+        except LookupError as e:
+            update_job(db, job.id, status="failed", error=str(e), finished_at=func.current_timestamp())
+            continue
+        update_job(db, job.id, status="queued", progress=0, started_at=None)
+        requeued.append((job.id, units, result_template))
+    db.commit()
+    for job_id, units, result_template in requeued:
+        job_queue.submit(db.get_bind(), job_id, units, result_template, force=True)
+    return len(requeued)
+
+
+def job_units(db: Session, job: AnalysisJob) -> tuple[list[WorkUnit], bytes | None]:
+    """Load everything job needs from the database and split it into work units
+
+    Returns the units and the `JobQueue.submit` result template. Raises LookupError if the
+    path or project the job targets no longer exists.
+    """
+    if job.kind in ("analyze", "monte_carlo", "sweep"):
+        path = get_path_with_stackup(db, job.path_id) if job.path_id is not None else None
+        if path is None:
+            raise LookupError(f"No path found with path ID: {job.path_id}")
+        stackup = _stage_columns(path.stackups)
+        if job.kind == "analyze":
+            return [(_analyze_unit, (stackup, AnalysisParamsModel.model_validate(job.request)))], None
+        if job.kind == "monte_carlo":
+            return [(_monte_carlo_unit, (stackup, MonteCarloInputModel.model_validate(job.request)))], None
+        return [(_sweep_unit, (stackup, SweepInputModel.model_validate(job.request)))], None
+
+    if job.kind == "touchstone_import":
+        body = TouchstoneImportModel.model_validate(job.request)
+        names = touchstone_sources(body.source)
+        # Workers open their own connections, one transaction per batch of files
+        size = body.batch_size
+        return [(_import_unit, (body, names[start:start+size])) for start in range(0, len(names), size)], b"%b"
+
+    if job.kind == "batch":
+        body = BatchAnalysisInputModel.model_validate(job.request)
+        path_ids, params = list(dict.fromkeys(body.path_ids)), body.params
+    elif job.kind == "project":
+        if job.project_id is None:
+            raise LookupError("The project for this job no longer exists.")
+        path_ids, params = get_path_ids(db, project_id=job.project_id), AnalysisParamsModel.model_validate(job.request)
+    else:
+        raise ValueError(f"Unknown job kind: {job.kind}")
+
+    stackups = get_stackups_by_path(db, path_ids)
+    path_ids = list(stackups)
+    # Every unit cascades on the grid of the whole batch, sent once as in BatchResultsModel
+    freqs = analysis_freqs(params, list(stackups.values()))
+    size = config.JOB_PATHS_PER_UNIT
+    units = [
+        (_analyze_paths_unit, (path_ids[start:start+size], [_stage_columns(stackups[path_id]) for path_id in path_ids[start:start+size]], params, freqs))
+        for start in range(0, len(path_ids), size)
+    ]
+    return units, b'{"freq":' + json.dumps(freqs.tolist()).encode() + b',"paths":%b}'
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _update(engine: Engine, job_id: int, **values) -> None:
+    try:
+        with Session(engine) as db:
+            update_job(db, job_id, **values)
+            db.commit()
+    except Exception:
+        logger.exception("Failed to update analysis job %s", job_id)
+
+
+def _combine(job: _Job) -> bytes:
+    if job.result_template is not None:
+        return job.result_template % (b"[" + b",".join(result for result in job.results if result) + b"]")
+    return job.results[0]
+
+
+def _columns(instance) -> dict | None:
+    if instance is None:
+        return None
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _stage_columns(stackup: list[Stackup]) -> list[StageColumns]:
+    """Plain values of a loaded stackup for a work unit"""
+    return [
+        (_columns(stage.component_version), _columns(stage.component_version.component), _columns(stage.component_version.component_data))
+        for stage in stackup
+    ]
+
+
+def _stackup(stages: list[StageColumns]) -> list[Stackup]:
+    """Rebuild a stackup from `_stage_columns` as transient instances in a worker"""
+    stackup = []
+    for version, component, data in stages:
+        version = ComponentVersion(
+            **version,
+            component=Component(**component) if component is not None else None,
+            component_data=ComponentData(**data) if data is not None else None,
+        )
+        stackup.append(Stackup(component_version_id=version.id, component_version=version))
+    return stackup
+
+
+# Work units, run in the worker processes
+def _analyze_unit(stages: list[StageColumns], params: AnalysisParamsModel) -> bytes:
+    return analyze(_stackup(stages), params).model_dump_json().encode()
+
+def _analyze_paths_unit(path_ids: list[int], stackups: list[list[StageColumns]], params: AnalysisParamsModel, freqs: np.ndarray[int]) -> bytes:
+    """Comma-separated PathResultsModel objects for a chunk of paths on the grid `freqs`"""
+    _, results = analyze_batch([_stackup(stages) for stages in stackups], params, freqs)
+    return b",".join(
+        PathResultsModel.model_construct(path_id=path_id, **dict(result)).model_dump_json().encode()
+        for path_id, result in zip(path_ids, results)
+    )
+
+def _monte_carlo_unit(stages: list[StageColumns], body: MonteCarloInputModel) -> bytes:
+    return monte_carlo(_stackup(stages), body.params, body.monte_carlo).model_dump_json().encode()
+
+def _sweep_unit(stages: list[StageColumns], body: SweepInputModel) -> bytes:
+    return sweep(_stackup(stages), body.params, body).model_dump_json().encode()
+
+_worker_engine: Engine | None = None
+
+def _import_unit(body: TouchstoneImportModel, names: list[str]) -> bytes:
+    """Comma-separated TouchstoneFileResultModel objects for a batch of files
+
+    The worker connects with the URL from its own config, credentials never go through the pool.
+    """
+    global _worker_engine
+    if _worker_engine is None:
+        url, _ = database_urls(config.DB_URL)
+        _worker_engine = create_engine(url, **engine_options(url))
+        configure_engine(_worker_engine)
+    with Session(_worker_engine) as db:
+        results = import_touchstone(db, body.source, names, body)
+    return b",".join(result.model_dump_json().encode() for result in results)
@@ -0,0 +1,172 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+
+import numpy as np
+from pydantic import ConfigDict, BaseModel as PydanticBase, Field, model_validator
+
+from app.config import config
+from app.database.models.stackups import Stackup
+from app.utils.cache import grid_signature
+from app.utils.rfcascade import AnalysisParamsModel, analysis_freqs, stage_matrix, cascade_gain, cascade_nf, thermal_noise
+
+class ToleranceModel(PydanticBase):
+    """Part-to-part spread of a component's gain and NF (dB)
+
+    Applies to the component with `component_id`, else to every component of `component_type_id`,
+    else (neither set) to every component. `gain`/`nf` are the standard deviation of a normal
+    distribution or the half-width of a uniform one.
+    """
+    component_id: int | None = None
+    component_type_id: int | None = None
+    distribution: Literal["normal", "uniform"] = "normal"
+    gain: float = Field(default=0, ge=0)
+    nf: float = Field(default=0, ge=0)
+
+class MonteCarloParamsModel(PydanticBase):
+    trials: int = Field(default=1000, gt=0, le=1_000_000)
+    seed: int | None = None
+    tolerances: list[ToleranceModel] = []
+    percentiles: list[float] = [5, 50, 95]
+    memory_budget: int = Field(default=256*1024**2, gt=0) # Bytes
+
+    @model_validator(mode="after")
+    def validate_percentiles(self):
+        if any(not 0 <= p <= 100 for p in self.percentiles):
+            raise ValueError("percentiles must be between 0 and 100.")
+        return self
+
+class MonteCarloInputModel(PydanticBase):
+    params: AnalysisParamsModel
+    monte_carlo: MonteCarloParamsModel = MonteCarloParamsModel()
+
+class EnvelopeModel(PydanticBase):
+    percentile: float
+    gain: list[float]
+    nf: list[float]
+    snr: list[float]
+
+class MonteCarloResultsModel(PydanticBase):
+    model_config = ConfigDict(from_attributes=True)
+    freq: list[int]
+    trials: int
+    seed: int
+    envelopes: list[EnvelopeModel] # Cascaded output of the chain at each percentile
+    pass_yield: float # Fraction of trials with snr >= min_snr at every frequency
+    freq_yield: list[float] # Fraction of trials with snr >= min_snr at each frequency
+
+# Number of (trials x stages x freqs) float64 arrays alive at once while cascading a chunk
+_CHUNK_ARRAYS = 5
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+def monte_carlo_workers() -> int:
+    """Processes a parallel run uses, `MONTE_CARLO_WORKERS` capped at the number of CPUs"""
+    return max(1, min(config.MONTE_CARLO_WORKERS, os.cpu_count() or 1))
+
+def _shared_pool() -> ProcessPoolExecutor:
+    """Pool shared by every parallel run in this process, so concurrent requests never add processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=monte_carlo_workers())
+        return _pool
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def monte_carlo(stackup: list[Stackup], params: AnalysisParamsModel, mc: MonteCarloParamsModel, parallel: bool = False) -> MonteCarloResultsModel:
+    """Monte Carlo tolerance analysis of an RF stackup
+
+    Trials are cascaded as (trials x stages x freqs) arrays in chunks sized so the whole run
+    stays within `mc.memory_budget`. If `parallel`, chunks are spread over the shared pool of
+    `monte_carlo_workers()` processes; job workers run in a single process so pools never nest.
+    Only the cascaded output of each trial is kept, as float32.
+    """
+    if not stackup:
+        raise ValueError("Monte Carlo analysis requires a stackup with at least one stage.")
+
+    freqs = analysis_freqs(params, [stackup])
+    grid = grid_signature(freqs)
+    gain = stage_matrix(stackup, "gain", freqs, grid=grid)
+    nf = stage_matrix(stackup, "nf", freqs, grid=grid)
+    spread, uniform = stage_tolerances(stackup, mc.tolerances)
+
+    # Draws are made up front from one generator so results do not depend on chunking or workers.
+    # Draws and output samples (gain, nf, snr) are kept for every trial, chunks use what is left.
+    seed = mc.seed if mc.seed is not None else int(np.random.SeedSequence().entropy % 2**63)
+    draws = _draw(np.random.default_rng(seed), spread, uniform, mc.trials)
+    kept_bytes = draws.nbytes + 3*mc.trials*len(freqs)*np.dtype(np.float32).itemsize
+    workers = monte_carlo_workers() if parallel else 1
+    chunk = (mc.memory_budget - kept_bytes) // workers // (_CHUNK_ARRAYS*len(stackup)*len(freqs)*8)
+    if chunk < 1:
+        raise ValueError("memory_budget is too small for this many trials and frequency points.")
+
+    noise = thermal_noise(params.temp, params.rbw)
+    args = [(gain, nf, draws[start:start+chunk], noise, params.pwr_in) for start in range(0, mc.trials, chunk)]
+    if workers > 1 and len(args) > 1:
+        chunks = list(_shared_pool().map(_run_chunk, *zip(*args)))
+    else:
+        chunks = [_run_chunk(*arg) for arg in args]
+    out_gain, out_nf, out_snr = (np.concatenate(metric) for metric in zip(*chunks))
+
+    passed = out_snr >= params.min_snr
+    envelopes = [
+        np.percentile(metric, mc.percentiles, axis=0)
+        for metric in (out_gain, out_nf, out_snr)
+    ]
+    return MonteCarloResultsModel(
+        freq=freqs.tolist(),
+        trials=mc.trials,
+        seed=seed,
+        envelopes=[
+            EnvelopeModel(percentile=p, gain=env_gain.tolist(), nf=env_nf.tolist(), snr=env_snr.tolist())
+            for p, env_gain, env_nf, env_snr in zip(mc.percentiles, *envelopes)
+        ],
+        pass_yield=float(passed.all(axis=1).mean()),
+        freq_yield=passed.mean(axis=0).tolist(),
+    )
+
+def stage_tolerances(stackup: list[Stackup], tolerances: list[ToleranceModel]) -> tuple[np.ndarray[float], np.ndarray[bool]]:
+    """Per-stage (gain, nf) spread as a (stages x 2) array and whether each stage is uniformly distributed"""
+    by_component = {tol.component_id: tol for tol in tolerances if tol.component_id is not None}
+    by_type = {tol.component_type_id: tol for tol in tolerances if tol.component_id is None and tol.component_type_id is not None}
+    default = next((tol for tol in tolerances if tol.component_id is None and tol.component_type_id is None), None)
+
+    spread = np.zeros((len(stackup), 2))
+    uniform = np.zeros(len(stackup), dtype=bool)
+    for i, stage in enumerate(stackup):
+        component = stage.component_version.component
+        tol = by_component.get(component.id) or by_type.get(component.component_type_id) or default
+        if tol is not None:
+            spread[i] = (tol.gain, tol.nf)
+            uniform[i] = tol.distribution == "uniform"
+    return spread, uniform
+
+def _draw(rng: np.random.Generator, spread: np.ndarray[float], uniform: np.ndarray[bool], trials: int) -> np.ndarray[float]:
+    """Random (gain, nf) offsets (dB) as a (trials x stages x 2) array"""
+    draws = np.where(
+        uniform[:, None],
+        rng.uniform(-1, 1, size=(trials, *spread.shape)),
+        rng.standard_normal(size=(trials, *spread.shape)),
+    )
+    draws *= spread
+    return draws
+
+def _run_chunk(gain, nf, draws, noise, pwr_in):
+    """Cascade a (trials x stages x 2) chunk of `draws` and return the output (gain, nf, snr) of each trial as float32"""
+    trial_gain = gain + draws[:, :, 0, None]
+    trial_nf = np.maximum(nf + draws[:, :, 1, None], 0)
+    casc_gain = cascade_gain(trial_gain)
+    casc_nf = cascade_nf(trial_nf, casc_gain - trial_gain)
+
+    out_gain = casc_gain[:, -1]
+    out_nf = casc_nf[:, -1]
+    out_snr = pwr_in - noise - out_nf
+    return out_gain.astype(np.float32), out_nf.astype(np.float32), out_snr.astype(np.float32)
@@ -1,69 +1,415 @@
+from typing import Iterator, Literal
+
 import numpy as np
 
 from pydantic import ConfigDict, BaseModel as PydanticBase, Field, model_validator
 
 from app.database.models.stackups import Stackup
+from app.utils.cache import grid_signature, parsed_curve, resampled_curve
 
 class AnalysisParamsModel(PydanticBase):
     model_config = ConfigDict(from_attributes=True)
     start_freq: int = Field(default=0,gt=0)
-    stop_freq: int = Field(default=18e9,gt=0)
+    stop_freq: int = Field(default=18_000_000_000,gt=0)
     points_per_mhz: int = Field(default=1, gt=0)
-    rbw: int = Field(default=1e6,gt=0)
-    temp: int
+    rbw: int = Field(default=1_000_000,gt=0)
+    temp: int = Field(gt=0) # Kelvin
     pwr_in: int
     min_snr: int
+    grid: Literal["uniform", "adaptive"] = "uniform"
+    max_points: int = Field(default=20_000, gt=1) # Adaptive grid only
+    grid_tolerance: float = Field(default=0.05, gt=0) # dB, adaptive grid only
 
     @model_validator(mode="after")
     def validate_freq_range(self):
         if self.start_freq >= self.stop_freq:
             raise ValueError("start_freq must be less than stop_freq.")
         return self
-    
-class CascadeResultsModel(PydanticBase):
-    model_config = ConfigDict(from_attributes=True)
-    freq: list[list[int]] | None = None
-    gain: list[list[int]] | None = None
-    nf: list[list[int]] | None = None
-    p1db: list[list[int]] | None = None
+
+class FrequencyRangeModel(PydanticBase):
+    stage: int
+    start_freq: int
+    stop_freq: int
+
+class StageResultsModel(PydanticBase):
+    """Cascade results at every stage, on a frequency grid given alongside"""
+    # Unbounded values (e.g. the intercept of a perfectly linear chain) serialize as null
+    model_config = ConfigDict(from_attributes=True, ser_json_inf_nan="null")
+    gain: list[list[float]] | None = None
+    nf: list[list[float]] | None = None
+    p1db: list[list[float]] | None = None
+    ip1db: list[list[float]] | None = None
+    oip3: list[list[float]] | None = None
+    iip3: list[list[float]] | None = None
+    oip2: list[list[float]] | None = None
+    iip2: list[list[float]] | None = None
+    p1db_margin: list[list[float]] | None = None
+    max_input_margin: list[list[float]] | None = None
+    noise_floor: list[list[float]] | None = None
+    signal: list[list[float]] | None = None
+    snr: list[list[float]] | None = None
+    mds: list[list[float]] | None = None
+    sfdr: list[list[float]] | None = None
+    snr_violations: list[FrequencyRangeModel] | None = None # Where snr < min_snr
+    out_of_band: list[FrequencyRangeModel] | None = None # Where a stage is outside its component's range or data
+
+class CascadeResultsModel(StageResultsModel):
+    freq: list[int] | None = None # Shared by every stage
+
+class PathResultsModel(StageResultsModel):
+    path_id: int
+
+class BatchResultsModel(PydanticBase):
+    """Cascade results of several paths on one shared frequency grid"""
+    model_config = ConfigDict(ser_json_inf_nan="null")
+    freq: list[int]
+    paths: list[PathResultsModel]
+
+class CascadeChunkModel(CascadeResultsModel):
+    """Cascade results for a slice of the frequency grid, one line of a streamed analysis"""
+    start: int # Index of the first point of the slice in the full grid
+
+class CascadeSummaryModel(PydanticBase):
+    """Last line of a streamed analysis"""
+    num_points: int
+    num_stages: int
+    snr_violations: list[FrequencyRangeModel] # Where snr < min_snr
+    out_of_band: list[FrequencyRangeModel] # Where a stage is outside its component's range or data
+
+class BatchAnalysisInputModel(PydanticBase):
+    path_ids: list[int] = Field(min_length=1)
+    params: AnalysisParamsModel
+
+# Stage parameters used by the analysis and the value used for a stage with no data for
+# a parameter (i.e. a lossless, noiseless, perfectly linear stage). `p1db`, `ip3` and `ip2`
+# are output-referred; `max_input` is the maximum safe input power.
+DEFAULT_VALUES = {
+    "gain": 0.0,
+    "nf": 0.0,
+    "p1db": np.inf,
+    "ip3": np.inf,
+    "ip2": np.inf,
+    "max_input": np.inf,
+}
+
+# Cascade outputs returned per stage
+RESULT_FIELDS = (
+    "gain", "nf", "p1db", "ip1db", "oip3", "iip3", "oip2", "iip2", "p1db_margin", "max_input_margin",
+    "noise_floor", "signal", "snr", "mds", "sfdr",
+)
+
+BOLTZMANN = 1.380649e-23 # J/K
+
+# Upper bound on the size of one (paths x stages x freqs) matrix in a batched analysis
+BATCH_BYTES = 256*1024**2
+
+# Frequency points per line of a streamed analysis
+STREAM_CHUNK_POINTS = 4096
+
+# Cascade outputs an adaptive grid has to follow, and the most refine/decimate passes it makes
+ADAPTIVE_FIELDS = ("gain", "nf", "p1db", "oip3", "oip2")
+ADAPTIVE_MAX_PASSES = 64
 
 def analyze(stackup: list[Stackup], params: AnalysisParamsModel) -> CascadeResultsModel:
     """Perform a cascade analysis of an RF stackup"""
-    results = CascadeResultsModel()
-    freq_mat = analysis_freqs(stackup,params)
-    gain = cascade_gain(stackup, freq_mat)
-    nf = cascade_nf(stackup,gain,freq_mat)
-
-    results.freq = freq_mat.tolist()
-    results.gain = gain.tolist()
-    results.nf = nf.tolist()
-    return results
-
-def analysis_freqs(stackup: list[Stackup], params: AnalysisParamsModel) -> np.ndarray[int]:
-    num_points = int((params.stop_freq-params.start_freq)/(1e6*params.points_per_mhz))+1
-    freqs = np.linspace(params.start_freq,params.stop_freq,num_points,dtype=int)
-    freq_mat = np.tile(freqs, (len(stackup), 1))
-    return freq_mat
-
-def cascade_gain(stackup: list[Stackup], freq_mat: np.ndarray[int]) -> np.ndarray[float]:
-    gain = np.full(freq_mat.shape(),None)
-    for i,comp in enumerate(stackup):
-        new_gain = np.interp(freq_mat[i],comp.component_version.component_data.gain["freq"], comp.component_version.component_data.gain["mag"])
-        if i == 0:
-            gain[i] = new_gain
-        else:
-            gain[i] = gain[i-1] + new_gain
-    return gain
-
-def cascade_nf(stackup: list[Stackup], gain: np.ndarray[float], freq_mat: np.ndarray[int]) -> np.ndarray[float]:
-    nf = np.full(freq_mat.shape(),None)
-    for i,comp in enumerate(stackup):
-        new_nf = np.interp(freq_mat[i],comp.component_version.component_data.nf["freq"], comp.component_version.component_data.nf["mag"])
-        if i == 0:
-            nf[i] = new_nf
-        else:
-            prev_lin_nf = 10**(nf[i-1]/10)
-            cur_lin_nf = 10**(new_nf/10)
-            casc_lin_gain = 10**(gain[i]/10)
-            nf[i] = 10*np.log10(prev_lin_nf + (cur_lin_nf - 1)/casc_lin_gain)
-    return nf
\ No newline at end of file
+    freqs, (results,) = analyze_batch([stackup], params)
+    return CascadeResultsModel.model_construct(freq=freqs.tolist(), **dict(results))
+
+def analyze_batch(stackups: list[list[Stackup]], params: AnalysisParamsModel, freqs: np.ndarray[int] | None = None) -> tuple[np.ndarray[int], list[StageResultsModel]]:
+    """Perform a cascade analysis of several RF stackups on one shared frequency grid, returning the grid and the results of each stackup
+
+    Stackups are padded to a common length with lossless, noiseless stages and cascaded
+    together as a (paths x stages x freqs) array, in chunks of at most `BATCH_BYTES` per matrix.
+    `freqs` replaces the grid from `params` so parts of a larger batch can share its grid.
+    """
+    if freqs is None:
+        freqs = analysis_freqs(params, stackups)
+    grid = grid_signature(freqs)
+    num_stages = max((len(stackup) for stackup in stackups), default=0)
+    chunk = max(1, BATCH_BYTES // max(1, num_stages*len(freqs)*8))
+
+    results = []
+    for start in range(0, len(stackups), chunk):
+        batch = stackups[start:start+chunk]
+        stages = {param: batch_matrix(batch, param, freqs, grid) for param in DEFAULT_VALUES}
+        casc = cascade(stages, params)
+
+        for i, stackup in enumerate(batch):
+            n = len(stackup)
+            results.append(StageResultsModel(
+                **{field: casc[field][i, :n].tolist() for field in RESULT_FIELDS},
+                snr_violations=frequency_ranges(casc["snr"][i, :n] < params.min_snr, freqs),
+                out_of_band=frequency_ranges(~stage_valid_mask(stackup, freqs), freqs),
+            ))
+    return freqs, results
+
+def analyze_arrays(stackup: list[Stackup], params: AnalysisParamsModel) -> tuple[np.ndarray[int], dict[str, np.ndarray[float]]]:
+    """Perform a cascade analysis of an RF stackup, returning the 1-D frequency grid and a (stages x freqs) array per result field"""
+    freqs = analysis_freqs(params, [stackup])
+    grid = grid_signature(freqs)
+    stages = {param: stage_matrix(stackup, param, freqs, grid=grid) for param in DEFAULT_VALUES}
+    return freqs, cascade(stages, params)
+
+def analyze_stream(stackup: list[Stackup], params: AnalysisParamsModel, chunk_points: int = STREAM_CHUNK_POINTS) -> Iterator[bytes]:
+    """Perform a cascade analysis of an RF stackup as NDJSON, one CascadeChunkModel line per `chunk_points` frequencies
+
+    Each slice of the grid is interpolated, cascaded and serialized only when the consumer asks
+    for the next line so memory stays bounded by the slice. Slices are not put in the curve cache
+    as their grids are never reused. The last line is a CascadeSummaryModel.
+    """
+    freqs = analysis_freqs(params, [stackup])
+    violations = np.empty((len(stackup), len(freqs)), dtype=bool)
+    valid = np.empty((len(stackup), len(freqs)), dtype=bool)
+    for start in range(0, len(freqs), chunk_points):
+        chunk_freqs = freqs[start:start+chunk_points]
+        stages = {param: stage_matrix(stackup, param, chunk_freqs, cache=False) for param in DEFAULT_VALUES}
+        casc = cascade(stages, params)
+        violations[:, start:start+len(chunk_freqs)] = casc["snr"] < params.min_snr
+        valid[:, start:start+len(chunk_freqs)] = stage_valid_mask(stackup, chunk_freqs)
+        chunk = CascadeChunkModel.model_construct(start=start, freq=chunk_freqs.tolist(), **{field: casc[field].tolist() for field in RESULT_FIELDS})
+        yield chunk.model_dump_json(exclude={"snr_violations", "out_of_band"}).encode() + b"\n"
+
+    summary = CascadeSummaryModel(
+        num_points=len(freqs),
+        num_stages=len(stackup),
+        snr_violations=frequency_ranges(violations, freqs),
+        out_of_band=frequency_ranges(~valid, freqs),
+    )
+    yield summary.model_dump_json().encode() + b"\n"
+
+def cascade(stages: dict[str, np.ndarray[float]], params: AnalysisParamsModel) -> dict[str, np.ndarray[float]]:
+    """Cascade per-stage parameters (keyed as `DEFAULT_VALUES`) into cumulative values at each stage output
+
+    Works on any array with stages along axis -2 and frequency along axis -1 so several
+    stackups (or trials) can be cascaded at once.
+    """
+    gain = stages["gain"]
+    casc_gain = cascade_gain(gain)
+    pre_gain = casc_gain - gain
+    stage_pwr_in = params.pwr_in + pre_gain
+
+    # Input-referred stage nonlinearity. OP1dB = IP1dB + G - 1 as the gain is compressed by 1 dB.
+    stage_ip1db = stages["p1db"] - gain + 1
+    ip1db = cascade_intercept(stage_ip1db, pre_gain)
+    iip3 = cascade_intercept(stages["ip3"] - gain, pre_gain)
+    iip2 = cascade_intercept(stages["ip2"] - gain, pre_gain, order=2)
+
+    # Noise in the resolution bandwidth referred to the input (MDS) and to each stage output
+    nf = cascade_nf(stages["nf"], pre_gain)
+    mds = thermal_noise(params.temp, params.rbw) + nf
+    noise_floor = mds + casc_gain
+    signal = params.pwr_in + casc_gain
+
+    return {
+        "gain": casc_gain,
+        "nf": nf,
+        "p1db": ip1db + casc_gain - 1,
+        "ip1db": ip1db,
+        "oip3": iip3 + casc_gain,
+        "iip3": iip3,
+        "oip2": iip2 + casc_gain,
+        "iip2": iip2,
+        "p1db_margin": stage_ip1db - stage_pwr_in,
+        "max_input_margin": stages["max_input"] - stage_pwr_in,
+        "noise_floor": noise_floor,
+        "signal": signal,
+        "snr": signal - noise_floor,
+        "mds": mds,
+        "sfdr": 2/3*(iip3 - mds),
+    }
+
+def thermal_noise(temp: float, bandwidth: float) -> float:
+    """Thermal noise power kTB (dBm) at `temp` (K) in `bandwidth` (Hz)"""
+    return 10*np.log10(BOLTZMANN*temp*bandwidth) + 30
+
+def frequency_ranges(mask: np.ndarray[bool], freqs: np.ndarray[int]) -> list[FrequencyRangeModel]:
+    """Contiguous frequency ranges where a (stages x freqs) `mask` is set, per stage"""
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0, axis=-1)
+    starts = np.argwhere(edges == 1)
+    stops = np.argwhere(edges == -1)
+    return [
+        FrequencyRangeModel(stage=int(stage), start_freq=int(freqs[start]), stop_freq=int(freqs[stop-1]))
+        for (stage, start), (_, stop) in zip(starts, stops)
+    ]
+
+def analysis_freqs(params: AnalysisParamsModel, stackups: list[list[Stackup]] | None = None) -> np.ndarray[int]:
+    """Frequency grid (Hz) shared by every stage of the analysis
+
+    Uniform at `points_per_mhz`, or with `grid="adaptive"` following the features of `stackups`.
+    """
+    if params.grid == "adaptive":
+        return adaptive_freqs(stackups or [], params)
+    num_points = int(round((params.stop_freq-params.start_freq)*params.points_per_mhz/1e6))+1
+    return np.linspace(params.start_freq,params.stop_freq,num_points,dtype=np.int64)
+
+def adaptive_freqs(stackups: list[list[Stackup]], params: AnalysisParamsModel) -> np.ndarray[int]:
+    """Non-uniform frequency grid (Hz) dense only where the cascade of `stackups` changes shape
+
+    Starts from the union of the components' native measurement frequencies, where every
+    stage curve is piecewise linear. Gaps are then split at their midpoint while the cascade
+    at the midpoint is more than `grid_tolerance` dB off the line through the gap's ends, and
+    interior points within `grid_tolerance` of the line through their neighbours are dropped.
+    No gap is split finer than the uniform `points_per_mhz` step and the flattest points are
+    dropped until at most `max_points` remain.
+    """
+    min_step = max(1, int(1e6 // params.points_per_mhz))
+    natives = [np.array([params.start_freq, params.stop_freq])]
+    for stackup in stackups:
+        for stage in stackup:
+            data = stage.component_version.component_data
+            for param in DEFAULT_VALUES:
+                curve = parsed_curve(stage.component_version_id, data, param) if data is not None else None
+                if curve is not None:
+                    natives.append(curve[0])
+    freqs = np.unique(np.clip(np.concatenate(natives), params.start_freq, params.stop_freq).astype(np.int64))
+
+    # Refine: split gaps the cascade bends across
+    for _ in range(ADAPTIVE_MAX_PASSES):
+        gaps = np.flatnonzero(np.diff(freqs) >= 2*min_step)
+        if not len(gaps) or len(freqs) >= params.max_points:
+            break
+        mids = (freqs[gaps] + freqs[gaps+1]) // 2
+        merged = np.union1d(freqs, mids)
+        bend = _bend(merged, _grid_values(stackups, params, merged))
+        is_mid = np.isin(merged[1:-1], mids)
+        keep = merged[1:-1][is_mid & (bend > params.grid_tolerance)]
+        if not len(keep):
+            break
+        freqs = np.union1d(freqs, keep)
+
+    # Decimate: drop points on a line with their neighbours, alternating odd and even points so
+    # no two neighbours go in one pass, then the flattest points until within max_points
+    idle = 0
+    for i in range(ADAPTIVE_MAX_PASSES):
+        if len(freqs) <= 2 or idle == 2:
+            break
+        bend = _bend(freqs, _grid_values(stackups, params, freqs))
+        eligible = np.flatnonzero(np.arange(len(bend)) % 2 == i % 2)
+        drop = eligible[bend[eligible] <= params.grid_tolerance]
+        idle = 0 if len(drop) else idle + 1
+        freqs = np.delete(freqs, drop + 1)
+    for i in range(ADAPTIVE_MAX_PASSES):
+        if len(freqs) <= params.max_points:
+            break
+        bend = _bend(freqs, _grid_values(stackups, params, freqs))
+        eligible = np.flatnonzero(np.arange(len(bend)) % 2 == i % 2)
+        drop = eligible[np.argsort(bend[eligible], kind="stable")[:len(freqs) - params.max_points]]
+        freqs = np.delete(freqs, drop + 1)
+    return freqs
+
+def _grid_values(stackups: list[list[Stackup]], params: AnalysisParamsModel, freqs: np.ndarray[int]) -> np.ndarray[float]:
+    """Cascaded `ADAPTIVE_FIELDS` of every stage of `stackups` at `freqs`, stacked as rows, unbounded values as 0
+
+    Curves are interpolated directly rather than through `stage_matrix` so the candidate grids
+    do not fill the curve cache.
+    """
+    rows = []
+    for stackup in stackups:
+        stages = {}
+        for param, default in DEFAULT_VALUES.items():
+            stages[param] = np.full((len(stackup), len(freqs)), default)
+            for row, stage in zip(stages[param], stackup):
+                data = stage.component_version.component_data
+                curve = parsed_curve(stage.component_version_id, data, param) if data is not None else None
+                if curve is not None:
+                    row[:] = np.interp(freqs, *curve)
+        casc = cascade(stages, params)
+        rows.extend(casc[field] for field in ADAPTIVE_FIELDS)
+    values = np.concatenate(rows) if rows else np.zeros((0, len(freqs)))
+    values[~np.isfinite(values)] = 0
+    return values
+
+def _bend(freqs: np.ndarray[int], values: np.ndarray[float]) -> np.ndarray[float]:
+    """Largest distance (over the rows of `values`) of each interior point from the line through its neighbours"""
+    f = freqs.astype(np.float64)
+    t = (f[1:-1] - f[:-2])/(f[2:] - f[:-2])
+    line = values[:, :-2] + (values[:, 2:] - values[:, :-2])*t
+    return np.abs(values[:, 1:-1] - line).max(axis=0, initial=0)
+
+def stage_matrix(stackup: list[Stackup], param: str, freqs: np.ndarray[int], out: np.ndarray[float] | None = None, grid: str | None = None, cache: bool = True) -> np.ndarray[float]:
+    """Interpolate `param` for every stage onto `freqs` as a (stages x freqs) float64 matrix
+
+    Resampled curves are cached per component version and `grid` (the signature of `freqs`)
+    unless `cache` is False.
+    """
+    if out is None:
+        out = np.empty((len(stackup), len(freqs)), dtype=np.float64)
+    if not cache:
+        grid = None
+    elif grid is None:
+        grid = grid_signature(freqs)
+    out[...] = DEFAULT_VALUES[param]
+    for row, stage in zip(out, stackup):
+        mag = resampled_curve(stage.component_version_id, lambda: stage.component_version.component_data, param, freqs, grid)
+        if mag is not None:
+            row[:] = mag
+    return out
+
+def stage_valid_mask(stackup: list[Stackup], freqs: np.ndarray[int]) -> np.ndarray[bool]:
+    """(stages x freqs) mask of where each stage is characterized
+
+    A stage is valid inside its component's start_freq/stop_freq and inside the span of every
+    curve it has data for. Outside that span `np.interp` holds the end values.
+    """
+    mask = np.ones((len(stackup), len(freqs)), dtype=bool)
+    for row, stage in zip(mask, stackup):
+        version = stage.component_version
+        component = version.component
+        if component is not None and component.start_freq is not None:
+            row &= freqs >= component.start_freq
+        if component is not None and component.stop_freq is not None:
+            row &= freqs <= component.stop_freq
+        if version.component_data is None:
+            continue
+        for param in DEFAULT_VALUES:
+            curve = parsed_curve(stage.component_version_id, version.component_data, param)
+            if curve is not None:
+                row &= (freqs >= curve[0][0]) & (freqs <= curve[0][-1])
+    return mask
+
+def batch_matrix(stackups: list[list[Stackup]], param: str, freqs: np.ndarray[int], grid: str | None = None) -> np.ndarray[float]:
+    """Interpolate `param` for several stackups into a (paths x stages x freqs) matrix padded with default values"""
+    if grid is None:
+        grid = grid_signature(freqs)
+    num_stages = max((len(stackup) for stackup in stackups), default=0)
+    out = np.full((len(stackups), num_stages, len(freqs)), DEFAULT_VALUES[param], dtype=np.float64)
+    for mat, stackup in zip(out, stackups):
+        stage_matrix(stackup, param, freqs, out=mat[:len(stackup)], grid=grid)
+    return out
+
+def cascade_gain(gain: np.ndarray[float]) -> np.ndarray[float]:
+    """Cumulative gain (dB) at the output of each stage. Stages are along axis -2."""
+    return np.cumsum(gain, axis=-2)
+
+def cascade_nf(nf: np.ndarray[float], pre_gain: np.ndarray[float]) -> np.ndarray[float]:
+    """Cumulative noise figure (dB) at the output of each stage using the Friis formula
+
+    `pre_gain` is the cascaded gain (dB) ahead of each stage, i.e. `cascade_gain(gain) - gain`.
+    Stages are along axis -2.
+    """
+    # F_n = 1 + sum((F_k - 1) / G_(k-1)) over stages k <= n
+    lin = db_to_lin(nf)
+    lin -= 1
+    lin /= db_to_lin(pre_gain)
+    np.cumsum(lin, axis=-2, out=lin)
+    lin += 1
+    return lin_to_db(lin)
+
+def cascade_intercept(ip: np.ndarray[float], pre_gain: np.ndarray[float], order: int = 3) -> np.ndarray[float]:
+    """Cumulative input-referred intercept (or compression) point (dBm) at the output of each stage
+
+    `ip` is the input-referred value of each stage. Third-order products (and P1dB) add as
+    1/IIP = sum(G_(k-1) / IIP_k); second-order products add coherently in voltage, i.e.
+    1/sqrt(IIP2) = sum(sqrt(G_(k-1) / IIP2_k)). Stages are along axis -2.
+    """
+    exponent = 1 if order == 3 else 0.5
+    lin = db_to_lin(exponent*(pre_gain - ip))
+    np.cumsum(lin, axis=-2, out=lin)
+    with np.errstate(divide="ignore"):
+        return -lin_to_db(lin)/exponent
+
+def db_to_lin(val: np.ndarray[float]) -> np.ndarray[float]:
+    return np.power(10.0, np.divide(val, 10))
+
+def lin_to_db(val: np.ndarray[float]) -> np.ndarray[float]:
+    return 10*np.log10(val)
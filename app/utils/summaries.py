@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.database.models.components import ComponentData
+
+# Curves summarized for search
+SUMMARY_PARAMS = ("gain", "nf", "p1db", "ip3")
+
+def summarize_component_data(component_data: ComponentData) -> dict[str, float | int | None]:
+    """Min, max and mean of each of `SUMMARY_PARAMS` as `ComponentVersionSummary` columns
+
+    Statistics are taken over the band all present curves cover, with the curves linearly
+    interpolated at the band edges and the mean weighted by frequency. When the curves do
+    not overlap each one is summarized over its own span and the band is None.
+    """
+    curves = {param: component_data.curve(param) for param in SUMMARY_PARAMS}
+    curves = {param: curve for param, curve in curves.items() if curve is not None and len(curve[0])}
+    band_start = max((int(freq[0]) for freq, _ in curves.values()), default=None)
+    band_stop = min((int(freq[-1]) for freq, _ in curves.values()), default=None)
+    if band_start is not None and band_start > band_stop:
+        band_start = band_stop = None
+
+    summary = {"band_start": band_start, "band_stop": band_stop}
+    for param in SUMMARY_PARAMS:
+        stats = (None, None, None)
+        if param in curves:
+            freq, mag = curves[param]
+            start, stop = (band_start, band_stop) if band_start is not None else (freq[0], freq[-1])
+            stats = band_stats(freq, mag, start, stop)
+        summary.update(zip((f"{param}_min", f"{param}_max", f"{param}_mean"), stats))
+    return summary
+
+def band_stats(freq: np.ndarray[int], mag: np.ndarray[float], start: int, stop: int) -> tuple[float, float, float]:
+    """(min, max, mean) of a curve over [`start`, `stop`]"""
+    inside = (freq > start) & (freq < stop)
+    f = np.concatenate(([start], freq[inside], [stop])).astype(float)
+    m = np.interp(f, freq, mag)
+    if stop > start:
+        mean = np.sum((m[1:] + m[:-1])*np.diff(f))/(2*(stop - start))
+    else:
+        mean = m[0]
+    return float(m.min()), float(m.max()), float(mean)
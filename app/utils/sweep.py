@@ -0,0 +1,219 @@
+import numpy as np
+from pydantic import BaseModel as PydanticBase, Field, model_validator
+
+from app.database.models.stackups import Stackup
+from app.utils.cache import grid_signature
+from app.utils.rfcascade import AnalysisParamsModel, analysis_freqs, stage_matrix, thermal_noise, db_to_lin, lin_to_db
+
+class GainStateModel(PydanticBase):
+    """One setting of a variable component as offsets (dB) from its nominal data"""
+    gain: float = 0
+    nf: float = 0
+    p1db: float = 0
+
+class VariableStageModel(PydanticBase):
+    """States of the variable component at position `stage` of the stackup
+
+    Either list `states` explicitly or give `num_states` and `step` for a step attenuator
+    with gain offsets 0, -step, ..., -(num_states-1)*step.
+    """
+    stage: int = Field(ge=0)
+    states: list[GainStateModel] | None = Field(default=None, min_length=1)
+    num_states: int | None = Field(default=None, gt=0, le=1024)
+    step: float | None = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def validate_states(self):
+        if self.states is None and (self.num_states is None or self.step is None):
+            raise ValueError("Either states or num_states and step are required.")
+        if self.states is None:
+            self.states = [GainStateModel(gain=-i*self.step) for i in range(self.num_states)]
+        return self
+
+class SweepTargetsModel(PydanticBase):
+    """Worst-case (over the band) requirements on the cascaded output. SNR uses `min_snr` from the analysis params."""
+    max_nf: float | None = None
+    min_p1db: float | None = None # Output P1dB (dBm)
+    min_gain: float | None = None
+    max_gain: float | None = None
+
+class SweepInputModel(PydanticBase):
+    params: AnalysisParamsModel
+    stages: list[VariableStageModel] = Field(min_length=1)
+    targets: SweepTargetsModel = SweepTargetsModel()
+    memory_budget: int = Field(default=256*1024**2, gt=0) # Bytes
+
+    @model_validator(mode="after")
+    def validate_stages(self):
+        positions = [stage.stage for stage in self.stages]
+        if len(set(positions)) != len(positions):
+            raise ValueError("Each variable stage may only be listed once.")
+        return self
+
+class SweepSettingModel(PydanticBase):
+    states: list[int] # Index into the states of each variable stage, in request order
+    gain: float # Worst-case (dB)
+    nf: float # Worst-case (dB)
+    p1db: float # Worst-case output P1dB (dBm)
+    snr: float # Worst-case (dB)
+    meets_targets: bool
+
+class SweepResultsModel(PydanticBase):
+    combinations: int # Size of the full state space
+    evaluated: int # Partial combinations actually cascaded
+    feasible: int # Pareto settings meeting every target
+    pareto: list[SweepSettingModel] # Non-dominated settings for each achievable gain
+
+# Gain offsets (dB) closer than this are treated as the same gain setting
+GAIN_RESOLUTION = 1e-6
+
+# Number of (combinations x freqs) float64 arrays per row of the frontier, alive at once while
+# expanding a chunk of it and while merging the pruned chunks
+_FRONTIER_ARRAYS = 3
+_CHUNK_ARRAYS = 10
+_MERGE_ARRAYS = 10
+
+def sweep(stackup: list[Stackup], params: AnalysisParamsModel, body: SweepInputModel) -> SweepResultsModel:
+    """Search the state space of the variable components of a stackup for the best settings
+
+    Stages are cascaded in order while keeping a frontier of partial combinations as
+    (combinations x freqs) arrays: cascaded gain, noise factor sum and inverse input P1dB.
+    Two partial combinations with the same total gain offset see identical downstream stages,
+    so one that is no worse at every frequency dominates the other and the dominated one is
+    pruned after each variable stage, as is any whose NF already exceeds `max_nf`. The result
+    is the Pareto set on worst-case NF and P1dB for each achievable gain. Variable stages are
+    expanded in chunks of the frontier so the arrays stay within `body.memory_budget`.
+    """
+    for var in body.stages:
+        if var.stage >= len(stackup):
+            raise ValueError(f"Stage {var.stage} is not in the stackup.")
+        if not stackup[var.stage].component_version.component.is_variable:
+            raise ValueError(f"Stage {var.stage} is not a variable component.")
+
+    freqs = analysis_freqs(params, [stackup])
+    grid = grid_signature(freqs)
+    gain, nf, p1db = (stage_matrix(stackup, param, freqs, grid=grid) for param in ("gain", "nf", "p1db"))
+    variable = {var.stage: (j, np.array([(s.gain, s.nf, s.p1db) for s in var.states])) for j, var in enumerate(body.stages)}
+    max_f = db_to_lin(body.targets.max_nf) - 1 if body.targets.max_nf is not None else np.inf
+
+    # Frontier of partial combinations: cascaded gain, F - 1, 1 / IP1dB (1/mW), gain offset and state choices
+    frontier = (np.zeros((1, len(freqs))), np.zeros((1, len(freqs))), np.zeros((1, len(freqs))), np.zeros(1), np.zeros((1, len(body.stages)), dtype=np.int64))
+    evaluated = 0
+
+    for i in range(len(stackup)):
+        if i in variable:
+            j, deltas = variable[i]
+            evaluated += len(frontier[3])*len(deltas)
+            frontier = _expand(frontier, (gain[i], nf[i], p1db[i]), j, deltas, max_f, body.memory_budget)
+        else:
+            frontier = _cascade(frontier, gain[i], nf[i], p1db[i])
+    casc_gain, f_sum, p_sum, offset, choice = frontier
+
+    with np.errstate(divide="ignore"):
+        out_nf = lin_to_db(1 + f_sum).max(axis=1)
+        out_p1db = (-lin_to_db(p_sum) + casc_gain - 1).min(axis=1)
+    out_gain = casc_gain.min(axis=1)
+    out_snr = params.pwr_in - thermal_noise(params.temp, params.rbw) - out_nf
+
+    # Final Pareto set within each gain setting on the scalar worst-case metrics
+    keep = _prune(offset, np.column_stack((out_nf, -out_p1db)))
+    targets = body.targets
+    meets = out_snr >= params.min_snr
+    if targets.max_nf is not None:
+        meets &= out_nf <= targets.max_nf
+    if targets.min_p1db is not None:
+        meets &= out_p1db >= targets.min_p1db
+    if targets.min_gain is not None:
+        meets &= out_gain >= targets.min_gain
+    if targets.max_gain is not None:
+        meets &= casc_gain.max(axis=1) <= targets.max_gain
+
+    keep = keep[np.lexsort((out_nf[keep], -offset[keep]))]
+    return SweepResultsModel(
+        combinations=int(np.prod([len(var.states) for var in body.stages])),
+        evaluated=evaluated,
+        feasible=int(meets[keep].sum()),
+        pareto=[
+            SweepSettingModel(
+                states=choice[k].tolist(),
+                gain=out_gain[k],
+                nf=out_nf[k],
+                p1db=out_p1db[k],
+                snr=out_snr[k],
+                meets_targets=meets[k],
+            )
+            for k in keep
+        ],
+    )
+
+def _cascade(frontier: tuple, stage_gain: np.ndarray[float], stage_nf: np.ndarray[float], stage_p1db: np.ndarray[float]) -> tuple:
+    """The frontier with one more stage cascaded onto every partial combination"""
+    casc_gain, f_sum, p_sum, offset, choice = frontier
+    f_sum = f_sum + (db_to_lin(stage_nf) - 1)/db_to_lin(casc_gain)
+    p_sum = p_sum + db_to_lin(casc_gain - (stage_p1db - stage_gain + 1))
+    return casc_gain + stage_gain, f_sum, p_sum, offset, choice
+
+def _expand(frontier: tuple, stage: tuple, j: int, deltas: np.ndarray[float], max_f: float, memory_budget: int) -> tuple:
+    """The pruned frontier after cascading every state of variable stage `j`
+
+    Half of the budget left after the frontier holds the expansion of a chunk of it, the
+    other half the combinations surviving each chunk. Raises ValueError if the budget does
+    not fit the states of a single partial combination or the survivors.
+    """
+    num_states = len(deltas)
+    row_bytes = frontier[0].shape[1]*np.dtype(np.float64).itemsize
+    available = (memory_budget - _FRONTIER_ARRAYS*frontier[0].nbytes)//2
+    chunk = available//(_CHUNK_ARRAYS*num_states*row_bytes)
+    if chunk < 1:
+        raise ValueError("memory_budget is too small for this many states and frequency points.")
+
+    survivors = []
+    for start in range(0, len(frontier[3]), chunk):
+        survivors.append(_expand_chunk(tuple(arr[start:start+chunk] for arr in frontier), stage, j, deltas, max_f))
+        if _MERGE_ARRAYS*row_bytes*sum(len(part[3]) for part in survivors) > available:
+            # Pruning across chunks may still collapse settings with the same gain
+            survivors = [_prune_frontier(_concat(survivors), max_f)]
+            if _MERGE_ARRAYS*row_bytes*len(survivors[0][3]) > available:
+                raise ValueError("memory_budget is too small for the settings of this state space.")
+    return _prune_frontier(_concat(survivors), max_f)
+
+def _expand_chunk(frontier: tuple, stage: tuple, j: int, deltas: np.ndarray[float], max_f: float) -> tuple:
+    """Every state of variable stage `j` cascaded onto each partial combination of `frontier`, pruned"""
+    stage_gain, stage_nf, stage_p1db = stage
+    num, num_states = len(frontier[3]), len(deltas)
+    casc_gain, f_sum, p_sum, offset, choice = (np.repeat(arr, num_states, axis=0) for arr in frontier)
+    delta = np.tile(deltas, (num, 1))
+    choice[:, j] = np.tile(np.arange(num_states), num)
+    expanded = _cascade(
+        (casc_gain, f_sum, p_sum, offset + delta[:, 0], choice),
+        stage_gain + delta[:, 0, None],
+        np.maximum(stage_nf + delta[:, 1, None], 0),
+        stage_p1db + delta[:, 2, None],
+    )
+    return _prune_frontier(expanded, max_f)
+
+def _concat(parts: list[tuple]) -> tuple:
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+def _prune_frontier(frontier: tuple, max_f: float) -> tuple:
+    """The partial combinations of the frontier under `max_f` not dominated by another with the same gain"""
+    casc_gain, f_sum, p_sum, offset, choice = frontier
+    # NF only grows along the chain so a partial combination over max_nf can never recover
+    keep = np.flatnonzero(f_sum.max(axis=1) <= max_f)
+    keep = keep[_prune(offset[keep], np.hstack((f_sum[keep], p_sum[keep])))]
+    return tuple(arr[keep] for arr in frontier)
+
+def _prune(offset: np.ndarray[float], points: np.ndarray[float]) -> np.ndarray[int]:
+    """Indices of the rows of `points` not dominated (<= in every column) by another row with the same gain `offset`"""
+    groups = np.round(offset/GAIN_RESOLUTION)
+    keep = []
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        # A dominating row has a smaller sum so visiting in order of sum only needs checks against kept rows
+        kept = []
+        for k in members[np.argsort(points[members].sum(axis=1), kind="stable")]:
+            if kept and np.all(points[kept] <= points[k], axis=1).any():
+                continue
+            kept.append(k)
+        keep.extend(kept)
+    return np.sort(np.array(keep, dtype=np.int64))
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import re
+import shutil
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import IO, Iterator, Literal
+
+import numpy as np
+from pydantic import BaseModel as PydanticBase, Field, model_validator
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.database.models.components import Component, ComponentVersion, ComponentData, pack_curve
+from app.database.models.sources import SourceEnum
+from app.crud.crud_components import add_version_summary
+
+TOUCHSTONE_PATTERN = re.compile(r"\.s(\d+)p$", re.IGNORECASE)
+FREQ_UNITS = {"hz": 1, "khz": 1e3, "mhz": 1e6, "ghz": 1e9}
+READ_CHUNK_BYTES = 1024**2
+GAIN_FLOOR = 1e-15 # |S21| below this (-300 dB) is clipped so gain stays finite
+
+class TouchstoneError(ValueError):
+    """Raised for a file that is not valid Touchstone or that cannot be imported"""
+
+@dataclass
+class TouchstoneData:
+    freq: np.ndarray[int] # Hz
+    s: np.ndarray[complex] # (freqs x ports x ports), s[:, i, j] is S(i+1)(j+1)
+
+class TouchstoneImportParamsModel(PydanticBase):
+    """How Touchstone files are turned into component versions
+
+    Each file becomes a new version of the component with `component_id`, or else of the one
+    component whose `match` column equals the file name without its extension. Gain is
+    |S(output_port)(input_port)| in dB.
+    """
+    match: Literal["serial_no", "model"] = "serial_no"
+    component_id: int | None = None
+    input_port: int = Field(default=1, gt=0)
+    output_port: int = Field(default=2, gt=0)
+    data_source: SourceEnum = SourceEnum.MEASURED
+    change_note: str = "Imported from"
+    batch_size: int = Field(default=50, gt=0, le=1000) # Files per transaction
+
+    @model_validator(mode="after")
+    def validate_ports(self):
+        if self.input_port == self.output_port:
+            raise ValueError("input_port and output_port must differ.")
+        return self
+
+class TouchstoneImportModel(TouchstoneImportParamsModel):
+    source: str # Touchstone file, directory or zip of them on the server
+
+class TouchstoneFileResultModel(PydanticBase):
+    name: str
+    status: Literal["imported", "duplicate", "skipped", "failed"]
+    component_id: int | None = None
+    version: int | None = None
+    points: int | None = None
+    error: str | None = None
+
+def touchstone_ports(name: str) -> int | None:
+    """Number of ports from a .sNp file name, None for any other file"""
+    found = TOUCHSTONE_PATTERN.search(name)
+    return int(found.group(1)) if found and int(found.group(1)) > 0 else None
+
+def parse_touchstone(stream: IO[bytes], num_ports: int) -> TouchstoneData:
+    """Parse Touchstone 1.x or 2.0 S-parameters from a binary stream
+
+    The stream is read in chunks of lines. Each chunk's numbers are converted to one float
+    array in a single call, so large files never become per-value Python objects. Noise
+    parameters and keyword sections other than network data are skipped.
+    """
+    unit, param, fmt = FREQ_UNITS["ghz"], "s", "ma"
+    options_seen = network_done = False
+    two_port_order = "21_12" # Version 1 two-port files always list S21 before S12
+    chunks = []
+
+    for lines in iter(lambda: stream.readlines(READ_CHUNK_BYTES), []):
+        tokens = []
+        for line in lines:
+            line = line.decode("latin-1").split("!", 1)[0].strip()
+            if not line or network_done:
+                continue
+            if line.startswith("#"):
+                if not options_seen:
+                    unit, param, fmt = _options(line[1:].split(), unit, param, fmt)
+                    options_seen = True
+                continue
+            if line.startswith("["):
+                keyword, _, value = line[1:].partition("]")
+                keyword, value = keyword.strip().lower(), value.strip().lower()
+                if keyword == "number of ports":
+                    num_ports = int(value)
+                elif keyword == "two-port data order":
+                    two_port_order = value
+                elif keyword == "matrix format" and value != "full":
+                    raise TouchstoneError(f"Matrix format {value} is not supported.")
+                elif keyword in ("noise data", "end"):
+                    network_done = True
+                continue
+            values = line.split()
+            # Version 1 two-port noise parameters follow the network data as rows of 5 values
+            if num_ports == 2 and len(values) == 5 and (tokens or chunks):
+                network_done = True
+                continue
+            tokens.extend(values)
+        if tokens:
+            try:
+                chunks.append(np.array(tokens, dtype=np.float64))
+            except ValueError:
+                raise TouchstoneError("Network data contains a value that is not a number.")
+
+    if param != "s":
+        raise TouchstoneError(f"Only S-parameters are supported, not {param.upper()}.")
+    width = 1 + 2*num_ports**2
+    values = np.concatenate(chunks) if chunks else np.empty(0)
+    if not len(values) or len(values) % width:
+        raise TouchstoneError(f"Expected network data in rows of {width} values for {num_ports} ports.")
+    values = values.reshape(-1, width)
+
+    freq = np.rint(values[:, 0]*unit).astype(np.int64)
+    if np.any(np.diff(freq) <= 0):
+        raise TouchstoneError("Frequencies must be increasing.")
+    a, b = values[:, 1::2], values[:, 2::2]
+    if fmt == "ri":
+        s = a + 1j*b
+    else:
+        mag = a if fmt == "ma" else 10**(a/20)
+        s = mag*np.exp(1j*np.deg2rad(b))
+    s = s.reshape(-1, num_ports, num_ports)
+    if num_ports == 2 and two_port_order == "21_12":
+        s = s.transpose(0, 2, 1)
+    return TouchstoneData(freq=freq, s=s)
+
+def _options(options: list[str], unit: float, param: str, fmt: str) -> tuple[float, str, str]:
+    """Frequency multiplier, parameter and number format from the `#` option line"""
+    options = [option.lower() for option in options]
+    for i, option in enumerate(options):
+        if option in FREQ_UNITS:
+            unit = FREQ_UNITS[option]
+        elif option in ("s", "y", "z", "h", "g"):
+            param = option
+        elif option in ("ma", "db", "ri"):
+            fmt = option
+        elif option == "r" or (i > 0 and options[i - 1] == "r"):
+            continue # Reference impedance does not affect |S21|
+        else:
+            raise TouchstoneError(f"Unknown option {option!r}.")
+    return unit, param, fmt
+
+def gain_curve(data: TouchstoneData, input_port: int = 1, output_port: int = 2) -> tuple[np.ndarray[int], np.ndarray[float]]:
+    """(freq, gain dB) from the transmission coefficient S(output_port)(input_port)"""
+    num_ports = data.s.shape[1]
+    if max(input_port, output_port) > num_ports:
+        raise TouchstoneError(f"Port {max(input_port, output_port)} is not in a {num_ports}-port file.")
+    s21 = data.s[:, output_port - 1, input_port - 1]
+    return data.freq, 20*np.log10(np.maximum(np.abs(s21), GAIN_FLOOR))
+
+def touchstone_sources(source: str) -> list[str]:
+    """Names of the Touchstone files in `source`, a single file, a directory tree or a zip"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    elif os.path.isdir(source):
+        names = [
+            os.path.relpath(os.path.join(root, name), source)
+            for root, _, files in os.walk(source) for name in files
+        ]
+    elif os.path.isfile(source):
+        names = [os.path.basename(source)]
+    else:
+        raise LookupError(f"No Touchstone files found at {source}")
+    return sorted(name for name in names if touchstone_ports(name))
+
+@contextmanager
+def open_source(source: str, name: str) -> Iterator[IO[bytes]]:
+    """Binary stream of file `name` listed by `touchstone_sources(source)`"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive, archive.open(name) as stream:
+            yield stream
+    else:
+        directory = source if os.path.isdir(source) else os.path.dirname(source)
+        with open(os.path.join(directory, name), "rb") as stream:
+            yield stream
+
+def import_touchstone(db: Session, source: str, names: list[str], params: TouchstoneImportParamsModel) -> list[TouchstoneFileResultModel]:
+    """Add a component version for each of the Touchstone files `names` in `source` in one transaction
+
+    A file whose gain curve is already a version of its component (identified by a digest in
+    the change note) is reported as a duplicate, so an interrupted import can be rerun.
+    """
+    results = []
+    for name in names:
+        try:
+            with open_source(source, name) as stream:
+                freq, gain = gain_curve(parse_touchstone(stream, touchstone_ports(name)), params.input_port, params.output_port)
+        except (TouchstoneError, OSError, KeyError) as e:
+            results.append(TouchstoneFileResultModel(name=name, status="failed", error=str(e)))
+            continue
+
+        component, error = _find_component(db, name, params)
+        if component is None:
+            results.append(TouchstoneFileResultModel(name=name, status="skipped", error=error))
+            continue
+
+        tag = f"[sha256:{hashlib.sha256(pack_curve(freq, gain)).hexdigest()[:16]}]"
+        existing = next((cv for cv in component.component_versions if cv.change_note.endswith(tag)), None)
+        if existing is not None:
+            results.append(TouchstoneFileResultModel(name=name, status="duplicate", component_id=component.id, version=existing.version))
+            continue
+
+        latest_version = max(component.component_versions, key=lambda cv: cv.version, default=None)
+        component_data = ComponentData(data_source=params.data_source)
+        component_data.gain_packed = pack_curve(freq, gain)
+        component_version = ComponentVersion(
+            component_data=component_data,
+            version=latest_version.version + 1 if latest_version else 0,
+            change_note=f"{params.change_note} {os.path.basename(name)} {tag}",
+        )
+        component.component_versions.append(component_version)
+        add_version_summary(db, component, component_version)
+        results.append(TouchstoneFileResultModel(
+            name=name, status="imported", component_id=component.id, version=component_version.version, points=len(freq),
+        ))
+    db.commit()
+    return results
+
+def _find_component(db: Session, name: str, params: TouchstoneImportParamsModel) -> tuple[Component | None, str | None]:
+    if params.component_id is not None:
+        component = db.get(Component, params.component_id)
+        return component, None if component else f"No component found with component ID: {params.component_id}"
+    key = TOUCHSTONE_PATTERN.sub("", os.path.basename(name))
+    stmt = select(Component).where(getattr(Component, params.match) == key).limit(2)
+    components = db.execute(stmt).scalars().all()
+    if len(components) != 1:
+        return None, f"{'More than one' if components else 'No'} component with {params.match} {key!r}"
+    return components[0], None
+
+def save_upload(stream: IO[bytes], filename: str) -> str:
+    """Copy an uploaded Touchstone file or zip to a new directory under `IMPORT_DIR`, returns the source to import"""
+    filename = os.path.basename(filename or "")
+    if not (touchstone_ports(filename) or filename.lower().endswith(".zip")):
+        raise TouchstoneError("Upload a .sNp Touchstone file or a .zip of them.")
+    directory = os.path.join(config.IMPORT_DIR, os.urandom(8).hex())
+    os.makedirs(directory)
+    path = os.path.join(directory, filename)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out, READ_CHUNK_BYTES)
+    return path
+
+def remove_upload(source: str) -> None:
+    """Delete an upload saved by `save_upload`, leaving any other source alone"""
+    directory = os.path.dirname(os.path.abspath(source))
+    if os.path.dirname(directory) == os.path.abspath(config.IMPORT_DIR):
+        shutil.rmtree(directory, ignore_errors=True)
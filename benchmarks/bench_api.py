@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+
+from app.database import SQLAlchemyBase, engine
+from app.register import register_app
+from app.scripts.mock_data import seed
+from app.utils.cache import curve_cache, result_cache
+
+PARAMS = {"start_freq": 1_000_000_000, "stop_freq": 11_000_000_000, "points_per_mhz": 1, "temp": 290, "pwr_in": -60, "min_snr": 10}
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Client over a seeded database, the tables are created here and dropped afterwards so the database must start empty"""
+    if inspect(engine).get_table_names():
+        pytest.fail(f"BENCH_DATABASE_URL {engine.url!r} already has tables, point it at an empty scratch database")
+    SQLAlchemyBase.metadata.create_all(engine)
+    try:
+        with engine.begin() as conn:
+            # 1k components, ~5k versions and 100 paths of 4-30 stages
+            path_ids = seed(conn, scale=0.01, points=501)
+        with TestClient(register_app()) as client:
+            client.path_ids = path_ids
+            yield client
+    finally:
+        SQLAlchemyBase.metadata.drop_all(engine)
+
+
+def clear_caches():
+    result_cache.clear()
+    curve_cache.clear()
+
+
+@pytest.mark.benchmark(group="api-analyze")
+@pytest.mark.parametrize("cache", ["none", "curves", "results"])
+def bench_analyze_path(benchmark, client, cache):
+    """POST /paths/{id}/analyze over 10k points, with nothing, the curves or the result cached"""
+    url = f"/api/paths/{client.path_ids[0]}/analyze"
+    assert client.post(url, json=PARAMS).status_code == 200
+    setup = {"none": clear_caches, "curves": result_cache.clear, "results": None}[cache]
+    benchmark.pedantic(client.post, args=(url,), kwargs={"json": PARAMS}, setup=setup, rounds=20)
+
+
+@pytest.mark.benchmark(group="api-analyze")
+def bench_analyze_paths(benchmark, client):
+    """POST /paths/analyze for every seeded path"""
+    body = {"path_ids": client.path_ids, "params": {**PARAMS, "stop_freq": 2_000_000_000}}
+    benchmark.pedantic(client.post, args=("/api/paths/analyze",), kwargs={"json": body}, setup=clear_caches, rounds=5)
+
+
+@pytest.mark.benchmark(group="api-stackup")
+@pytest.mark.parametrize("num_stages", [20, 200])
+def bench_put_stackup(benchmark, client, num_stages):
+    path_id = client.path_ids[-1]
+    bodies = [[{"component_version_id": (i*7 + offset) % 1000 + 1} for i in range(num_stages)] for offset in range(2)]
+    rounds = iter(range(1_000_000))
+
+    def put():
+        response = client.put(f"/api/paths/{path_id}/stackup", json=bodies[next(rounds) % 2])
+        assert response.status_code == 201
+
+    benchmark(put)
+
+
+@pytest.mark.benchmark(group="api-list")
+@pytest.mark.parametrize("url", [
+    "/api/projects?limit=100",
+    "/api/paths?limit=100",
+    "/api/components?limit=100",
+    "/api/components?limit=100&fields=id,model,manufacturer",
+    "/api/components?limit=100&manufacturer=Qorvo&is_active=true",
+    "/api/components?limit=100&order_by=modified_at",
+    "/api/components/search?limit=100&min_freq=2000000000&max_freq=6000000000&max_nf=5",
+])
+def bench_list(benchmark, client, url):
+    assert client.get(url).status_code == 200
+    benchmark(client.get, url)
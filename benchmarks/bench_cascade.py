@@ -0,0 +1,72 @@
+import pytest
+
+from app.utils.cache import curve_cache
+from app.utils.montecarlo import MonteCarloParamsModel, monte_carlo
+from app.utils.rfcascade import analyze, analyze_arrays, analyze_batch
+from synthetic import make_stackup, grid_params, check_size
+
+STAGES = [2, 20, 200]
+POINTS = [1_000, 10_000, 100_000, 1_000_000]
+
+
+@pytest.mark.benchmark(group="engine")
+@pytest.mark.parametrize("num_points", POINTS)
+@pytest.mark.parametrize("num_stages", STAGES)
+def bench_analyze_arrays(benchmark, num_stages, num_points):
+    """Resampling and cascading without building the response, curves resampled every round"""
+    check_size(num_stages, num_points)
+    stackup, params = make_stackup(num_stages), grid_params(num_points)
+    benchmark.extra_info.update(stages=num_stages, points=num_points)
+    benchmark(analyze_arrays, stackup, params)
+
+
+@pytest.mark.benchmark(group="engine-cached")
+@pytest.mark.parametrize("num_points", POINTS[:3])
+@pytest.mark.parametrize("num_stages", STAGES)
+def bench_analyze_arrays_cached(benchmark, num_stages, num_points):
+    """As bench_analyze_arrays with the resampled curves in the curve cache"""
+    check_size(num_stages, num_points)
+    stackup, params = make_stackup(num_stages, cached=True), grid_params(num_points)
+    curve_cache.clear()
+    analyze_arrays(stackup, params)
+    benchmark.extra_info.update(stages=num_stages, points=num_points)
+    benchmark(analyze_arrays, stackup, params)
+
+
+@pytest.mark.benchmark(group="analyze")
+@pytest.mark.parametrize("num_points", POINTS[:3])
+@pytest.mark.parametrize("num_stages", STAGES[:2])
+def bench_analyze(benchmark, num_stages, num_points):
+    """A full analysis serialized to JSON, as the analyze endpoint responds"""
+    check_size(num_stages, num_points)
+    stackup, params = make_stackup(num_stages), grid_params(num_points)
+    benchmark.extra_info.update(stages=num_stages, points=num_points)
+    benchmark(lambda: analyze(stackup, params).model_dump_json())
+
+
+@pytest.mark.benchmark(group="adaptive")
+@pytest.mark.parametrize("num_stages", STAGES[:2])
+def bench_analyze_adaptive(benchmark, num_stages):
+    stackup, params = make_stackup(num_stages), grid_params(100_000, grid="adaptive")
+    benchmark.extra_info.update(stages=num_stages)
+    benchmark(analyze_arrays, stackup, params)
+
+
+@pytest.mark.benchmark(group="batch")
+@pytest.mark.parametrize("num_paths, num_points", [(10, 1_000), (100, 1_000), (10, 10_000)])
+def bench_analyze_batch(benchmark, num_paths, num_points):
+    """Paths of 2-20 stages on one grid, the per-stage results are lists so 100 paths x 10k points would need several GB"""
+    stackups = [make_stackup(2 + seed % 19, seed=seed) for seed in range(num_paths)]
+    params = grid_params(num_points)
+    benchmark.extra_info.update(paths=num_paths, points=num_points)
+    benchmark(analyze_batch, stackups, params)
+
+
+@pytest.mark.benchmark(group="monte-carlo")
+@pytest.mark.parametrize("trials", [100, 1_000])
+@pytest.mark.parametrize("num_stages", [5, 20])
+def bench_monte_carlo(benchmark, num_stages, trials):
+    stackup, params = make_stackup(num_stages), grid_params(1_000)
+    mc = MonteCarloParamsModel(trials=trials, seed=1, tolerances=[{"gain": 0.5, "nf": 0.2}])
+    benchmark.extra_info.update(stages=num_stages, trials=trials)
+    benchmark(monte_carlo, stackup, params, mc)
@@ -0,0 +1,5 @@
+import os
+
+# Benchmarks never use the configured DATABASE_URL: they run on an in-memory SQLite database
+# unless BENCH_DATABASE_URL points at an empty database, e.g. a scratch Postgres to profile
+os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL", "sqlite://")
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.database.models.components import Component, ComponentVersion, ComponentData
+from app.database.models.stackups import Stackup
+from app.utils.rfcascade import AnalysisParamsModel
+
+# Largest (stages x frequency points) matrix a scenario may build, 200 stages x 1M points needs BENCH_MAX_CELLS=200000000
+MAX_CELLS = int(os.environ.get("BENCH_MAX_CELLS", 20_000_000))
+
+# Points in each synthetic component curve, like a measured sweep
+CURVE_POINTS = 2001
+CURVE_STOP = 40_000_000_000
+
+def synthetic_curves(rng: np.random.Generator, num_points: int = CURVE_POINTS) -> dict[str, dict[str, list]]:
+    """Gain, NF, P1dB and IP3 curves of a random amplifier/attenuator with slope and ripple"""
+    freq = np.linspace(0, CURVE_STOP, num_points).astype(np.int64)
+    x = freq/CURVE_STOP
+    ripple = np.sin(2*np.pi*rng.uniform(5, 50)*x + rng.uniform(0, 2*np.pi))
+    gain = rng.uniform(-10, 25) - rng.uniform(0, 5)*x + rng.uniform(0, 0.5)*ripple
+    nf = np.maximum(np.abs(np.minimum(gain, 0)), rng.uniform(1, 6) + rng.uniform(0, 2)*x)
+    p1db = rng.uniform(5, 25) - rng.uniform(0, 3)*x
+    curves = {"gain": gain, "nf": nf, "p1db": p1db, "ip3": p1db + 10}
+    return {param: {"freq": freq.tolist(), "mag": mag.tolist()} for param, mag in curves.items()}
+
+def make_stackup(num_stages: int, seed: int = 0, cached: bool = False) -> list[Stackup]:
+    """Synthetic stackup of `num_stages` stages, not in the database
+
+    Stages only get component version IDs (and so go through the curve cache) if `cached`.
+    """
+    rng = np.random.default_rng(seed)
+    stackup = []
+    for i in range(num_stages):
+        component = Component(id=i + 1, component_type_id=i % 4, is_variable=False)
+        version = ComponentVersion(id=seed*10_000 + i + 1 if cached else None, component=component, component_data=ComponentData(**synthetic_curves(rng)))
+        stackup.append(Stackup(component_version_id=version.id, component_version=version))
+    return stackup
+
+def grid_params(num_points: int, **kwargs) -> AnalysisParamsModel:
+    """Analysis params for a uniform grid of about `num_points` frequencies from 1 GHz"""
+    points_per_mhz = max(1, -(-num_points // 30_000))
+    span = round((num_points - 1)/points_per_mhz)*1_000_000
+    return AnalysisParamsModel(start_freq=1_000_000_000, stop_freq=1_000_000_000 + span, points_per_mhz=points_per_mhz, temp=290, pwr_in=-60, min_snr=10, **kwargs)
+
+def check_size(num_stages: int, num_points: int) -> None:
+    if num_stages*num_points > MAX_CELLS:
+        pytest.skip(f"{num_stages} stages x {num_points} points is over BENCH_MAX_CELLS={MAX_CELLS}")
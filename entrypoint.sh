@@ -4,5 +4,6 @@ alembic upgrade head
 
 # Probably init some data here???
 python /workspace/app/scripts/init_db.py
+python /workspace/app/scripts/summarize_components.py
 
 exec "$@"
\ No newline at end of file
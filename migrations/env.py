@@ -30,7 +30,7 @@ target_metadata = SQLAlchemyBase.metadata
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
-config.set_main_option('sqlalchemy.url', str(app_config.POSTGRES_URL))
+config.set_main_option('sqlalchemy.url', str(app_config.DB_URL))
 
 
 def run_migrations_offline() -> None:
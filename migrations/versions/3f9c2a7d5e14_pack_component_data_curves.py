@@ -0,0 +1,95 @@
+"""Pack component data curves
+
+Revision ID: 3f9c2a7d5e14
+Revises: 81d01b674aea
+Create Date: 2026-10-17 09:12:31.402117
+
+"""
+import struct
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d5e14'
+down_revision: Union[str, None] = '81d01b674aea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CURVE_COLUMNS = ("gain", "nf", "ip2", "ip3", "p1db", "max_input")
+CURVE_MAGIC = b"RFC1"
+CURVE_HEADER = struct.Struct("<4sI")
+BATCH_SIZE = 500
+
+
+def _pack(curve: dict | None) -> bytes | None:
+    if curve is None:
+        return None
+    freq = np.asarray(curve["freq"], dtype="<i8")
+    mag = np.asarray(curve["mag"], dtype="<f8")
+    return CURVE_HEADER.pack(CURVE_MAGIC, len(freq)) + freq.tobytes() + mag.tobytes()
+
+
+def _unpack(buf: bytes | None) -> dict | None:
+    if buf is None:
+        return None
+    _, num_points = CURVE_HEADER.unpack_from(buf)
+    freq = np.frombuffer(buf, dtype="<i8", count=num_points, offset=CURVE_HEADER.size)
+    mag = np.frombuffer(buf, dtype="<f8", count=num_points, offset=CURVE_HEADER.size + freq.nbytes)
+    return {"freq": freq.tolist(), "mag": mag.tolist()}
+
+
+def _convert(src_type, dst_type, src_suffix: str, dst_suffix: str, convert) -> None:
+    """Copy every curve column from `<col><src_suffix>` to `<col><dst_suffix>` in batches"""
+    table = sa.table(
+        'component_data',
+        sa.column('id', sa.Integer),
+        *[sa.column(f'{col}{src_suffix}', src_type) for col in CURVE_COLUMNS],
+        *[sa.column(f'{col}{dst_suffix}', dst_type) for col in CURVE_COLUMNS],
+    )
+    update_stmt = (
+        table.update()
+        .where(table.c.id == sa.bindparam('_id'))
+        .values({f'{col}{dst_suffix}': sa.bindparam(f'_{col}') for col in CURVE_COLUMNS})
+    )
+
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        select_stmt = (
+            sa.select(table.c.id, *[table.c[f'{col}{src_suffix}'] for col in CURVE_COLUMNS])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        )
+        rows = conn.execute(select_stmt).all()
+        if not rows:
+            break
+        params = [{'_id': row[0], **{f'_{col}': convert(value) for col, value in zip(CURVE_COLUMNS, row[1:])}} for row in rows]
+        conn.execute(update_stmt, params)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    for col in CURVE_COLUMNS:
+        op.add_column('component_data', sa.Column(f'{col}_packed', sa.LargeBinary(), nullable=True))
+
+    _convert(sa.JSON, sa.LargeBinary, '', '_packed', _pack)
+
+    for col in CURVE_COLUMNS:
+        op.drop_column('component_data', col)
+        op.alter_column('component_data', f'{col}_packed', new_column_name=col)
+
+
+def downgrade() -> None:
+    for col in CURVE_COLUMNS:
+        op.add_column('component_data', sa.Column(f'{col}_json', sa.JSON(), nullable=True))
+
+    _convert(sa.LargeBinary, sa.JSON(none_as_null=True), '', '_json', _unpack)
+
+    for col in CURVE_COLUMNS:
+        op.drop_column('component_data', col)
+        op.alter_column('component_data', f'{col}_json', new_column_name=col)
@@ -0,0 +1,26 @@
+"""Add component data revision
+
+Revision ID: a4c81e2f6b37
+Revises: f3a9d27c61e8
+Create Date: 2026-10-17 21:05:42.117305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c81e2f6b37'
+down_revision: Union[str, None] = 'f3a9d27c61e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('component_data', sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('component_data', 'revision')
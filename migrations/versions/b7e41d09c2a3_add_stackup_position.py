@@ -0,0 +1,43 @@
+"""Add stackup position
+
+Revision ID: b7e41d09c2a3
+Revises: 3f9c2a7d5e14
+Create Date: 2026-10-17 11:40:05.218934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e41d09c2a3'
+down_revision: Union[str, None] = '3f9c2a7d5e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('stackups', sa.Column('position', sa.Integer(), nullable=True))
+    op.create_index('ix_stackups_path_id_position', 'stackups', ['path_id', 'position'], unique=False)
+
+    # Backfill positions by walking each next_stackup_id chain from its head
+    op.execute("""
+        WITH RECURSIVE chain(id, next_stackup_id, depth) AS (
+            SELECT s.id, s.next_stackup_id, 0
+            FROM stackups s
+            WHERE NOT EXISTS (SELECT 1 FROM stackups p WHERE p.next_stackup_id = s.id)
+            UNION ALL
+            SELECT s.id, s.next_stackup_id, chain.depth + 1
+            FROM stackups s JOIN chain ON s.id = chain.next_stackup_id
+        )
+        UPDATE stackups SET position = chain.depth
+        FROM chain
+        WHERE stackups.id = chain.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stackups_path_id_position', table_name='stackups')
+    op.drop_column('stackups', 'position')
@@ -0,0 +1,44 @@
+"""Add analysis jobs
+
+Revision ID: c5d2e8f14a67
+Revises: b7e41d09c2a3
+Create Date: 2026-10-17 14:02:47.613390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8f14a67'
+down_revision: Union[str, None] = 'b7e41d09c2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('analysis_jobs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('path_id', sa.Integer(), nullable=True),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('request', sa.JSON(), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('result', sa.LargeBinary(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['path_id'], ['paths.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_analysis_jobs_status', 'analysis_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_jobs_status', table_name='analysis_jobs')
+    op.drop_table('analysis_jobs')
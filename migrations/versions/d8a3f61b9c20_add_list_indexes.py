@@ -0,0 +1,40 @@
+"""Add list indexes
+
+Revision ID: d8a3f61b9c20
+Revises: c5d2e8f14a67
+Create Date: 2026-10-17 16:30:12.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3f61b9c20'
+down_revision: Union[str, None] = 'c5d2e8f14a67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_components_component_type_id_id', 'components', ['component_type_id', 'id'], unique=False)
+    op.create_index('ix_components_manufacturer_id', 'components', ['manufacturer', 'id'], unique=False)
+    op.create_index('ix_components_is_active_id', 'components', ['is_active', 'id'], unique=False)
+    op.create_index('ix_components_modified_at_id', 'components', ['modified_at', 'id'], unique=False)
+    op.create_index('ix_components_start_freq_stop_freq', 'components', ['start_freq', 'stop_freq'], unique=False)
+    op.create_index('ix_paths_project_id_id', 'paths', ['project_id', 'id'], unique=False)
+    op.create_index('ix_paths_modified_at_id', 'paths', ['modified_at', 'id'], unique=False)
+    op.create_index('ix_projects_modified_at_id', 'projects', ['modified_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_projects_modified_at_id', table_name='projects')
+    op.drop_index('ix_paths_modified_at_id', table_name='paths')
+    op.drop_index('ix_paths_project_id_id', table_name='paths')
+    op.drop_index('ix_components_start_freq_stop_freq', table_name='components')
+    op.drop_index('ix_components_modified_at_id', table_name='components')
+    op.drop_index('ix_components_is_active_id', table_name='components')
+    op.drop_index('ix_components_manufacturer_id', table_name='components')
+    op.drop_index('ix_components_component_type_id_id', table_name='components')
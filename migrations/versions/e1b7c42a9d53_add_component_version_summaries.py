@@ -0,0 +1,61 @@
+"""Add component version summaries
+
+Revision ID: e1b7c42a9d53
+Revises: d8a3f61b9c20
+Create Date: 2026-10-17 17:05:41.873102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b7c42a9d53'
+down_revision: Union[str, None] = 'd8a3f61b9c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('component_version_summaries',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('component_version_id', sa.Integer(), nullable=False),
+    sa.Column('component_id', sa.Integer(), nullable=False),
+    sa.Column('is_latest', sa.Boolean(), nullable=False),
+    sa.Column('band_start', sa.BigInteger(), nullable=True),
+    sa.Column('band_stop', sa.BigInteger(), nullable=True),
+    sa.Column('gain_min', sa.Float(), nullable=True),
+    sa.Column('gain_max', sa.Float(), nullable=True),
+    sa.Column('gain_mean', sa.Float(), nullable=True),
+    sa.Column('nf_min', sa.Float(), nullable=True),
+    sa.Column('nf_max', sa.Float(), nullable=True),
+    sa.Column('nf_mean', sa.Float(), nullable=True),
+    sa.Column('p1db_min', sa.Float(), nullable=True),
+    sa.Column('p1db_max', sa.Float(), nullable=True),
+    sa.Column('p1db_mean', sa.Float(), nullable=True),
+    sa.Column('ip3_min', sa.Float(), nullable=True),
+    sa.Column('ip3_max', sa.Float(), nullable=True),
+    sa.Column('ip3_mean', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['component_id'], ['components.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['component_version_id'], ['component_versions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('component_version_id')
+    )
+    op.create_index('ix_component_version_summaries_component_id_is_latest', 'component_version_summaries', ['component_id', 'is_latest'], unique=False)
+    op.create_index('ix_component_version_summaries_band', 'component_version_summaries', ['is_latest', 'band_start', 'band_stop'], unique=False)
+    op.create_index('ix_component_version_summaries_gain_min', 'component_version_summaries', ['is_latest', 'gain_min'], unique=False)
+    op.create_index('ix_component_version_summaries_nf_max', 'component_version_summaries', ['is_latest', 'nf_max'], unique=False)
+    op.create_index('ix_component_version_summaries_p1db_min', 'component_version_summaries', ['is_latest', 'p1db_min'], unique=False)
+    op.create_index('ix_component_version_summaries_ip3_min', 'component_version_summaries', ['is_latest', 'ip3_min'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_component_version_summaries_ip3_min', table_name='component_version_summaries')
+    op.drop_index('ix_component_version_summaries_p1db_min', table_name='component_version_summaries')
+    op.drop_index('ix_component_version_summaries_nf_max', table_name='component_version_summaries')
+    op.drop_index('ix_component_version_summaries_gain_min', table_name='component_version_summaries')
+    op.drop_index('ix_component_version_summaries_band', table_name='component_version_summaries')
+    op.drop_index('ix_component_version_summaries_component_id_is_latest', table_name='component_version_summaries')
+    op.drop_table('component_version_summaries')
@@ -0,0 +1,28 @@
+"""Add analysis job heartbeats
+
+Revision ID: f3a9d27c61e8
+Revises: e1b7c42a9d53
+Create Date: 2026-10-17 18:20:11.402918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d27c61e8'
+down_revision: Union[str, None] = 'e1b7c42a9d53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('analysis_jobs', sa.Column('worker_id', sa.String(), nullable=True))
+    op.add_column('analysis_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('analysis_jobs', 'heartbeat_at')
+    op.drop_column('analysis_jobs', 'worker_id')
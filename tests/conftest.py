@@ -1,11 +1,54 @@
+import os
+
 import pytest
+
+# Tests run on an in-memory SQLite database of their own process unless DATABASE_URL is set
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from app.database import SQLAlchemyBase, engine, async_engine, get_db
 from app.register import register_app
 
 app = register_app()
 
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    SQLAlchemyBase.metadata.create_all(engine)
+    yield
+    engine.dispose()
+
+@pytest.fixture
+def db():
+    """Session in a transaction rolled back after the test, commits in the test only release savepoints"""
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        session = Session(bind=connection, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        yield session
+        session.close()
+        transaction.rollback()
+
 @pytest.fixture(scope="module")
 def test_app():
-    client = TestClient(app)
-    yield client
\ No newline at end of file
+    """Client whose requests share one transaction, rolled back after the module's tests"""
+    state = {}
+
+    async def get_test_db():
+        if not state:
+            state["connection"] = await async_engine.connect()
+            state["transaction"] = await state["connection"].begin()
+        async with AsyncSession(bind=state["connection"], expire_on_commit=False, join_transaction_mode="create_savepoint") as db:
+            yield db
+
+    async def rollback():
+        await state["transaction"].rollback()
+        await state["connection"].close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    with TestClient(app) as client:
+        yield client
+        if state:
+            client.portal.call(rollback)
+    app.dependency_overrides.pop(get_db)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.database.models.components import ComponentData
+from app.utils.cache import LRUCache, curve_cache, grid_signature, resampled_curve, invalidate_component_versions, analysis_key
+from app.utils.rfcascade import AnalysisParamsModel
+
+def test_lru_evicts_by_bytes():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    assert cache.get("a") == 1
+    cache.put("c", 3, 40)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["bytes"] == 80
+
+def test_resampled_curve_cache():
+    curve_cache.clear()
+    data = ComponentData(gain={"freq": [0, 10], "mag": [0, 10]})
+    freqs = np.arange(11)
+    grid = grid_signature(freqs)
+    loads = []
+    def get_data():
+        loads.append(1)
+        return data
+
+    first = resampled_curve(42, get_data, "gain", freqs, grid)
+    second = resampled_curve(42, get_data, "gain", freqs, grid)
+    np.testing.assert_allclose(first, freqs)
+    assert second is first
+    assert len(loads) == 1
+
+    invalidate_component_versions([42])
+    resampled_curve(42, get_data, "gain", freqs, grid)
+    assert len(loads) == 2
+
+def test_analysis_key():
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-30, min_snr=10)
+    stages = [(1, 1), (2, 1), (3, 1)]
+    assert analysis_key(stages, params) == analysis_key([[1, 1], [2, 1], [3, 1]], params.model_copy())
+    assert analysis_key(stages, params) != analysis_key(stages[::-1], params)
+    assert analysis_key(stages, params) != analysis_key(stages, params.model_copy(update={"pwr_in": -20}))
+    assert analysis_key(stages, params) != analysis_key([(1, 1), (2, 2), (3, 1)], params)
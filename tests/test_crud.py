@@ -2,13 +2,13 @@ import json
 from datetime import datetime
 
 def test_get_projects(test_app):
-    response = test_app.get("/api/v1/projects")
+    response = test_app.get("/api/projects")
     assert response.status_code == 200
     assert response.json() == []
 
 def test_create_project(test_app):
     payload = {"name": "CAVALL", "description": "test project"}
-    response = test_app.post("/api/v1/projects",content=json.dumps(payload))
+    response = test_app.post("/api/projects",json=payload)
     assert response.status_code == 201
     object = response.json()
     assert object['id']== 1
@@ -19,9 +19,8 @@ def test_create_project(test_app):
     assert created_at == modified_at
 
 def test_create_path(test_app):
-    payload = {"input": "J2", "output": "J8", "description": "A test path"}
-    project_id = 1
-    response = test_app.post(f"/api/v1/projects/{project_id}/paths", content=json.dumps(payload))
+    payload = {"project_id": 1, "input": "J2", "output": "J8", "description": "A test path"}
+    response = test_app.post("/api/paths", json=payload)
     assert response.status_code == 201
     object = response.json()
     assert object['id']== 1
@@ -36,23 +35,67 @@ def test_get_component_types(test_app):
     pass
 
 def test_create_component(test_app):
+    response = test_app.post("/api/components/types", json={"type": "Amplifier"})
+    assert response.status_code == 201
+    type_id = response.json()["id"]
+
     payload = {
         "model": "CA0618-2515",
         "manufacturer": "Ciao Wireless",
-        "type_id": 1,
-        "source": "simulated",
-        "start_freq": 0,
-        "stop_freq": 18e9,
-        "gain": None,
-        "nf": None,
-        "ip2": None,
-        "ip3": None,
-        "p1db": None,
-        "max_input": None,
+        "serial_no": "1001",
+        "component_type_id": type_id,
+        "start_freq": 6_000_000_000,
+        "stop_freq": 18_000_000_000,
         "is_active": True,
         "is_variable": False,
         "description": "25 dB gain amplifier"
     }
-    response = test_app.post("/api/v1/components", content=json.dumps(payload))
-    # assert response.status_code == 201
-    assert response.content == ""
\ No newline at end of file
+    response = test_app.post("/api/components", json=payload)
+    assert response.status_code == 201
+    object = response.json()
+    assert object["id"] == 1
+    assert {key: object[key] for key in payload} == payload
+    assert object["type"] == {"id": type_id, "type": "Amplifier"}
+    created_at = datetime.strptime(object["created_at"], '%Y-%m-%dT%H:%M:%S.%f')
+    modified_at = datetime.strptime(object["modified_at"], '%Y-%m-%dT%H:%M:%S.%f')
+    assert created_at == modified_at
+def test_inverted_ranges_are_rejected(test_app):
+    assert test_app.get("/api/components?min_freq=6000000000&max_freq=2000000000").status_code == 422
+    assert test_app.get("/api/components/search?min_freq=6000000000&max_freq=2000000000").status_code == 422
+    assert test_app.get("/api/components/search?min_gain=20&max_gain=10").status_code == 422
+    assert test_app.get("/api/components?min_freq=2000000000&max_freq=2000000000").status_code == 200
+
+def test_analyze_unacceptable_media_type(test_app):
+    params = {"start_freq": 1e9, "stop_freq": 2e9, "temp": 290, "pwr_in": -30, "min_snr": 10}
+    response = test_app.post("/api/paths/1/analyze", json=params, headers={"Accept": "text/html"})
+    assert response.status_code == 406
+
+def test_analysis_etag_follows_component_band(test_app):
+    curve = {"freq": [0, 40_000_000_000], "mag": [20, 20]}
+    response = test_app.post("/api/components/1/data", json={"component_data": {"data_source": "simulated", "gain": curve, "nf": curve}})
+    assert response.status_code == 200
+    response = test_app.put("/api/paths/1/stackup", json=[{"component_version_id": response.json()["id"]}])
+    assert response.status_code == 201
+
+    params = {"start_freq": 1e9, "stop_freq": 2e9, "temp": 290, "pwr_in": -30, "min_snr": 10}
+    response = test_app.post("/api/paths/1/analyze", json=params)
+    etag = response.headers["ETag"]
+    assert response.json()["out_of_band"] == [{"stage": 0, "start_freq": 1_000_000_000, "stop_freq": 2_000_000_000}]
+    assert test_app.post("/api/paths/1/analyze", json=params, headers={"If-None-Match": etag}).status_code == 304
+
+    assert test_app.put("/api/components/1", json={"start_freq": 0}).status_code == 200
+    response = test_app.post("/api/paths/1/analyze", json=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["out_of_band"] == []
+
+def test_batch_analysis_sends_freq_once(test_app):
+    params = {"start_freq": 1e9, "stop_freq": 2e9, "temp": 290, "pwr_in": -30, "min_snr": 10}
+    response = test_app.post("/api/paths/analyze", json={"path_ids": [1], "params": params})
+    assert response.status_code == 200
+    object = response.json()
+    assert len(object["freq"]) == 1001
+    assert [path["path_id"] for path in object["paths"]] == [1]
+    assert "freq" not in object["paths"][0]
+    # Output intercepts of a chain with no IP3 data are unbounded
+    assert object["paths"][0]["oip3"][0][0] is None
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import event
+
+from app.database.models.components import Component, ComponentType, ComponentVersion, ComponentData
+from app.database.models.paths import Path
+from app.database.models.projects import Project
+from app.database.models.stackups import Stackup
+from app.crud.crud_paths import get_path_with_stackup, get_stackup_version_ids, get_stackup_revisions, get_component_path_ids, get_missing_component_version_ids, replace_path_stackup
+
+@pytest.fixture
+def path_id(db):
+    comp_type = ComponentType(type="amplifier")
+    component = Component(model="m", manufacturer="x", serial_no="s", type=comp_type)
+    versions = []
+    for i in range(10):
+        data = ComponentData(gain={"freq": [0, 1], "mag": [i, i]}, nf={"freq": [0, 1], "mag": [1, 1]})
+        versions.append(ComponentVersion(component=component, component_data=data, version=i, change_note=""))
+    path = Path(project=Project(name="p"), input="J1", output="J2")
+    path.stackups = [Stackup(component_version=version) for version in versions]
+    db.add(path)
+    db.commit()
+    db.expunge_all()
+    return path.id
+
+def count_statements(db):
+    """Statements the session runs, without the savepoints of the test transaction"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if "SAVEPOINT" not in statement:
+            statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    return statements
+
+def test_get_path_with_stackup_statement_count(db, path_id):
+    statements = count_statements(db)
+    path = get_path_with_stackup(db, path_id)
+    gains = [stackup.component_version.component_data.curve("gain")[1][0] for stackup in path.stackups]
+    assert gains == list(range(10))
+    assert len(statements) == 2
+
+def test_stackups_follow_next_stackup_chain(db, path_id):
+    # Reverse the chain so signal order no longer matches insertion order
+    stackups = sorted(get_path_with_stackup(db, path_id).stackups, key=lambda stackup: stackup.id)
+    for stackup in stackups:
+        stackup.next_stackup_id = None
+    db.flush()
+    for prev, stackup in zip(stackups[::-1], stackups[-2::-1]):
+        prev.next_stackup_id = stackup.id
+    db.commit()
+    db.expunge_all()
+
+    expected = [stackup.component_version_id for stackup in stackups[::-1]]
+    assert get_stackup_version_ids(db, path_id) == expected
+    path = get_path_with_stackup(db, path_id)
+    assert [stackup.component_version_id for stackup in path.stackups] == expected
+
+def test_broken_chain_falls_back_to_position(db, path_id):
+    stackups = get_path_with_stackup(db, path_id).stackups
+    for stackup in stackups:
+        stackup.next_stackup_id = None
+        stackup.position = 100 - stackup.id
+    db.commit()
+    db.expunge_all()
+
+    expected = [stackup.component_version_id for stackup in sorted(stackups, key=lambda stackup: stackup.position)]
+    assert get_stackup_version_ids(db, path_id) == expected
+
+def test_chain_broken_mid_path_falls_back_to_position(db, path_id):
+    # Link the chain in position order, then break it after the third stage
+    stackups = get_path_with_stackup(db, path_id).stackups
+    for stackup, following in zip(stackups, stackups[1:]):
+        stackup.next_stackup_id = following.id
+    stackups[2].next_stackup_id = None
+    db.commit()
+    db.expunge_all()
+
+    expected = [stackup.component_version_id for stackup in stackups]
+    assert get_stackup_version_ids(db, path_id) == expected
+
+def test_replace_path_stackup(db, path_id):
+    version_ids = get_stackup_version_ids(db, path_id)
+    new_ids = version_ids[::-1] * 5
+
+    statements = count_statements(db)
+    replace_path_stackup(db, path_id, new_ids)
+    db.commit()
+    assert len(statements) == 3
+
+    assert get_stackup_version_ids(db, path_id) == new_ids
+    stackups = get_path_with_stackup(db, path_id).stackups
+    assert [stackup.next_stackup_id for stackup in stackups] == [stackup.id for stackup in stackups[1:]] + [None]
+    assert get_missing_component_version_ids(db, [version_ids[0], 12345]) == {12345}
+
+def test_data_updates_bump_stackup_revisions(db, path_id):
+    version_ids = get_stackup_version_ids(db, path_id)
+    assert get_stackup_revisions(db, path_id) == [(version_id, 1, 0, 18_000_000_000) for version_id in version_ids]
+
+    stackup = get_path_with_stackup(db, path_id).stackups[3]
+    stackup.component_version.component_data.gain = {"freq": [0, 1], "mag": [30, 30]}
+    stackup.component_version.component.stop_freq = 1_500_000_000
+    db.commit()
+    revisions = get_stackup_revisions(db, path_id)
+    assert [revision for _, revision, _, _ in revisions] == [1, 1, 1, 2, 1, 1, 1, 1, 1, 1]
+    # Every stage is a version of the same component
+    assert {stop_freq for *_, stop_freq in revisions} == {1_500_000_000}
+    assert get_component_path_ids(db, stackup.component_version.component_id) == [path_id]
@@ -0,0 +1,32 @@
+import os
+
+from sqlalchemy import func, select
+
+from app.database.backends import database_urls
+from app.database.models.components import Component, ComponentType
+from app.database.models.projects import Project
+
+def test_database_urls():
+    sync_url, async_url = database_urls("sqlite://")
+    assert sync_url.drivername == "sqlite" and async_url.drivername == "sqlite+aiosqlite"
+    assert sync_url.database == async_url.database == f"file:rfcascade-{os.getpid()}"
+    assert sync_url.query["mode"] == "memory" and sync_url.query["cache"] == "shared"
+
+    sync_url, async_url = database_urls("sqlite:///rfcascade.db")
+    assert (sync_url.database, async_url.drivername) == ("rfcascade.db", "sqlite+aiosqlite")
+
+    sync_url, async_url = database_urls("postgresql://u:p@host/db")
+    assert sync_url.drivername == async_url.drivername == "postgresql+psycopg"
+
+def test_sqlite_columns_and_timestamps(db):
+    db.add(Component(model="m", manufacturer="x", serial_no="s", type=ComponentType(type="amplifier"), stop_freq=40_000_000_000))
+    db.add(Project(name="p"))
+    db.commit()
+    assert db.scalar(select(Component.stop_freq)) == 40_000_000_000
+    project = db.scalar(select(Project))
+    assert project.created_at == project.modified_at
+    # Sub-second like Postgres rather than SQLite's whole-second CURRENT_TIMESTAMP
+    assert "%f" in str(func.current_timestamp().compile(dialect=db.get_bind().dialect))
+
+def test_db_rolls_back_between_tests(db):
+    assert db.scalars(select(Project)).all() == []
@@ -0,0 +1,39 @@
+import io
+
+import numpy as np
+import pytest
+
+from app.utils.encoding import ARROW_MEDIA_TYPE, NPY_MEDIA_TYPE, encode_arrow, encode_npy, negotiate
+
+freqs = np.array([1_000_000_000, 1_500_000_000, 2_000_000_000])
+results = {
+    "gain": np.array([[20.0, 19.5, 19.0], [17.0, 16.5, 16.0]]),
+    "oip3": np.array([[30.0, np.inf, 31.0], [27.0, 26.5, np.inf]]),
+}
+
+def test_encode_npy():
+    buf = io.BytesIO(encode_npy({"freq": freqs, **results}))
+    np.testing.assert_array_equal(np.load(buf), freqs)
+    np.testing.assert_array_equal(np.load(buf), results["gain"])
+    np.testing.assert_array_equal(np.load(buf), results["oip3"])
+
+def test_encode_arrow():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(encode_arrow(freqs, results, "float32", {"num_stages": "2"})).read_all()
+    assert table.schema.metadata == {b"num_stages": b"2"}
+    assert table.column("freq").to_pylist() == freqs.tolist()
+    assert table.column("gain").type == pa.list_(pa.float32(), 2)
+    for name, values in results.items():
+        stages = table.column(name).combine_chunks().flatten().to_numpy().reshape(len(freqs), -1).T
+        np.testing.assert_array_equal(stages, values.astype(np.float32))
+
+def test_negotiate():
+    supported = ["application/json", "application/x-ndjson", ARROW_MEDIA_TYPE, NPY_MEDIA_TYPE]
+    assert negotiate(None, supported) == "application/json"
+    assert negotiate(NPY_MEDIA_TYPE, supported) == NPY_MEDIA_TYPE
+    assert negotiate(f"application/json;q=1, {ARROW_MEDIA_TYPE};q=0.1", supported) == "application/json"
+    assert negotiate(f"application/json;q=0.5, {ARROW_MEDIA_TYPE}", supported) == ARROW_MEDIA_TYPE
+    assert negotiate("*/*", supported) == "application/json"
+    assert negotiate(f"application/*;q=0.5, application/json;q=0, {NPY_MEDIA_TYPE};q=0.2", supported) == "application/x-ndjson"
+    assert negotiate("text/html", supported) is None
+    assert negotiate(f"{ARROW_MEDIA_TYPE}, */*;q=0", supported[:2]) is None
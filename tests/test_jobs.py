@@ -0,0 +1,160 @@
+import json
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database.models import SQLAlchemyBase
+from app.database.models.components import Component, ComponentType, ComponentVersion, ComponentData
+from app.database.models.jobs import AnalysisJob
+from app.database.models.paths import Path
+from app.database.models.projects import Project
+from app.database.models.stackups import Stackup
+from app.config import config
+from app.utils.rfcascade import AnalysisParamsModel, BatchResultsModel, PathResultsModel, analyze, analyze_batch
+from app.crud.crud_jobs import claim_jobs, touch_jobs
+from app.crud.crud_paths import get_stackups_by_path
+from app.utils.jobs import JobQueue, JobQueueFullError, _analyze_unit, _stage_columns, _Job, _combine, job_units
+
+def echo(value: bytes, delay: float = 0) -> bytes:
+    time.sleep(delay)
+    return value
+
+def finish(path: str, delay: float) -> bytes:
+    time.sleep(delay)
+    open(path, "w").close()
+    return b"null"
+
+def fail() -> bytes:
+    raise ValueError("bad params")
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    SQLAlchemyBase.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=1, max_queued=1)
+    yield queue
+    queue.shutdown()
+
+def add_jobs(engine, count: int) -> list[int]:
+    with Session(engine) as db:
+        jobs = [AnalysisJob(kind="batch", request={}) for _ in range(count)]
+        db.add_all(jobs)
+        db.commit()
+        return [job.id for job in jobs]
+
+def wait(engine, job_id: int) -> AnalysisJob:
+    for _ in range(200):
+        with Session(engine) as db:
+            job = db.get(AnalysisJob, job_id)
+        if job.status not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError
+
+def test_queue_depth_cancel_and_results(engine, queue):
+    first, second, third = add_jobs(engine, 3)
+    queue.submit(engine, first, [(echo, (b"1", 0.5)), (echo, (b"2",))], result_template=b"%b")
+    queue.submit(engine, second, [(echo, (b"3",))])
+    assert queue.queued() == 1
+    with pytest.raises(JobQueueFullError):
+        queue.submit(engine, third, [(echo, (b"4",))])
+
+    assert queue.cancel(second)
+    job = wait(engine, first)
+    assert job.status == "succeeded"
+    assert job.progress == 1
+    assert job.result == b"[1,2]"
+    assert job.started_at is not None
+    with Session(engine) as db:
+        assert db.get(AnalysisJob, second).status == "queued"
+
+def test_failed_unit_fails_job(engine, queue):
+    job_id, = add_jobs(engine, 1)
+    queue.submit(engine, job_id, [(fail, ()), (echo, (b"1",))], result_template=b"%b")
+    job = wait(engine, job_id)
+    assert job.status == "failed"
+    assert job.error == "bad params"
+
+def test_cancel_waits_for_running_units(engine, queue, tmp_path):
+    job_id, = add_jobs(engine, 1)
+    done = tmp_path / "done"
+    queue.submit(engine, job_id, [(finish, (str(done), 0.3))])
+    assert queue.cancel(job_id, wait=True)
+    assert done.exists()
+    assert not queue.cancel(job_id, wait=True)
+
+def test_claim_orphaned_jobs(engine):
+    now = datetime(2026, 1, 1, 12)
+    with Session(engine) as db:
+        jobs = [
+            AnalysisJob(kind="batch", request={}),
+            AnalysisJob(kind="batch", request={}, status="running", worker_id="other", heartbeat_at=now - timedelta(seconds=5)),
+            AnalysisJob(kind="batch", request={}, status="running", worker_id="crashed", heartbeat_at=now - timedelta(minutes=5)),
+            AnalysisJob(kind="batch", request={}, status="succeeded", heartbeat_at=now - timedelta(minutes=5)),
+        ]
+        db.add_all(jobs)
+        db.commit()
+        ids = [job.id for job in jobs]
+
+    # Workers claiming at once each get a share, never the same job
+    def claim(worker_id):
+        with Session(engine) as db:
+            claimed = claim_jobs(db, worker_id, now, now - timedelta(minutes=1))
+            db.commit()
+            return claimed
+
+    with ThreadPoolExecutor(4) as pool:
+        claims = list(pool.map(claim, ["a", "b", "c", "d"]))
+    assert sorted(sum(claims, [])) == [ids[0], ids[2]]
+
+    with Session(engine) as db:
+        job = db.get(AnalysisJob, ids[2])
+        assert job.status == "queued" and job.heartbeat_at == now and job.worker_id != "crashed"
+        touch_jobs(db, "other", ids, now + timedelta(minutes=1))
+        db.commit()
+        assert [db.get(AnalysisJob, job_id).heartbeat_at for job_id in ids[:3]] == [now, now + timedelta(minutes=1), now]
+
+def test_units_get_plain_stage_values():
+    stackup = []
+    for i, gain in enumerate([20, -3]):
+        data = ComponentData(gain={"freq": [0, 4_000_000_000], "mag": [gain, gain - 1]}, nf={"freq": [0, 4_000_000_000], "mag": [abs(gain)/5, 3]})
+        component = Component(id=i + 1, model="m", manufacturer="x", serial_no="s", component_type_id=1, start_freq=0, stop_freq=3_000_000_000)
+        version = ComponentVersion(id=i + 10, component=component, component_data=data, version=0, change_note="")
+        stackup.append(Stackup(component_version_id=version.id, component_version=version))
+
+    stages = pickle.loads(pickle.dumps(_stage_columns(stackup)))
+    assert all(part is None or type(part) is dict for stage in stages for part in stage)
+    params = AnalysisParamsModel(start_freq=1_000_000_000, stop_freq=3_500_000_000, points_per_mhz=1, temp=290, pwr_in=-60, min_snr=10)
+    assert _analyze_unit(stages, params) == analyze(stackup, params).model_dump_json().encode()
+
+def test_batch_units_share_the_grid(db, monkeypatch):
+    project, amp = Project(name="p"), ComponentType(type="amplifier")
+    for gain in (10, 20, 30):
+        # Each path has its own knee so chunks of the batch would pick different adaptive grids
+        knee = gain*100_000_000
+        data = ComponentData(gain={"freq": [0, knee, 4_000_000_000], "mag": [gain, gain, 0]})
+        version = ComponentVersion(component=Component(model="m", manufacturer="x", serial_no="s", type=amp), component_data=data, version=0, change_note="")
+        db.add(Path(project=project, input="J1", output="J2", stackups=[Stackup(component_version=version)]))
+    db.commit()
+
+    params = AnalysisParamsModel(start_freq=1_000_000_000, stop_freq=3_500_000_000, temp=290, pwr_in=-60, min_snr=10, grid="adaptive")
+    path_ids = [path.id for path in project.paths]
+    monkeypatch.setattr(config, "JOB_PATHS_PER_UNIT", 1)
+    job = AnalysisJob(id=1, kind="batch", request={"path_ids": path_ids, "params": params.model_dump(mode="json")})
+    units, result_template = job_units(db, job)
+    assert len(units) == 3
+    result = _combine(_Job(id=1, engine=None, units=units, result_template=result_template, results=[unit(*args) for unit, args in units]))
+
+    freqs, results = analyze_batch(list(get_stackups_by_path(db, path_ids).values()), params)
+    expected = BatchResultsModel(freq=freqs.tolist(), paths=[PathResultsModel(path_id=path_id, **dict(r)) for path_id, r in zip(path_ids, results)])
+    assert json.loads(result) == json.loads(expected.model_dump_json())
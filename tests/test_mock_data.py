@@ -0,0 +1,34 @@
+import numpy as np
+from sqlalchemy import func, select
+
+from app.crud.crud_paths import get_stackups_by_path, get_stackup_version_ids
+from app.database.models.components import Component, ComponentVersion, ComponentVersionSummary
+from app.scripts.mock_data import seed
+
+def test_seed(db):
+    path_ids = seed(db.connection(), scale=0.0005, points=51, stages=(2, 5))
+    assert db.scalar(select(func.count(Component.id))) == 50
+    assert len(path_ids) == 5
+
+    # One latest summary per component, on its highest version
+    latest = db.execute(select(ComponentVersionSummary.component_id, ComponentVersion.version).join(ComponentVersion).where(ComponentVersionSummary.is_latest)).all()
+    highest = dict(db.execute(select(ComponentVersion.component_id, func.max(ComponentVersion.version)).group_by(ComponentVersion.component_id)).all())
+    assert dict(latest) == highest
+
+    # Chains are linked in position order and use latest versions
+    stackups = get_stackups_by_path(db, path_ids)
+    latest_ids = set(db.scalars(select(ComponentVersionSummary.component_version_id).where(ComponentVersionSummary.is_latest)))
+    for path_id in path_ids:
+        chain = stackups[path_id]
+        assert 2 <= len(chain) <= 5
+        assert [stage.position for stage in chain] == list(range(len(chain)))
+        assert [stage.next_stackup_id for stage in chain] == [stage.id for stage in chain[1:]] + [None]
+        assert set(get_stackup_version_ids(db, path_id)) <= latest_ids
+
+    # Curves span the component band and are reproducible from the seed
+    version = db.get(ComponentVersion, 1)
+    freq, gain = version.component_data.curve("gain")
+    assert len(freq) == 51 and freq[0] == version.component.start_freq and freq[-1] == version.component.stop_freq
+    seed(db.connection(), scale=0.0005, points=51, stages=(2, 5))
+    copy = db.scalars(select(ComponentVersion).where(ComponentVersion.component_id == 51, ComponentVersion.version == 0)).one()
+    assert np.array_equal(copy.component_data.curve("gain")[1], gain)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from app.database.models.components import ComponentData, ComponentDataResponseModel, pack_curve, unpack_curve
+
+def test_pack_curve_roundtrip():
+    buf = pack_curve([0, 1, 18_000_000_000], [1.5, -2.0, 3.25])
+    freq, mag = unpack_curve(buf)
+    assert freq.tolist() == [0, 1, 18_000_000_000]
+    assert mag.tolist() == [1.5, -2.0, 3.25]
+    assert not freq.flags.writeable
+
+    with pytest.raises(ValueError):
+        pack_curve([0, 1], [1.0])
+    with pytest.raises(ValueError):
+        unpack_curve(b"JSON" + buf[4:])
+
+def test_component_data_keeps_api_shape():
+    data = ComponentData(id=1, data_source="measured", gain={"freq": [0, 10], "mag": [1.0, 2.0]})
+    assert isinstance(data.gain_packed, bytes)
+    assert data.nf is None
+    response = ComponentDataResponseModel.model_validate(data)
+    assert response.gain.freq == [0, 10]
+    assert response.gain.mag == [1.0, 2.0]
+    np.testing.assert_array_equal(data.curve("gain")[1], [1.0, 2.0])
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.database.models.components import Component, ComponentVersion, ComponentData
+from app.database.models.stackups import Stackup
+from app.config import config
+from app.utils.montecarlo import MonteCarloParamsModel, monte_carlo, monte_carlo_workers, shutdown_pool
+from app.utils.rfcascade import AnalysisParamsModel, analyze
+
+def make_stage(component_id: int, gain: float, nf: float) -> Stackup:
+    data = ComponentData(gain={"freq": [0, 40e9], "mag": [gain, gain]}, nf={"freq": [0, 40e9], "mag": [nf, nf]})
+    component = Component(id=component_id, component_type_id=component_id % 2)
+    return Stackup(component_version=ComponentVersion(component=component, component_data=data))
+
+stackup = [make_stage(1, 20, 2), make_stage(2, -3, 3), make_stage(3, 15, 6)]
+params = AnalysisParamsModel(start_freq=1e9, stop_freq=1.1e9, temp=290, pwr_in=-90, min_snr=20)
+
+def test_no_tolerance_matches_nominal():
+    results = monte_carlo(stackup, params, MonteCarloParamsModel(trials=10, seed=1))
+    nominal = analyze(stackup, params)
+    for envelope in results.envelopes:
+        np.testing.assert_allclose(envelope.gain, nominal.gain[-1], rtol=1e-6)
+        np.testing.assert_allclose(envelope.snr, nominal.snr[-1], rtol=1e-6)
+    assert results.pass_yield == 1.0
+
+def test_results_do_not_depend_on_chunking():
+    mc = MonteCarloParamsModel(trials=500, seed=7, tolerances=[{"gain": 1, "nf": 0.5}, {"component_type_id": 0, "gain": 2, "distribution": "uniform"}])
+    single = monte_carlo(stackup, params, mc)
+    chunked = monte_carlo(stackup, params, mc.model_copy(update={"memory_budget": 1_000_000}))
+    assert single == chunked
+
+    low, median, high = single.envelopes
+    assert np.all(np.array(low.gain) < np.array(median.gain))
+    assert np.all(np.array(median.gain) < np.array(high.gain))
+    strict = monte_carlo(stackup, params.model_copy(update={"min_snr": 21.8}), mc)
+    assert 0 < strict.pass_yield < 1
+
+def test_parallel_runs_share_a_capped_pool(monkeypatch):
+    monkeypatch.setattr(config, "MONTE_CARLO_WORKERS", 10_000)
+    assert monte_carlo_workers() <= (os.cpu_count() or 1)
+    monkeypatch.setattr(config, "MONTE_CARLO_WORKERS", 2)
+    mc = MonteCarloParamsModel(trials=500, seed=7, memory_budget=1_000_000, tolerances=[{"gain": 1, "nf": 0.5}])
+    try:
+        assert monte_carlo(stackup, params, mc, parallel=True) == monte_carlo(stackup, params, mc)
+    finally:
+        shutdown_pool()
+
+def test_memory_budget_too_small():
+    with pytest.raises(ValueError):
+        monte_carlo(stackup, params, MonteCarloParamsModel(trials=1000, memory_budget=1000))
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database.models.components import Component, ComponentType, ComponentResponseModel, ComponentListParamsModel
+from app.crud.crud_components import get_components_page
+from app.crud.pagination import select_fields
+
+@pytest.fixture
+def db(db):
+    session = db
+    amp, filt = ComponentType(type="amplifier"), ComponentType(type="filter")
+    start = datetime(2026, 1, 1)
+    for i in range(25):
+        session.add(Component(
+            model=f"m{i}", manufacturer="a" if i % 2 else "b", serial_no="s", type=amp if i < 20 else filt,
+            start_freq=i*1_000_000_000, stop_freq=(i + 2)*1_000_000_000, is_active=i % 3 == 0,
+            # Reverse insertion order so modified_at and id orderings differ, with ties
+            modified_at=start - timedelta(seconds=i//2),
+        ))
+    session.commit()
+    return session
+
+def all_pages(db, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = get_components_page(db, ComponentListParamsModel(**params, cursor=cursor))
+        ids += [row.id for row in rows]
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+def test_pages(db):
+    ids, pages = all_pages(db, limit=10)
+    assert ids == list(range(1, 26))
+    assert pages == 3
+
+    ids, pages = all_pages(db, limit=5)
+    assert ids == list(range(1, 26))
+    assert pages == 5
+
+    ids, _ = all_pages(db, limit=4, order_by="modified_at")
+    modified = {row.id: row.modified_at for row in db.query(Component)}
+    assert ids == sorted(modified, key=lambda k: (modified[k], k))
+
+def test_no_limit_returns_every_row(db):
+    rows, cursor = get_components_page(db, ComponentListParamsModel())
+    assert [row.id for row in rows] == list(range(1, 26))
+    assert cursor is None
+
+    _, cursor = get_components_page(db, ComponentListParamsModel(limit=20))
+    rows, cursor = get_components_page(db, ComponentListParamsModel(cursor=cursor))
+    assert [row.id for row in rows] == list(range(21, 26))
+    assert cursor is None
+
+def test_filters(db):
+    ids, _ = all_pages(db, limit=3, manufacturer="a", is_active=True)
+    assert ids == [i + 1 for i in range(25) if i % 2 and i % 3 == 0]
+
+    ids, _ = all_pages(db, component_type_id=2)
+    assert ids == list(range(21, 26))
+
+    # Overlap with 5-6 GHz
+    ids, _ = all_pages(db, min_freq=5_000_000_000, max_freq=6_000_000_000)
+    assert ids == [4, 5, 6, 7]
+
+def test_fields(db):
+    fields = select_fields(Component, ComponentResponseModel, "model, id,model")
+    assert fields == ["model", "id"]
+    rows, cursor = get_components_page(db, ComponentListParamsModel(limit=2, order_by="modified_at"), fields)
+    assert rows == [{"model": "m24", "id": 25}, {"model": "m22", "id": 23}]
+    rows, _ = get_components_page(db, ComponentListParamsModel(limit=2, order_by="modified_at", cursor=cursor), fields)
+    assert rows == [{"model": "m23", "id": 24}, {"model": "m20", "id": 21}]
+
+    for fields in ("type", "nope", " , "):
+        with pytest.raises(ValueError):
+            select_fields(Component, ComponentResponseModel, fields)
+
+def test_invalid_cursor(db):
+    for cursor in ("bad", "WzFd", "WyJ4IiwgMV0="):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            get_components_page(db, ComponentListParamsModel(order_by="modified_at", cursor=cursor))
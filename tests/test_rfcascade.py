@@ -0,0 +1,172 @@
+import json
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.database.models.components import Component, ComponentVersion, ComponentData
+from app.database.models.stackups import Stackup
+from app.utils.cache import curve_cache
+from app.utils.rfcascade import AnalysisParamsModel, analyze, analyze_batch, analyze_stream, analysis_freqs, frequency_ranges, stage_valid_mask
+
+def make_stage(gain: float, nf: float, **curves: float) -> Stackup:
+    curves = {"gain": gain, "nf": nf, **curves}
+    data = ComponentData(**{param: {"freq": [0, 40e9], "mag": [value, value]} for param, value in curves.items()})
+    return Stackup(component_version=ComponentVersion(component_data=data))
+
+def test_analysis_freqs():
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, points_per_mhz=2, temp=290, pwr_in=-30, min_snr=10)
+    freqs = analysis_freqs(params)
+    assert len(freqs) == 2001
+    assert freqs[0] == 1e9
+    assert freqs[-1] == 2e9
+
+def test_cascade_friis():
+    stackup = [make_stage(20, 2), make_stage(-3, 3), make_stage(15, 6)]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-30, min_snr=10)
+    results = analyze(stackup, params)
+
+    gain = np.array(results.gain)
+    nf = np.array(results.nf)
+    assert gain.shape == nf.shape == (3, 1001)
+    assert len(results.freq) == 1001
+    np.testing.assert_allclose(gain[:, 0], [20, 17, 32])
+
+    f1, f2, f3 = 10**0.2, 10**0.3, 10**0.6
+    g1, g2 = 10**2, 10**-0.3
+    expected = 10*np.log10([f1, f1 + (f2-1)/g1, f1 + (f2-1)/g1 + (f3-1)/(g1*g2)])
+    np.testing.assert_allclose(nf[:, 0], expected)
+
+def test_missing_data_is_transparent():
+    stackup = [make_stage(10, 3), Stackup(component_version=ComponentVersion(component_data=ComponentData()))]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-30, min_snr=10)
+    results = analyze(stackup, params)
+    np.testing.assert_allclose(results.gain[1], results.gain[0])
+    np.testing.assert_allclose(results.nf[1], results.nf[0])
+
+def test_batch_matches_single():
+    stackups = [[make_stage(20, 2), make_stage(-3, 3)], [make_stage(10, 5)], []]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-30, min_snr=10)
+    freqs, results = analyze_batch(stackups, params)
+    assert len(results) == 3
+    for stackup, result in zip(stackups, results):
+        single = analyze(stackup, params)
+        assert freqs.tolist() == single.freq
+        assert "freq" not in result.model_dump()
+        np.testing.assert_allclose(np.array(result.gain).reshape(-1), np.array(single.gain).reshape(-1))
+        np.testing.assert_allclose(np.array(result.nf).reshape(-1), np.array(single.nf).reshape(-1))
+
+def test_cascade_nonlinearity():
+    stackup = [make_stage(10, 2, ip3=30, ip2=50, p1db=15, max_input=0), make_stage(20, 5, ip3=40, ip2=60)]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-20, min_snr=10)
+    results = analyze(stackup, params)
+
+    iip3 = -10*np.log10(1/10**2 + 10/10**2)
+    np.testing.assert_allclose(np.array(results.iip3)[:, 0], [20, iip3])
+    np.testing.assert_allclose(np.array(results.oip3)[:, 0], [30, iip3 + 30])
+
+    iip2 = -20*np.log10(np.sqrt(1/10**4) + np.sqrt(10/10**4))
+    np.testing.assert_allclose(np.array(results.iip2)[:, 0], [40, iip2])
+
+    # The second stage has no compression data so the chain P1dB is set by the first stage
+    np.testing.assert_allclose(np.array(results.ip1db)[:, 0], [6, 6])
+    np.testing.assert_allclose(np.array(results.p1db)[:, 0], [15, 35])
+    np.testing.assert_allclose(np.array(results.p1db_margin)[:, 0], [26, np.inf])
+    np.testing.assert_allclose(np.array(results.max_input_margin)[:, 0], [20, np.inf])
+    assert '"max_input_margin":[[20.0' in results.model_dump_json()
+    assert "null" in results.model_dump_json()
+
+def test_noise_and_snr():
+    # Gain ramps 0 -> 40 dB across 0-40 GHz so the second stage's NF contribution varies with frequency
+    lna = make_stage(20, 3)
+    ramp = Stackup(component_version=ComponentVersion(component_data=ComponentData(
+        gain={"freq": [0, 40e9], "mag": [-20, 20]},
+        nf={"freq": [0, 40e9], "mag": [30, 30]},
+    )))
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, rbw=1e6, temp=290, pwr_in=-80, min_snr=25)
+    results = analyze([lna, ramp], params)
+
+    ktb = 10*np.log10(1.380649e-23*290*1e6) + 30
+    np.testing.assert_allclose(ktb, -113.975, atol=1e-3)
+    np.testing.assert_allclose(np.array(results.mds)[0], ktb + 3)
+    np.testing.assert_allclose(np.array(results.noise_floor)[0], ktb + 3 + 20)
+    np.testing.assert_allclose(np.array(results.signal)[0], -60)
+    np.testing.assert_allclose(np.array(results.snr), np.array(results.signal) - np.array(results.noise_floor))
+    np.testing.assert_allclose(np.array(results.sfdr), 2/3*(np.array(results.iip3) - np.array(results.mds)))
+
+    # SNR of ~31 dB at the LNA; the noisy second stage pulls it below 25 dB
+    assert all(violation.stage == 1 for violation in results.snr_violations)
+    assert results.snr_violations[0].start_freq == 1e9
+    assert results.snr_violations[0].stop_freq == 2e9
+
+def test_temp_must_be_positive():
+    for temp in (0, -10):
+        with pytest.raises(ValidationError):
+            AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=temp, pwr_in=-30, min_snr=10)
+
+def test_frequency_ranges():
+    mask = np.array([[0, 1, 1, 0, 1], [1, 1, 1, 1, 1], [0, 0, 0, 0, 0]], dtype=bool)
+    ranges = frequency_ranges(mask, np.arange(5)*10)
+    assert [(r.stage, r.start_freq, r.stop_freq) for r in ranges] == [(0, 10, 20), (0, 40, 40), (1, 0, 40)]
+
+def test_stream_matches_analyze():
+    ramp = ComponentData(gain={"freq": [0, 40e9], "mag": [20, 20]}, nf={"freq": [1e9, 2e9], "mag": [1, 30]})
+    stackup = [Stackup(component_version=ComponentVersion(component_data=ramp)), make_stage(-3, 3, p1db=10)]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-60, min_snr=60)
+    results = json.loads(analyze(stackup, params).model_dump_json())
+
+    *chunks, summary = [json.loads(line) for line in analyze_stream(stackup, params, chunk_points=300)]
+    assert [chunk["start"] for chunk in chunks] == [0, 300, 600, 900]
+    assert sum(len(chunk["freq"]) for chunk in chunks) == summary["num_points"] == 1001
+    for field in ("gain", "nf", "p1db", "snr"):
+        streamed = np.hstack([np.array(chunk[field], dtype=float) for chunk in chunks])
+        np.testing.assert_allclose(streamed, np.array(results[field], dtype=float))
+    assert chunks[0]["p1db"][0][0] is None
+    assert not {"snr_violations", "out_of_band"} & set(chunks[0])
+    assert summary["snr_violations"] == results["snr_violations"]
+    assert len(summary["snr_violations"]) == 2
+
+def test_stream_does_not_cache_slices():
+    curve_cache.clear()
+    stackup = [Stackup(component_version_id=1, component_version=ComponentVersion(id=1, component_data=ComponentData(gain={"freq": [0, 40e9], "mag": [20, 10]})))]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-60, min_snr=10)
+    list(analyze_stream(stackup, params, chunk_points=100))
+    # Only the parsed gain curve, not one resampled curve per slice
+    assert curve_cache.stats()["entries"] == 1
+
+def test_out_of_band_stages():
+    narrow = ComponentData(gain={"freq": [1.2e9, 2e9], "mag": [10, 10]}, nf={"freq": [0, 40e9], "mag": [3, 3]})
+    component = Component(start_freq=0, stop_freq=1.8e9)
+    stackup = [make_stage(20, 2), Stackup(component_version=ComponentVersion(component=component, component_data=narrow))]
+    params = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, temp=290, pwr_in=-30, min_snr=10)
+    freqs = analysis_freqs(params)
+
+    mask = stage_valid_mask(stackup, freqs)
+    assert mask[0].all()
+    np.testing.assert_array_equal(mask[1], (freqs >= 1.2e9) & (freqs <= 1.8e9))
+    results = analyze(stackup, params)
+    assert [r.model_dump() for r in results.out_of_band] == [
+        {"stage": 1, "start_freq": 1_000_000_000, "stop_freq": 1_199_000_000},
+        {"stage": 1, "start_freq": 1_801_000_000, "stop_freq": 2_000_000_000},
+    ]
+
+def test_adaptive_grid():
+    # Bandpass filter between two amplifiers, measured every 100 kHz
+    freq = np.linspace(0.5e9, 2.5e9, 20001)
+    loss = 1 + 50*(1/(1 + np.exp((freq - 1.2e9)/4e6)) + 1/(1 + np.exp(-(freq - 1.8e9)/4e6)))
+    bandpass = ComponentData(gain={"freq": freq.tolist(), "mag": (-loss).tolist()}, nf={"freq": freq.tolist(), "mag": loss.tolist()})
+    stackup = [make_stage(20, 2), Stackup(component_version=ComponentVersion(component_data=bandpass)), make_stage(15, 4)]
+    uniform = AnalysisParamsModel(start_freq=1e9, stop_freq=2e9, points_per_mhz=20, temp=290, pwr_in=-60, min_snr=10)
+    adaptive = uniform.model_copy(update={"grid": "adaptive", "grid_tolerance": 0.01})
+
+    reference = analyze(stackup, uniform)
+    results = analyze(stackup, adaptive)
+    assert results.freq[0] == 1e9 and results.freq[-1] == 2e9
+    assert len(results.freq) < len(reference.freq) / 50
+    for field in ("gain", "nf"):
+        for stage, expected in zip(getattr(results, field), getattr(reference, field)):
+            np.testing.assert_allclose(np.interp(reference.freq, results.freq, stage), expected, atol=0.02)
+
+    capped = analysis_freqs(adaptive.model_copy(update={"max_points": 40}), [stackup])
+    assert len(capped) == 40
+    assert capped[0] == 1e9 and capped[-1] == 2e9
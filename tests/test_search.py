@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import select
+
+from app.database.models.components import Component, ComponentType, ComponentVersion, ComponentData, ComponentVersionSummary, ComponentSearchParamsModel
+from app.crud.crud_components import get_component_search_page, add_version_summary, refresh_component_summaries
+from app.utils.summaries import summarize_component_data
+
+GHZ = 1_000_000_000
+
+def add_component(db, comp_type, start, stop, gain, nf, stop_freq=18*GHZ):
+    component = Component(model="m", manufacturer="x", serial_no="s", type=comp_type, stop_freq=stop_freq)
+    data = ComponentData(
+        gain={"freq": [start, stop], "mag": gain},
+        nf={"freq": [start, (start + stop)//2, stop], "mag": nf},
+        p1db={"freq": [0, 20*GHZ], "mag": [10, 10]},
+    )
+    version = ComponentVersion(component_data=data, version=0, change_note="")
+    component.component_versions.append(version)
+    db.add(component)
+    add_version_summary(db, component, version)
+    db.commit()
+    return component
+
+def search(db, **params):
+    components, _ = get_component_search_page(db, ComponentSearchParamsModel(**params))
+    return [component.id for component in components]
+
+def test_summary():
+    data = ComponentData(gain={"freq": [0, 4*GHZ, 8*GHZ], "mag": [10, 20, 20]}, nf={"freq": [2*GHZ, 10*GHZ], "mag": [1, 5]})
+    summary = summarize_component_data(data)
+    assert summary["band_start"] == 2*GHZ and summary["band_stop"] == 8*GHZ
+    # Gain is interpolated to 15 dB at the band edge, mean of 15->20 over 2 GHz then 20 over 4 GHz
+    assert summary["gain_min"] == 15 and summary["gain_max"] == 20
+    assert summary["gain_mean"] == pytest.approx((17.5*2 + 20*4)/6)
+    assert summary["nf_min"] == 1 and summary["nf_max"] == 4 and summary["nf_mean"] == 2.5
+    assert summary["ip3_min"] is None and summary["ip3_mean"] is None
+
+    # Curves that do not overlap are each summarized over their own span
+    data = ComponentData(gain={"freq": [0, GHZ], "mag": [1, 3]}, nf={"freq": [2*GHZ], "mag": [4]})
+    summary = summarize_component_data(data)
+    assert summary["band_start"] is None
+    assert summary["gain_mean"] == 2 and summary["nf_mean"] == 4
+
+def test_search(db):
+    amp, filt = ComponentType(type="amplifier"), ComponentType(type="filter")
+    wide = add_component(db, amp, GHZ, 10*GHZ, [20, 16], [1.5, 1.8, 1.9])
+    noisy = add_component(db, amp, GHZ, 10*GHZ, [20, 20], [1.5, 2.5, 1.5])
+    narrow = add_component(db, amp, 3*GHZ, 10*GHZ, [20, 20], [1, 1, 1])
+    limited = add_component(db, amp, GHZ, 10*GHZ, [20, 20], [1, 1, 1], stop_freq=5*GHZ)
+    lossy = add_component(db, filt, GHZ, 10*GHZ, [-2, -2], [2, 2, 2])
+
+    # Amplifiers covering 2-6 GHz with NF < 2 dB and gain > 15 dB
+    assert search(db, component_type_id=amp.id, min_freq=2*GHZ, max_freq=6*GHZ, max_nf=2, min_gain=15) == [wide.id]
+    assert search(db, min_freq=2*GHZ, max_freq=6*GHZ) == [wide.id, noisy.id, lossy.id]
+    assert search(db, max_gain=0) == [lossy.id]
+    assert search(db, min_p1db=10) == [wide.id, noisy.id, narrow.id, limited.id, lossy.id]
+    assert search(db, min_ip3=0) == []
+
+    components, cursor = get_component_search_page(db, ComponentSearchParamsModel(limit=2))
+    assert [component.summary.nf_max for component in components] == [1.9, 2.5]
+    components, _ = get_component_search_page(db, ComponentSearchParamsModel(limit=2, cursor=cursor))
+    assert [component.id for component in components] == [narrow.id, limited.id]
+
+    # Only the latest version is searched
+    version = ComponentVersion(component_data=ComponentData(gain={"freq": [GHZ, 10*GHZ], "mag": [5, 5]}), version=1, change_note="")
+    wide.component_versions.append(version)
+    add_version_summary(db, wide, version)
+    db.commit()
+    assert search(db, min_gain=15) == [noisy.id, narrow.id, limited.id]
+    assert search(db, max_gain=5) == [wide.id, lossy.id]
+
+def test_refresh(db):
+    amp = ComponentType(type="amplifier")
+    component = Component(model="m", manufacturer="x", serial_no="s", type=amp)
+    for i in range(3):
+        data = ComponentData(gain={"freq": [0, GHZ], "mag": [i, i]})
+        component.component_versions.append(ComponentVersion(component_data=data, version=i, change_note=""))
+    db.add(component)
+    db.commit()
+
+    assert refresh_component_summaries(db) == 3
+    assert refresh_component_summaries(db) == 0
+    summaries = db.execute(select(ComponentVersionSummary).order_by(ComponentVersionSummary.gain_min)).scalars().all()
+    assert [summary.is_latest for summary in summaries] == [False, False, True]
+    assert search(db, min_gain=2) == [component.id]
@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.database.models.components import Component, ComponentVersion, ComponentData
+from app.database.models.stackups import Stackup
+from app.utils.rfcascade import AnalysisParamsModel, analyze
+from app.utils.sweep import SweepInputModel, sweep
+
+def make_stage(gain: float, nf: float, p1db: float | None = None, is_variable: bool = False) -> Stackup:
+    curves = {"gain": gain, "nf": nf} | ({"p1db": p1db} if p1db is not None else {})
+    data = ComponentData(**{param: {"freq": [0, 40e9], "mag": [mag, mag + 0.5]} for param, mag in curves.items()})
+    return Stackup(component_version=ComponentVersion(component=Component(is_variable=is_variable), component_data=data))
+
+params = AnalysisParamsModel(start_freq=1e9, stop_freq=1.01e9, temp=290, pwr_in=-60, min_snr=40)
+states = [{"gain": 0, "nf": 0}, {"gain": -4, "nf": 4, "p1db": -4}, {"gain": -8, "nf": 8, "p1db": -8}, {"gain": -4, "nf": 6, "p1db": -4}]
+
+def nominal_stackup(offsets=(None, None)) -> list[Stackup]:
+    """Amp, variable attenuator, amp, variable attenuator, amp with the attenuators' states applied"""
+    att = [(0, 0, 30) if offset is None else (offset["gain"], offset["nf"], 30 + offset.get("p1db", 0)) for offset in offsets]
+    return [make_stage(20, 2, 10), make_stage(*att[0], is_variable=True), make_stage(15, 4, 20), make_stage(*att[1], is_variable=True), make_stage(10, 6, 25)]
+
+def test_sweep_matches_brute_force():
+    body = SweepInputModel(params=params, stages=[{"stage": 1, "states": states}, {"stage": 3, "states": states}])
+    results = sweep(nominal_stackup(), params, body)
+    assert results.combinations == 16
+    assert results.evaluated < 4 + 16
+
+    # Every combination cascaded on its own, reduced to the best per gain setting
+    combos = {}
+    for choice in itertools.product(range(len(states)), repeat=2):
+        out = analyze(nominal_stackup([states[c] for c in choice]), params)
+        combos[choice] = (min(out.gain[-1]), max(out.nf[-1]), min(out.p1db[-1]))
+    for setting in results.pareto:
+        gain, nf, p1db = combos[tuple(setting.states)]
+        assert setting.nf == pytest.approx(nf) and setting.p1db == pytest.approx(p1db) and setting.gain == pytest.approx(gain)
+        for other in combos.values():
+            if other[0] == pytest.approx(gain):
+                assert not (other[1] < nf - 1e-9 and other[2] > p1db + 1e-9)
+
+    # State 3 only adds noise over state 1 so it never survives
+    assert all(3 not in setting.states for setting in results.pareto)
+    gains = {round(setting.gain, 6) for setting in results.pareto}
+    assert gains == {round(gain, 6) for gain, _, _ in combos.values()}
+
+def test_sweep_targets():
+    body = SweepInputModel(params=params, stages=[{"stage": 1, "num_states": 32, "step": 0.5}], targets={"max_nf": 2.5, "min_gain": 40})
+    results = sweep(nominal_stackup(), params, body)
+    assert results.feasible > 0
+    assert any(not setting.meets_targets for setting in results.pareto)
+    for setting in results.pareto:
+        assert setting.meets_targets == (setting.nf <= 2.5 and setting.gain >= 40 and setting.snr >= params.min_snr)
+
+def test_sweep_requires_variable_stage():
+    with pytest.raises(ValueError):
+        sweep(nominal_stackup(), params, SweepInputModel(params=params, stages=[{"stage": 0, "num_states": 2, "step": 1}]))
+
+def test_sweep_chunks_within_memory_budget():
+    body = SweepInputModel(params=params, stages=[{"stage": 1, "states": states}, {"stage": 3, "states": states}])
+    expected = sweep(nominal_stackup(), params, body)
+    # Room for the states of only a few partial combinations at a time
+    chunked = sweep(nominal_stackup(), params, body.model_copy(update={"memory_budget": 20_000}))
+    assert chunked == expected
+
+    with pytest.raises(ValueError, match="memory_budget"):
+        sweep(nominal_stackup(), params, body.model_copy(update={"memory_budget": 1_000}))
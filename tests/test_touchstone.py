@@ -0,0 +1,116 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from app.database.models.components import Component, ComponentType
+from app.utils.touchstone import *
+
+S2P = b"""! Measured amplifier
+# MHz S DB R 50
+! freq S11 S21 S12 S22
+1000 -10 0 20 90 -30 0 -12 0
+2000 -11 0 19 45 -31 0 -13 0
+3000 -12 0 18 0 -32 0 -14 0
+! Noise parameters
+1000 1.5 0.2 30 0.3
+2000 1.6 0.2 40 0.3
+"""
+
+def parse(content, num_ports=2):
+    return parse_touchstone(io.BytesIO(content), num_ports)
+
+def test_parse():
+    data = parse(S2P)
+    assert data.freq.tolist() == [1_000_000_000, 2_000_000_000, 3_000_000_000]
+    freq, gain = gain_curve(data)
+    assert gain == pytest.approx([20, 19, 18])
+    assert np.angle(data.s[:, 1, 0], deg=True) == pytest.approx([90, 45, 0])
+    assert 20*np.log10(np.abs(data.s[0, 0, 1])) == pytest.approx(-30)
+
+    # Default GHz and MA, real/imaginary
+    data = parse(b"#\n1 0.5 0 2 0 0 0 0.5 0\n")
+    assert data.freq.tolist() == [1_000_000_000] and data.s[0, 1, 0] == 2
+    data = parse(b"# hz s ri r 75\n5 0 0 0 3 0 0 0 0\n")
+    assert gain_curve(data)[1] == pytest.approx([20*np.log10(3)])
+
+    # Version 2 keeps S12 before S21 when asked and stops at the noise data
+    content = b"""[Version] 2.0
+# GHz S MA R 50
+[Number of Ports] 2
+[Two-Port Data Order] 12_21
+[Number of Frequencies] 1
+[Network Data]
+1 0 0 0.1 0 10 0 0 0
+[Noise Data]
+1 1 0 0 0.2
+[End]
+"""
+    assert parse(content).s[0, 1, 0] == 10
+
+    # Three ports wrapped over several lines, row-major
+    content = b"# GHz S MA\n" + b"".join(
+        f"{f} 1 0 2 0 3 0\n 4 0 5 0 6 0\n 7 0 8 0 9 0\n".encode() for f in (1, 2)
+    )
+    data = parse(content, 3)
+    assert data.s[1].real.tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert gain_curve(data, 3, 1)[1] == pytest.approx([20*np.log10(3)]*2)
+
+def test_parse_errors():
+    for content, message in (
+        (b"# GHz Y MA\n1 0 0 0 0 0 0 0 0\n", "Only S-parameters"),
+        (b"# GHz S MA\n1 0 0 0 0 0 0 0\n", "rows of 9"),
+        (b"# GHz S MA\n2 0 0 0 0 0 0 0 0\n1 0 0 0 0 0 0 0 0\n", "increasing"),
+        (b"# GHz S MA\n1 0 0 x 0 0 0 0 0\n", "not a number"),
+        (b"# GHz S XY\n", "Unknown option"),
+        (b"! nothing\n", "rows of 9"),
+    ):
+        with pytest.raises(TouchstoneError, match=message):
+            parse(content)
+    with pytest.raises(TouchstoneError, match="Port 2"):
+        gain_curve(parse(b"1 0.5 0\n", 1))
+    assert touchstone_ports("a/b.S2P") == 2 and touchstone_ports("b.s12p") == 12
+    assert touchstone_ports("b.s0p") is None and touchstone_ports("b.txt") is None
+
+@pytest.fixture
+def db(db):
+    session = db
+    comp_type = ComponentType(type="amplifier")
+    for serial_no in ("A1", "A2", "A2"):
+        session.add(Component(model="m", manufacturer="x", serial_no=serial_no, type=comp_type))
+    session.commit()
+    return session
+
+def test_import(db, tmp_path):
+    archive = tmp_path / "parts.zip"
+    with zipfile.ZipFile(archive, "w") as out:
+        out.writestr("run1/A1.s2p", S2P)
+        out.writestr("A2.s2p", S2P)
+        out.writestr("B1.s2p", S2P)
+        out.writestr("bad/A1.s2p", b"# GHz S MA\n1 0\n")
+        out.writestr("notes.txt", b"")
+    source = str(archive)
+    names = touchstone_sources(source)
+    assert names == ["A2.s2p", "B1.s2p", "bad/A1.s2p", "run1/A1.s2p"]
+
+    results = {result.name: result for result in import_touchstone(db, source, names, TouchstoneImportParamsModel())}
+    assert results["run1/A1.s2p"].status == "imported" and results["run1/A1.s2p"].points == 3
+    assert results["A2.s2p"].status == "skipped" and "More than one" in results["A2.s2p"].error
+    assert results["B1.s2p"].status == "skipped"
+    assert results["bad/A1.s2p"].status == "failed"
+
+    component = db.get(Component, 1)
+    version = component.component_versions[0]
+    assert version.version == 0 and version.change_note.startswith("Imported from A1.s2p [sha256:")
+    assert version.component_data.gain["mag"] == pytest.approx([20, 19, 18])
+    assert version.summary.is_latest and version.summary.gain_min == pytest.approx(18)
+
+    # Rerunning skips data already imported, new data becomes the next version
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "A1.s2p").write_bytes(S2P)
+    (tmp_path / "dir" / "A1_cold.s2p").write_bytes(S2P.replace(b" 20 90", b" 22 90"))
+    params = TouchstoneImportParamsModel(component_id=1)
+    results = import_touchstone(db, str(tmp_path / "dir"), touchstone_sources(str(tmp_path / "dir")), params)
+    assert [(result.status, result.version) for result in results] == [("duplicate", 0), ("imported", 1)]
+    assert [cv.summary.is_latest for cv in component.component_versions] == [False, True]